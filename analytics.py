@@ -0,0 +1,185 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from database import db_manager, Transaction, archive_horizon
+from utils import brasilia_offset_table
+
+# Users whose columnar snapshot is kept in memory per process
+ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 256))
+
+# Transaction type of each type code
+TYPES = ('income', 'expense')
+
+# Longest range (days) and rolling window a report covers
+MAX_REPORT_DAYS = 3660
+MAX_ROLLING_WINDOW = 365
+
+# Amount percentiles reported per transaction type
+PERCENTILES = (10, 25, 50, 75, 90)
+
+_TRANSITIONS, _OFFSETS = (np.asarray(values, dtype=np.int64) for values in brasilia_offset_table())
+
+def local_days(epochs):
+    """Brasilia calendar day numbers (days since 1970-01-01) for an array of UTC epoch seconds"""
+    index = np.maximum(np.searchsorted(_TRANSITIONS, epochs, side='right') - 1, 0)
+    return (epochs + _OFFSETS[index]) // 86400
+
+def month_of(days):
+    """Month numbers (months since 1970-01) of day numbers"""
+    return np.asarray(days).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+def first_day(months):
+    """Day number of the first day of month numbers"""
+    return np.asarray(months).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+class Snapshot:
+    """One user's transactions (archived years included) as parallel columns sorted by
+    day: Brasilia day number, month number, amount, signed amount (expenses negative),
+    type code (index into TYPES), category code (index into categories, '' for none) and
+    whether the row is scheduled (recurring, or the payment of an account)"""
+    __slots__ = ('version', 'day', 'month', 'amount', 'signed', 'type_code', 'category_code', 'categories',
+                 'scheduled')
+
+    def __init__(self, version, day, amount, type_code, category_code, categories, scheduled):
+        order = np.argsort(day, kind='stable')
+        self.version = version
+        self.day = day[order]
+        self.month = month_of(self.day)
+        self.amount = amount[order]
+        self.type_code = type_code[order]
+        self.signed = np.where(self.type_code == 1, -self.amount, self.amount)
+        self.category_code = category_code[order]
+        self.categories = categories
+        self.scheduled = scheduled[order]
+
+    @classmethod
+    def load(cls, user_id):
+        """Read the user's data_version and every transaction in one connection"""
+        archived = archive_horizon() is not None
+        conn = db_manager.get_read_connection(user_id, archived=archived)
+        cursor = conn.cursor()
+
+        # Version first: a write landing in between makes the snapshot newer than its
+        # version, so the next request reloads rather than serving a stale one
+        cursor.execute('SELECT data_version FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+        tables = ['transactions']
+        if archived:
+            tables += [Transaction.archive_table(year) for year in Transaction.archive_years(cursor)]
+        cursor.execute(' UNION ALL '.join(f'SELECT date_ts, amount, transaction_type, category, '
+                                          f'is_recurring = 1 OR account_id IS NOT NULL FROM {table} '
+                                          'WHERE user_id = ?' for table in tables), [user_id] * len(tables))
+        rows = cursor.fetchall()
+        conn.close()
+
+        dates, amounts, types, categories, scheduled = zip(*rows) if rows else ((), (), (), (), ())
+        epochs = np.array(dates, dtype=np.float64)
+        dated = ~np.isnan(epochs)
+        category_names, category_code = np.unique(np.array([category or '' for category in categories], dtype=str),
+                                                  return_inverse=True)
+        return cls(row[0] if row else None,
+                   local_days(epochs[dated].astype(np.int64)).astype(np.int32),
+                   np.array(amounts, dtype=np.float64)[dated],
+                   (np.array(types, dtype=str) == 'expense').astype(np.int8)[dated],
+                   category_code.reshape(-1).astype(np.int32)[dated],
+                   category_names.tolist(),
+                   np.array(scheduled, dtype=bool)[dated])
+
+    def between(self, start_day, end_day):
+        """Slice of the rows dated start_day <= day < end_day"""
+        low, high = np.searchsorted(self.day, (start_day, end_day))
+        return slice(low, high)
+
+    def pivot(self, first_month, last_month):
+        """Totals per (type code, month, category code) for months first_month..last_month
+        (whole months), as an array of shape (len(TYPES), months, categories)"""
+        months = last_month - first_month + 1
+        rows = self.between(first_day(first_month), first_day(last_month + 1))
+        cells = ((self.type_code[rows].astype(np.int64) * months + (self.month[rows] - first_month))
+                 * len(self.categories) + self.category_code[rows])
+        totals = np.bincount(cells, weights=self.amount[rows], minlength=len(TYPES) * months * len(self.categories))
+        return totals.reshape(len(TYPES), months, len(self.categories))
+
+    def rolling_net(self, start_day, end_day, window):
+        """Income minus expenses over the window days ending on each day start_day..end_day - 1"""
+        origin = start_day - window + 1
+        rows = self.between(origin, end_day)
+        daily = np.bincount(self.day[rows] - origin, weights=self.signed[rows], minlength=end_day - origin)
+        running = np.concatenate(([0.0], np.cumsum(daily)))
+        return running[window:] - running[:-window]
+
+    def percentiles(self, start_day, end_day):
+        """{type: {'p10': ..., ...}} of single transaction amounts dated start_day..end_day - 1"""
+        rows = self.between(start_day, end_day)
+        amounts, type_codes = self.amount[rows], self.type_code[rows]
+        result = {}
+        for code, transaction_type in enumerate(TYPES):
+            values = amounts[type_codes == code]
+            points = np.percentile(values, PERCENTILES) if values.size else np.zeros(len(PERCENTILES))
+            result[transaction_type] = {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, points)}
+        return result
+
+    def report(self, start_day, end_day, window=30):
+        """JSON-ready analysis of start_day <= day < end_day: monthly income/expenses with the
+        same months a year earlier, expenses by category per month, the rolling net
+        balance and amount percentiles. Monthly figures cover the whole months the range
+        touches; everything else covers the range exactly"""
+        first_month, last_month = int(month_of(start_day)), int(month_of(end_day - 1))
+        totals = self.pivot(first_month - 12, last_month)
+        by_month = totals.sum(axis=2)
+        previous = by_month[:, :-12]
+        expenses = totals[TYPES.index('expense'), 12:]
+        spent = expenses.sum(axis=0) > 0
+        rows = self.between(start_day, end_day)
+        return {
+            'months': np.arange(first_month, last_month + 1).astype('datetime64[M]').astype(str).tolist(),
+            'income': np.round(by_month[0, 12:], 2).tolist(),
+            'expenses': np.round(by_month[1, 12:], 2).tolist(),
+            'income_previous_year': np.round(previous[0], 2).tolist(),
+            'expenses_previous_year': np.round(previous[1], 2).tolist(),
+            'expenses_by_category': {name or 'Sem categoria': np.round(expenses[:, code], 2).tolist()
+                                     for code, name in enumerate(self.categories) if spent[code]},
+            'rolling_window': window,
+            'rolling_days': np.arange(start_day, end_day).astype('datetime64[D]').astype(str).tolist(),
+            'rolling_net': np.round(self.rolling_net(start_day, end_day, window), 2).tolist(),
+            'percentiles': self.percentiles(start_day, end_day),
+            'transactions': int(rows.stop - rows.start)
+        }
+
+class VersionedCache:
+    """LRU of per-user values loaded by load(user_id), each valid for the version
+    attribute it was loaded at"""
+
+    def __init__(self, load, max_entries=ANALYTICS_CACHE_SIZE):
+        self.load = load
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, user_id, version):
+        """The user's value, reloaded unless the cached one is at version
+        (for snapshots the user's current data_version, which every ledger write bumps)"""
+        with self._lock:
+            value = self._entries.get(user_id)
+            if value is not None and value.version == version:
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return value
+            self.stats['misses'] += 1
+
+        value = self.load(user_id)
+        with self._lock:
+            self._entries[user_id] = value
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Global snapshot cache for this process
+snapshot_cache = VersionedCache(Snapshot.load)
@@ -0,0 +1,354 @@
+from flask import Blueprint, jsonify, request, g, current_app
+from flask_login import login_required, current_user
+from functools import wraps
+from datetime import datetime, date
+from database import db_manager, User, ApiToken, Transaction, Account, FinancialGoal, AccountAlert, to_epoch, to_day, archive_horizon
+from events import publish
+from archive import restore_ids
+import replica
+
+api_bp = Blueprint('api', __name__)
+
+# Largest page a listing request may ask for
+MAX_PAGE_SIZE = 200
+
+def _error(message, status, details=None):
+    body = {'error': message}
+    if details:
+        body['details'] = details
+    return jsonify(body), status
+
+# Field validators: each returns the value to store or raises ValueError
+
+def _text(max_length, required=True):
+    def validate(value):
+        if value is None and not required:
+            return None
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError('deve ser um texto não vazio')
+        if len(value) > max_length:
+            raise ValueError(f'deve ter no máximo {max_length} caracteres')
+        return value.strip()
+    return validate
+
+def _amount(minimum):
+    def validate(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError('deve ser um número')
+        if value < minimum:
+            raise ValueError(f'deve ser maior ou igual a {minimum}')
+        return float(value)
+    return validate
+
+def _choice(*options):
+    def validate(value):
+        if value not in options:
+            raise ValueError(f'deve ser um de: {", ".join(options)}')
+        return value
+    return validate
+
+def _epoch(value):
+    """ISO 8601 UTC datetime -> epoch seconds"""
+    if value is None:
+        return None
+    try:
+        return to_epoch(datetime.fromisoformat(str(value).replace('Z', '')))
+    except ValueError:
+        raise ValueError('deve ser uma data ISO 8601 (UTC)')
+
+def _day(value):
+    """ISO 8601 calendar date -> day number"""
+    if value is None:
+        return None
+    try:
+        return to_day(date.fromisoformat(str(value)[:10]))
+    except ValueError:
+        raise ValueError('deve ser uma data ISO 8601 (AAAA-MM-DD)')
+
+def _is_id(value):
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _bool(value):
+    if not isinstance(value, bool):
+        raise ValueError('deve ser true ou false')
+    return int(value)
+
+# Writable fields per resource: name -> (validator, default for creates).
+# A default of ... marks the field as required on create. 'columns' maps
+# fields whose storage column has a different name.
+RESOURCES = {
+    'transactions': {
+        'table': 'transactions',
+        'model': Transaction,
+        'fields': {
+            'description': (_text(200), ...),
+            'amount': (_amount(0.01), ...),
+            'transaction_type': (_choice('income', 'expense'), ...),
+            'category': (_text(50, required=False), None),
+            'date': (_epoch, lambda: to_epoch(datetime.utcnow())),
+            'is_recurring': (_bool, 0),
+            'recurrence_type': (_text(20, required=False), None)
+        },
+        'columns': {'date': 'date_ts'}
+    },
+    'accounts': {
+        'table': 'accounts',
+        'model': Account,
+        'fields': {
+            'name': (_text(100), ...),
+            'account_type': (_choice('receivable', 'payable'), ...),
+            'amount': (_amount(0.01), ...),
+            'due_date': (_day, None),
+            'status': (_choice('pending', 'paid'), 'pending')
+        },
+        'columns': {'due_date': 'due_day'}
+    },
+    'goals': {
+        'table': 'financial_goals',
+        'model': FinancialGoal,
+        'fields': {
+            'title': (_text(200), ...),
+            'target_amount': (_amount(0.01), ...),
+            'current_amount': (_amount(0), 0.0),
+            'target_date': (_day, None),
+            'is_completed': (_bool, 0)
+        },
+        'columns': {'target_date': 'target_day'}
+    }
+}
+
+def token_required(f):
+    """Authenticate the request with an 'Authorization: Bearer <token>' header"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            return _error('Token de API ausente ou inválido', 401)
+
+        user_id = ApiToken.get_user_id(token.strip())
+        user = User.get_by_id(user_id) if user_id else None
+        if not user or not user.is_active():
+            return _error('Token de API ausente ou inválido', 401)
+        if not user.is_subscription_active() or not user.get_plan_features().get('api'):
+            return _error('A API está disponível apenas no Plano Empresarial', 403)
+
+        g.api_user = user
+        return f(*args, **kwargs)
+    return decorated_function
+
+def _resource_or_404(f):
+    @wraps(f)
+    def decorated_function(resource, *args, **kwargs):
+        if resource not in RESOURCES:
+            return _error('Recurso não encontrado', 404)
+        return f(RESOURCES[resource], resource, *args, **kwargs)
+    return decorated_function
+
+def _validate_fields(spec, item, creating):
+    """Validate one item's fields, returning (values, errors)"""
+    values, errors = {}, []
+    for name in item:
+        if name != 'id' and name not in spec['fields']:
+            errors.append(f'{name}: campo desconhecido')
+    for name, (validator, default) in spec['fields'].items():
+        if name in item:
+            try:
+                values[name] = validator(item[name])
+            except ValueError as e:
+                errors.append(f'{name}: {e}')
+        elif creating:
+            if default is ...:
+                errors.append(f'{name}: campo obrigatório')
+            else:
+                values[name] = default() if callable(default) else default
+    return values, errors
+
+def _parse_batch(spec, body):
+    """Validate a whole batch up front so nothing is written if any item is bad"""
+    creates, updates, errors = [], [], []
+
+    for index, item in enumerate(body.get('create') or []):
+        if not isinstance(item, dict):
+            errors.append({'op': 'create', 'index': index, 'errors': ['item deve ser um objeto']})
+            continue
+        values, item_errors = _validate_fields(spec, item, creating=True)
+        if 'id' in item:
+            item_errors.append('id: não permitido em create')
+        if item_errors:
+            errors.append({'op': 'create', 'index': index, 'errors': item_errors})
+        creates.append(values)
+
+    for index, item in enumerate(body.get('update') or []):
+        if not isinstance(item, dict) or not _is_id(item.get('id')):
+            errors.append({'op': 'update', 'index': index, 'errors': ['id: obrigatório (inteiro)']})
+            continue
+        values, item_errors = _validate_fields(spec, item, creating=False)
+        if not values and not item_errors:
+            item_errors.append('nenhum campo para atualizar')
+        if item_errors:
+            errors.append({'op': 'update', 'index': index, 'errors': item_errors})
+        updates.append((item['id'], values))
+
+    deletes = body.get('delete') or []
+    for index, item_id in enumerate(deletes):
+        if not _is_id(item_id):
+            errors.append({'op': 'delete', 'index': index, 'errors': ['id deve ser um inteiro']})
+
+    return creates, updates, deletes, errors
+
+def _apply_batch(cursor, spec, user_id, creates, updates, deletes):
+    """Run a validated batch on cursor; returns created ids or raises LookupError for foreign ids"""
+    table = spec['table']
+    fields = list(spec['fields'])
+    column_of = lambda name: spec['columns'].get(name, name)
+
+    # Updated and deleted rows must all belong to the user
+    target_ids = sorted({item_id for item_id, _ in updates} | set(deletes))
+    if target_ids:
+        placeholders = ', '.join('?' for _ in target_ids)
+        cursor.execute(f'SELECT id FROM {table} WHERE user_id = ? AND id IN ({placeholders})',
+                       [user_id] + target_ids)
+        missing = set(target_ids) - {row[0] for row in cursor.fetchall()}
+        if missing and table == 'transactions':
+            # Archived transactions are listed too; bring them back to be changed
+            missing -= restore_ids(cursor, user_id, sorted(missing))
+        if missing:
+            raise LookupError(sorted(missing))
+
+    created_ids = []
+    if creates:
+        # One multi-row INSERT; ids of a single AUTOINCREMENT insert ascend in VALUES order
+        columns = ['user_id', 'created_ts'] + [column_of(name) for name in fields]
+        row_placeholders = '(' + ', '.join('?' for _ in columns) + ')'
+        created_ts = to_epoch(datetime.utcnow())
+        params = []
+        for values in creates:
+            params.extend((user_id, created_ts))
+            params.extend(values[name] for name in fields)
+        cursor.execute(f'INSERT INTO {table} ({", ".join(columns)}) '
+                       f'VALUES {", ".join(row_placeholders for _ in creates)} RETURNING id', params)
+        created_ids = sorted(row[0] for row in cursor.fetchall())
+
+    # Updates touching the same columns share one executemany
+    groups = {}
+    for item_id, values in updates:
+        names = tuple(sorted(values))
+        groups.setdefault(names, []).append([values[name] for name in names] + [item_id, user_id])
+    for names, rows in groups.items():
+        assignments = ', '.join(f'{column_of(name)} = ?' for name in names)
+        cursor.executemany(f'UPDATE {table} SET {assignments} WHERE id = ? AND user_id = ?', rows)
+
+    if deletes:
+        placeholders = ', '.join('?' for _ in deletes)
+        cursor.execute(f'DELETE FROM {table} WHERE user_id = ? AND id IN ({placeholders})',
+                       [user_id] + list(deletes))
+
+    if table == 'accounts':
+        AccountAlert.refresh(cursor, user_id=user_id)
+
+    return created_ids
+
+@api_bp.route('/tokens', methods=['GET', 'POST'])
+@login_required
+def tokens():
+    """List or issue API tokens for the logged-in user"""
+    if not current_user.get_plan_features().get('api'):
+        return _error('A API está disponível apenas no Plano Empresarial', 403)
+
+    if request.method == 'POST':
+        name = ((request.get_json(silent=True) or {}).get('name') or 'Integração').strip()[:100]
+        token, plain_token = ApiToken.create(current_user.id, name)
+        return jsonify({'id': token.id, 'name': token.name, 'token': plain_token}), 201
+
+    return jsonify({'tokens': [{'id': t.id, 'name': t.name, 'created_at': t.created_at,
+                                'last_used_at': t.last_used_at}
+                               for t in ApiToken.get_by_user_id(current_user.id)]})
+
+@api_bp.route('/tokens/<int:token_id>', methods=['DELETE'])
+@login_required
+def revoke_token(token_id):
+    if not ApiToken.revoke(token_id, current_user.id):
+        return _error('Token não encontrado', 404)
+    return '', 204
+
+@api_bp.route('/<resource>', methods=['GET'])
+@token_required
+@_resource_or_404
+def list_items(spec, resource):
+    """Cursor-paginated listing, newest first: pass next_cursor back as ?cursor="""
+    limit = min(MAX_PAGE_SIZE, max(1, request.args.get('limit', 50, type=int)))
+    cursor_id = request.args.get('cursor', type=int)
+    model = spec['model']
+
+    where = 'user_id = ?'
+    params = [g.api_user.id]
+    if cursor_id is not None:
+        where += ' AND id < ?'
+        params.append(cursor_id)
+
+    # A full listing is an export: archived transactions are included
+    archived = model is Transaction and archive_horizon() is not None
+    conn = db_manager.get_read_connection(g.api_user.id, archived=archived)
+    cursor = conn.cursor()
+    tables = [spec['table']]
+    if archived:
+        tables += [Transaction.archive_table(year) for year in Transaction.archive_years(cursor)]
+    sql = ' UNION ALL '.join(f'SELECT {model.COLUMNS} FROM {table} WHERE {where}' for table in tables)
+    cursor.execute(sql + ' ORDER BY id DESC LIMIT ?', params * len(tables) + [limit + 1])
+    rows = cursor.fetchall()
+    conn.close()
+
+    items = [model._from_row(row) for row in rows[:limit]]
+    return jsonify({
+        'data': [item.to_dict() for item in items],
+        'next_cursor': items[-1].id if len(rows) > limit else None
+    })
+
+@api_bp.route('/<resource>/batch', methods=['POST'])
+@token_required
+@_resource_or_404
+def batch(spec, resource):
+    """Create, update and delete many items in one database transaction.
+
+    Body: {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}"""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or any(not isinstance(body.get(op) or [], list)
+                                         for op in ('create', 'update', 'delete')):
+        return _error('Corpo JSON inválido', 400)
+
+    item_count = sum(len(body.get(op) or []) for op in ('create', 'update', 'delete'))
+    max_items = current_app.config['API_MAX_BATCH_ITEMS']
+    if item_count == 0:
+        return _error('Nenhum item enviado', 400)
+    if item_count > max_items:
+        return _error(f'Máximo de {max_items} itens por requisição', 413)
+
+    creates, updates, deletes, errors = _parse_batch(spec, body)
+    if errors:
+        return _error('Itens inválidos', 400, errors)
+
+    user_id = g.api_user.id
+    if db_manager.write_behind is not None:
+        # Apply after the user's journaled saves, not before them
+        db_manager.write_behind.wait_for(user_id)
+    conn = db_manager.for_user(user_id).get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN')
+        created_ids = _apply_batch(cursor, spec, user_id, creates, updates, deletes)
+        cursor.execute('COMMIT')
+    except LookupError as e:
+        cursor.execute('ROLLBACK')
+        return _error('Itens não encontrados', 404, {'ids': e.args[0]})
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    replica.touch(user_id)
+
+    summary = {'resource': resource, 'created': created_ids,
+               'updated': [item_id for item_id, _ in updates], 'deleted': list(deletes)}
+    publish(user_id, 'batch.applied', summary)
+    return jsonify(summary)
@@ -1,14 +1,26 @@
 import os
+import time
 import logging
+import tempfile
+import click
 from datetime import datetime, timedelta
 from utils import utc_to_brasilia
 
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from flask_login import LoginManager
 from werkzeug.middleware.proxy_fix import ProxyFix
+from compression import CompressionMiddleware
 
 # Import our new database system
 from database import db_manager, User
+from fragment_cache import FragmentCacheExtension
+from assets import init_assets
+from query_log import init_query_log
+from metrics import init_metrics
+from profiler import init_profiler
+from replica import init_replica
+from write_behind import init_write_behind
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -20,6 +32,42 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "financeiro-inteligente-secret-key")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+# gzip/brotli for text responses (HTML, JSON) of at least COMPRESSION_MIN_SIZE bytes
+app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                     level=int(os.environ.get('COMPRESSION_LEVEL', 6)),
+                                     brotli_quality=int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)),
+                                     minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', 500)))
+
+# Largest number of items (creates + updates + deletes) in one API batch request
+app.config['API_MAX_BATCH_ITEMS'] = int(os.environ.get('API_MAX_BATCH_ITEMS', 500))
+
+# Compiled templates are kept on disk so new workers skip the Jinja compile step
+JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR',
+                                          os.path.join(tempfile.gettempdir(), 'financeiro-jinja-bytecode'))
+os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)}
+
+# {% cache %} blocks for per-user rendered fragments
+app.jinja_env.add_extension(FragmentCacheExtension)
+
+# Fingerprinted, pre-compressed static assets (asset_url in templates)
+init_assets(app)
+
+# Per-request query tracing: Server-Timing header, structured log line, slow-query log
+init_query_log(app)
+
+# Prometheus metrics at /metrics (set METRICS_DIR when running several worker processes)
+init_metrics(app)
+
+# Opt-in sampling profiler (X-Profile header with PROFILE_TOKEN, or PROFILE_SAMPLE_RATE)
+init_profiler(app)
+
+# Opt-in local read replica of logged-in users' rows (LOCAL_REPLICA_PATH)
+init_replica(app)
+
+# Opt-in write-behind journal for model saves (WRITE_BEHIND_JOURNAL)
+init_write_behind(app)
+
 # Make datetime and timezone functions available in templates
 @app.context_processor
 def inject_datetime():
@@ -47,6 +95,7 @@ from financial import financial_bp
 from reports import reports_bp
 from subscription import subscription_bp
 from goals import goals_bp
+from api import api_bp
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
@@ -54,6 +103,7 @@ app.register_blueprint(financial_bp, url_prefix='/financial')
 app.register_blueprint(goals_bp, url_prefix='/goals')
 app.register_blueprint(reports_bp, url_prefix='/reports')
 app.register_blueprint(subscription_bp, url_prefix='/subscription')
+app.register_blueprint(api_bp, url_prefix='/api/v1')
 
 @app.route('/')
 def index():
@@ -66,7 +116,137 @@ def settings():
     from flask_login import login_required
     return render_template('settings/settings.html')
 
+@app.cli.command('sweep-subscriptions')
+def sweep_subscriptions_command():
+    """Expire lapsed trials and subscriptions now"""
+    from jobs import sweep_subscriptions
+    changed = sweep_subscriptions()
+    print(f"{changed} account(s) expired")
+
+@app.cli.command('scan-account-alerts')
+def scan_account_alerts_command():
+    """Rebuild overdue/due-soon account reminders for all users now"""
+    from jobs import scan_account_alerts
+    users_with_alerts = scan_account_alerts()
+    print(f"{users_with_alerts} user(s) with pending reminders")
+
+@app.cli.command('run-jobs')
+def run_jobs_command():
+    """Run the periodic maintenance jobs in this process until interrupted"""
+    from jobs import start_background_jobs
+    start_background_jobs()
+    print("Background jobs running; press Ctrl+C to stop")
+    while True:
+        time.sleep(3600)
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the transaction full-text search index"""
+    from database import Transaction
+    Transaction.rebuild_search_index()
+    print("Search index rebuilt")
+
+@app.cli.command('archive-transactions')
+def archive_transactions_command():
+    """Move transactions older than TRANSACTION_ARCHIVE_DAYS into the yearly archive tables
+    (and newer archived ones back; with 0, all of them)"""
+    from archive import archive_transactions
+    archived, restored = archive_transactions()
+    print(f"{archived} transaction(s) archived, {restored} restored")
+
+@app.cli.command('rebalance-shards')
+@click.option('--user', 'user_id', type=int, help='move only this user')
+@click.option('--to', 'target', type=int, help='target shard for --user (default: the shard its id hashes to)')
+@click.option('--limit', type=int, help='move at most this many users')
+@click.option('--dry-run', is_flag=True, help='list the moves without making them')
+def rebalance_shards_command(user_id, target, limit, dry_run):
+    """Move users onto the shard their id hashes to (run after adding a shard), online"""
+    from database import jump_hash
+    from shards import misplaced_users, move_users
+    if not db_manager.shards:
+        print("DATABASE_SHARDS is not set")
+        return
+    if user_id is not None:
+        target = jump_hash(user_id, len(db_manager.shards)) if target is None else target
+        moves = [(user_id, db_manager.shard_of(user_id, cached=False), target)]
+    else:
+        moves = misplaced_users()[:limit]
+    for moved_user, source, destination in moves:
+        print(f"user {moved_user}: shard {source} -> {destination}")
+    if dry_run or not moves:
+        print(f"{len(moves)} user(s) to move")
+        return
+    copied = move_users([(moved_user, destination) for moved_user, _, destination in moves])
+    print(f"{len(copied)} user(s) moved, {sum(copied.values())} row(s) copied")
+
+def precompile_templates():
+    """Load every template under templates/ so it is compiled (and written to the
+    bytecode cache) before the first request; returns how many were loaded"""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+@app.cli.command('precompile-templates')
+def precompile_templates_command():
+    """Compile all templates into the bytecode cache (run at build time)"""
+    app.jinja_env.cache.clear()
+    start = time.perf_counter()
+    count = precompile_templates()
+    print(f"{count} template(s) compiled into {JINJA_BYTECODE_CACHE_DIR} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+@app.cli.command('assets-build')
+def assets_build_command():
+    """Fingerprint static CSS/JS and pre-compress gzip/brotli variants into static/dist"""
+    from assets import build_assets, load_manifest, brotli, DIST_DIR
+    manifest = build_assets()
+    load_manifest()
+    encodings = 'gzip + brotli' if brotli is not None else 'gzip (install brotli for .br variants)'
+    print(f"{len(manifest)} asset(s) built into {DIST_DIR} with {encodings}")
+
+@app.cli.command('profile-summary')
+def profile_summary_command():
+    """Merge retained request profiles per endpoint and show where samples landed"""
+    from profiler import aggregate_profiles, self_time, PROFILE_DIR
+    results = aggregate_profiles()
+    if not results:
+        print(f"No profiles in {PROFILE_DIR}")
+        return
+    for endpoint, (profiles, samples) in results.items():
+        total = sum(samples.values())
+        print(f"{endpoint}: {profiles} profile(s), {total} sample(s) -> {PROFILE_DIR}/{endpoint}.folded")
+        for frame, count in self_time(samples).most_common(10):
+            print(f"  {count / total:6.1%}  {frame}")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any transaction filter combination scans a large table (see query_plans.py;
+    benchmarks/check_query_plans.py checks every statement the app issues)"""
+    import sys
+    from query_plans import check_statements, transaction_query_statements
+    
+    failures = check_statements(transaction_query_statements())
+    for origin, sql, violations in failures:
+        print(f"FAIL {origin}: {'; '.join(violations)}")
+    
+    if failures:
+        sys.exit(1)
+    print("All transaction query plans use an index")
+
 # Initialize database on startup
 with app.app_context():
     db_manager.init_db()
-    logging.info("SQLite3 database initialized successfully")
\ No newline at end of file
+    logging.info("SQLite3 database initialized successfully")
+
+# Warm the template cache so the first request of each page does not compile
+if os.environ.get('PRECOMPILE_TEMPLATES', '1') == '1':
+    start = time.perf_counter()
+    count = precompile_templates()
+    logging.info(f"Precompiled {count} template(s) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+# Periodic maintenance (subscription expiry sweep, account alert scan, archiving) runs
+# in one process only: the one serving requests with RUN_BACKGROUND_JOBS=1, or
+# `flask run-jobs`. Never on import, so CLI commands, tests and benchmarks skip it
+from jobs import RUN_BACKGROUND_JOBS, start_background_jobs
+if RUN_BACKGROUND_JOBS:
+    app.before_request(start_background_jobs)
\ No newline at end of file
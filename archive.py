@@ -0,0 +1,111 @@
+import logging
+from datetime import datetime
+from database import db_manager, Transaction, archive_horizon, to_epoch
+
+# Adds (sign 1) or removes (sign -1) some of one user's rows from the monthly rollups
+_ROLLUP_SQL = '''
+    INSERT INTO transaction_rollups (user_id, month_ts, transaction_type, category, total, count)
+    SELECT user_id, CAST(strftime('%s', date_ts, 'unixepoch', 'start of month') AS INTEGER) AS month_ts,
+           transaction_type, COALESCE(category, '') AS category, ? * SUM(amount), ? * COUNT(*)
+    FROM {table}
+    WHERE user_id = ? AND {condition}
+    GROUP BY month_ts, transaction_type, COALESCE(category, '')
+    ON CONFLICT (user_id, month_ts, transaction_type, category)
+    DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+'''
+
+def _year_bounds(year):
+    return to_epoch(datetime(year, 1, 1)), to_epoch(datetime(year + 1, 1, 1))
+
+def _move(cursor, user_id, source, destination, start, end, sign):
+    """Move one user's rows dated start <= date_ts < end between a live and an archive table"""
+    cursor.execute(_ROLLUP_SQL.format(table=source, condition='date_ts >= ? AND date_ts < ?'),
+                   (sign, sign, user_id, start, end))
+    cursor.execute(f'INSERT INTO {destination} ({Transaction.COLUMNS}) SELECT {Transaction.COLUMNS} FROM {source} '
+                   'WHERE user_id = ? AND date_ts >= ? AND date_ts < ?', (user_id, start, end))
+    moved = cursor.rowcount
+    cursor.execute(f'DELETE FROM {source} WHERE user_id = ? AND date_ts >= ? AND date_ts < ?', (user_id, start, end))
+    return moved
+
+def restore_ids(cursor, user_id, ids):
+    """Move the user's archived transactions with these ids back into transactions,
+    taking them out of the rollups; returns the ids found. The next archive run
+    archives them again if they are still past the horizon"""
+    restored = set()
+    for year in Transaction.archive_years(cursor):
+        table = Transaction.archive_table(year)
+        placeholders = ', '.join('?' for _ in ids)
+        cursor.execute(f'SELECT id FROM {table} WHERE user_id = ? AND id IN ({placeholders})', [user_id, *ids])
+        found = [row[0] for row in cursor.fetchall()]
+        if not found:
+            continue
+        condition = f"id IN ({', '.join('?' for _ in found)})"
+        cursor.execute(_ROLLUP_SQL.format(table=table, condition=condition), [-1, -1, user_id, *found])
+        cursor.execute(f'INSERT INTO transactions ({Transaction.COLUMNS}) SELECT {Transaction.COLUMNS} FROM {table} '
+                       f'WHERE user_id = ? AND {condition}', [user_id, *found])
+        cursor.execute(f'DELETE FROM {table} WHERE user_id = ? AND {condition}', [user_id, *found])
+        restored.update(found)
+    if restored:
+        cursor.execute('DELETE FROM transaction_rollups WHERE user_id = ? AND count <= 0', (user_id,))
+    return restored
+
+def _archive_user(cursor, user_id, cutoff):
+    """Archive the user's rows dated before cutoff and restore archived rows from cutoff on
+    (all of them when cutoff is None); returns (archived, restored)"""
+    archived = restored = 0
+    if cutoff is not None:
+        cursor.execute('''
+            SELECT DISTINCT CAST(strftime('%Y', date_ts, 'unixepoch') AS INTEGER) FROM transactions
+            WHERE user_id = ? AND date_ts < ?
+        ''', (user_id, cutoff))
+        for (year,) in cursor.fetchall():
+            start, end = _year_bounds(year)
+            Transaction.create_archive_table(cursor, year)
+            archived += _move(cursor, user_id, 'transactions', Transaction.archive_table(year),
+                              start, min(end, cutoff), 1)
+
+    # Rows the horizon no longer covers (it was raised, or archiving turned off) go back
+    for year in Transaction.archive_years(cursor, cutoff):
+        start, end = _year_bounds(year)
+        restored += _move(cursor, user_id, Transaction.archive_table(year), 'transactions',
+                          max(start, cutoff or start), end, -1)
+    if restored:
+        cursor.execute('DELETE FROM transaction_rollups WHERE user_id = ? AND count <= 0', (user_id,))
+    return archived, restored
+
+def archive_transactions(now=None):
+    """Move every user's transactions older than TRANSACTION_ARCHIVE_DAYS into the
+    per-year archive tables, and archived rows newer than that back into transactions.
+
+    Archived rows are summed into transaction_rollups in the same database transaction,
+    so monthly summaries, category totals and counts are unchanged; detail reads union
+    an archive table in only when their date range reaches its year. Archived rows are
+    no longer found by full-text search or changed by model updates; API batch updates
+    and deletes restore them first (restore_ids). Returns (archived, restored)."""
+    cutoff = archive_horizon(now)
+    archived = restored = 0
+    for shard in db_manager.all_shards():
+        conn = shard.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM users')
+        user_ids = [row[0] for row in cursor.fetchall()]
+
+        # One database transaction per user keeps the write lock short
+        for user_id in user_ids:
+            try:
+                cursor.execute('BEGIN')
+                user_archived, user_restored = _archive_user(cursor, user_id, cutoff)
+                cursor.execute('COMMIT')
+            except Exception:
+                try:
+                    cursor.execute('ROLLBACK')
+                except Exception:
+                    pass
+                raise
+            archived += user_archived
+            restored += user_restored
+        conn.close()
+
+    if archived or restored:
+        logging.info(f"Transaction archive moved {archived} row(s) out and {restored} row(s) back")
+    return archived, restored
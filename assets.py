@@ -0,0 +1,111 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+from flask import request, send_from_directory, url_for, abort
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are generated without it
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Build output (fingerprinted files, compressed variants, manifest); not versioned
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+
+# Source directories under static/ that are fingerprinted
+ASSET_DIRS = ('css', 'js')
+
+# Fingerprinted names never change content, so clients may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Pre-compressed variants in order of preference: (Accept-Encoding token, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = None
+
+def _fingerprinted_name(path, content):
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Write content-hashed copies of static assets plus .gz/.br variants and a
+    manifest mapping each source path to its hashed name; returns the manifest.
+    
+    Files from earlier builds are left in place so pages rendered by workers
+    still on the previous manifest keep loading during a rolling deploy."""
+    manifest = {}
+    for asset_dir in ASSET_DIRS:
+        for folder, _, files in os.walk(os.path.join(static_dir, asset_dir)):
+            for filename in sorted(files):
+                source = os.path.join(folder, filename)
+                path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    content = f.read()
+
+                hashed = _fingerprinted_name(path, content)
+                target = os.path.join(dist_dir, hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(content)
+                # mtime=0 keeps the gzip bytes identical across builds
+                with open(target + '.gz', 'wb') as f:
+                    f.write(gzip.compress(content, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as f:
+                        f.write(brotli.compress(content, quality=11))
+                manifest[path] = hashed
+
+    os.makedirs(dist_dir, exist_ok=True)
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(dist_dir=DIST_DIR):
+    """Read the build manifest; without a build, assets fall back to /static"""
+    global _manifest
+    try:
+        with open(os.path.join(dist_dir, 'manifest.json')) as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+def asset_url(filename):
+    """url_for('static', filename=...) replacement that emits the fingerprinted name"""
+    if _manifest is None:
+        load_manifest()
+    hashed = _manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=hashed)
+
+def serve_asset(filename):
+    """Serve a fingerprinted asset, picking the best pre-compressed variant the client accepts"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    for encoding, suffix in ENCODINGS:
+        # Quality lookup honours q=0 and '*'
+        if request.accept_encodings[encoding] > 0 and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+            response = send_from_directory(DIST_DIR, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        if not os.path.isfile(os.path.join(DIST_DIR, filename)):
+            abort(404)
+        response = send_from_directory(DIST_DIR, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+def init_assets(app):
+    """Register the fingerprinted asset route and the asset_url template helper"""
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+    manifest = load_manifest()
+    if not manifest:
+        logging.info("No asset manifest found; run 'flask assets-build' to serve fingerprinted assets")
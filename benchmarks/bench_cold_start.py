@@ -0,0 +1,88 @@
+"""First-request latency per route in a fresh process: no bytecode cache,
+warm bytecode cache, and bytecode cache plus template precompilation at startup.
+
+Usage: python benchmarks/bench_cold_start.py [--runs 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ['/dashboard/', '/financial/cash-flow', '/financial/accounts', '/goals/',
+          '/reports/', '/subscription/plans', '/auth/login']
+
+# Runs in a child process so every measurement starts from an empty process
+CHILD = '''
+import json, logging, sys, time
+sys.path.insert(0, {root!r})
+logging.disable(logging.CRITICAL)
+start = time.perf_counter()
+from app import app
+startup_ms = (time.perf_counter() - start) * 1000
+client = app.test_client()
+with client.session_transaction() as session:
+    session['_user_id'] = '1'
+start = time.perf_counter()
+status = client.get({route!r}).status_code
+print(json.dumps({{'startup_ms': startup_ms, 'first_ms': (time.perf_counter() - start) * 1000, 'status': status}}))
+'''
+
+def run_child(route, env):
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT, route=route)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    base_env = dict(os.environ, DATABASE_URL=os.path.join(workdir, 'bench.db'),
+                    SUBSCRIPTION_SWEEP_INTERVAL='3600', ACCOUNT_ALERT_SCAN_INTERVAL='3600')
+
+    # One user with a few rows so every page renders its full layout
+    subprocess.run([sys.executable, '-c', f'''
+import logging, sys
+sys.path.insert(0, {ROOT!r})
+logging.disable(logging.CRITICAL)
+from datetime import datetime
+from database import User, Transaction, Account
+user = User.create('bench', 'bench@example.com', 'senha123', 'Bench User')
+for i in range(20):
+    Transaction(user_id=user.id, description=f'Venda {{i}}', amount=100 + i, transaction_type='income',
+                category='vendas', date=datetime.utcnow()).save()
+Account(user_id=user.id, name='Fornecedor', account_type='payable', amount=50, due_date=datetime.utcnow()).save()
+'''], env=base_env, check=True)
+
+    warm_dir = os.path.join(workdir, 'bytecode-warm')
+    subprocess.run([sys.executable, '-m', 'flask', 'precompile-templates'], cwd=ROOT, capture_output=True,
+                   env=dict(base_env, FLASK_APP='app', JINJA_BYTECODE_CACHE_DIR=warm_dir), check=True)
+
+    modes = [
+        ('no cache', lambda run: dict(base_env, PRECOMPILE_TEMPLATES='0',
+                                      JINJA_BYTECODE_CACHE_DIR=os.path.join(workdir, f'bytecode-empty-{run}'))),
+        ('bytecode cache', lambda run: dict(base_env, PRECOMPILE_TEMPLATES='0', JINJA_BYTECODE_CACHE_DIR=warm_dir)),
+        ('bytecode + precompile', lambda run: dict(base_env, PRECOMPILE_TEMPLATES='1', JINJA_BYTECODE_CACHE_DIR=warm_dir))
+    ]
+
+    print(f"median of {args.runs} fresh processes, first request ms (startup ms)")
+    print(f"{'route':<22}" + ''.join(f"{label:>26}" for label, _ in modes))
+    for route in ROUTES:
+        cells = []
+        for label, make_env in modes:
+            results = []
+            for run in range(args.runs):
+                results.append(run_child(route, make_env(f'{route.strip("/").replace("/", "-")}-{run}')))
+            first = statistics.median(r['first_ms'] for r in results)
+            startup = statistics.median(r['startup_ms'] for r in results)
+            cells.append(f"{first:>14.1f} ({startup:>7.1f})")
+        print(f"{route:<22}" + ''.join(f"{cell:>26}" for cell in cells))
+
+if __name__ == '__main__':
+    main()
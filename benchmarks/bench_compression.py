@@ -0,0 +1,76 @@
+"""Bytes saved by CompressionMiddleware on a realistic full-history ledger page
+(/financial/cash-flow) and the report page, per encoding and level.
+
+Usage: python benchmarks/bench_compression.py [--transactions 2000]
+"""
+import argparse
+import gzip
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DESCRIPTIONS = ['Venda balcão', 'Pagamento fornecedor', 'Aluguel loja', 'Energia elétrica',
+                'Internet fibra', 'Serviço de consultoria', 'Compra de material', 'Imposto DAS']
+CATEGORIES = ['vendas', 'servicos', 'fornecedores', 'impostos', 'despesas_gerais']
+
+def populate(count, seed=42):
+    from database import User, Transaction
+    rng = random.Random(seed)
+    user = User.create('ledger', 'ledger@example.com', 'senha123', 'Ledger User')
+    start = datetime.utcnow() - timedelta(days=365)
+    for i in range(count):
+        Transaction(user_id=user.id, description=f'{rng.choice(DESCRIPTIONS)} #{i}',
+                    amount=round(rng.uniform(10, 5000), 2), transaction_type=rng.choice(('income', 'expense')),
+                    category=rng.choice(CATEGORIES),
+                    date=start + timedelta(seconds=rng.randint(0, 365 * 86400))).save()
+    return user
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = os.path.join(tempfile.mkdtemp(), 'bench_compression.db')
+    os.environ['PRECOMPILE_TEMPLATES'] = '0'
+    logging.disable(logging.CRITICAL)
+    from app import app
+    from compression import CompressionMiddleware, brotli
+
+    user = populate(args.transactions)
+    inner = app.wsgi_app.app  # the app without the compression layer
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+    cases = [('identity', None, 'identity')]
+    cases += [(f'gzip level {level}', CompressionMiddleware(inner, level=level), 'gzip') for level in (1, 6, 9)]
+    if brotli is not None:
+        cases += [(f'br quality {quality}', CompressionMiddleware(inner, brotli_quality=quality), 'br')
+                  for quality in (1, 5, 11)]
+
+    for path in ('/financial/cash-flow', '/reports/'):
+        app.wsgi_app = inner
+        original = client.get(path).data
+        print(f"\n{path} ({args.transactions} transactions)")
+        print(f"{'encoding':<16} {'bytes':>10} {'saved':>8} {'ms':>8}")
+        for label, middleware, accept in cases:
+            app.wsgi_app = middleware or inner
+            start = time.perf_counter()
+            response = client.get(path, headers={'Accept-Encoding': accept})
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            body = response.data
+            encoding = response.headers.get('Content-Encoding')
+            decoded = gzip.decompress(body) if encoding == 'gzip' else \
+                brotli.decompress(body) if encoding == 'br' else body
+            assert decoded == original, f'{label}: decoded body differs'
+            saved = 1 - len(body) / len(original)
+            print(f"{label:<16} {len(body):>10,} {saved:>8.1%} {elapsed_ms:>8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Model hydration throughput and memory: __slots__/lazy-date models vs. the
+previous eager-parsing classes.
+
+Usage: python benchmarks/bench_hydration.py [--rows 100000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class EagerTransaction:
+    """The Transaction class as it was before __slots__ and lazy dates"""
+
+    def __init__(self, id=None, user_id=None, description=None, amount=None,
+                 transaction_type=None, category=None, date=None, created_at=None,
+                 is_recurring=None, recurrence_type=None, account_id=None):
+        self.id = id
+        self.user_id = user_id
+        self.description = description
+        self.amount = float(amount) if amount else 0.0
+        self.transaction_type = transaction_type
+        self.category = category
+        self.date = self._parse_datetime(date)
+        self.created_at = self._parse_datetime(created_at)
+        self.is_recurring = bool(is_recurring) if is_recurring else False
+        self.recurrence_type = recurrence_type
+        self.account_id = account_id
+
+    def _parse_datetime(self, date_str):
+        if date_str is None:
+            return None
+        if isinstance(date_str, datetime):
+            return date_str
+        if isinstance(date_str, str):
+            try:
+                return datetime.fromisoformat(date_str.replace('Z', '+00:00').replace('+00:00', ''))
+            except ValueError:
+                try:
+                    return datetime.fromisoformat(date_str.split('+')[0].split('Z')[0])
+                except ValueError:
+                    return None
+        return None
+
+def eager_from_row(row):
+    return EagerTransaction(
+        id=row[0], user_id=row[1], description=row[2], amount=row[3],
+        transaction_type=row[4], category=row[5], date=row[6], created_at=row[7],
+        is_recurring=row[8], recurrence_type=row[9], account_id=row[10]
+    )
+
+def make_rows(count, seed=42):
+    """Rows shaped like a transactions SELECT: (legacy rows mixing the old text
+    date formats, current rows with epoch-second columns)"""
+    from database import to_epoch
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    legacy_rows, rows = [], []
+    for i in range(count):
+        moment = start + timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+        date_value = rng.choice((moment.isoformat(), moment.strftime('%Y-%m-%d %H:%M:%S'),
+                                 moment.isoformat() + 'Z'))
+        fields = (i + 1, rng.randint(1, 100), f'Transação {i}', round(rng.uniform(1, 5000), 2),
+                  rng.choice(('income', 'expense')), 'vendas')
+        legacy_rows.append(fields + (date_value, moment.strftime('%Y-%m-%d %H:%M:%S'), 0, None, None))
+        rows.append(fields + (to_epoch(moment), to_epoch(moment), 0, None, None))
+    return legacy_rows, rows
+
+def measure(label, build, rows, touch_dates):
+    gc.collect()
+    start = time.perf_counter()
+    objects = [build(row) for row in rows]
+    if touch_dates:
+        for obj in objects:
+            obj.date
+    elapsed = time.perf_counter() - start
+    del objects
+
+    gc.collect()
+    tracemalloc.start()
+    objects = [build(row) for row in rows]
+    if touch_dates:
+        for obj in objects:
+            obj.date
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    print(f"{label:<34} {len(rows) / elapsed:>12,.0f} rows/s {memory / 1024 / 1024:>9.1f} MiB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', ':memory:')
+    from database import Transaction
+
+    legacy_rows, rows = make_rows(args.rows)
+    print(f"{args.rows:,} rows")
+    print(f"{'case':<34} {'throughput':>19} {'memory':>13}")
+    measure('eager classes', eager_from_row, legacy_rows, touch_dates=False)
+    measure('slots + lazy dates', Transaction._from_row, rows, touch_dates=False)
+    measure('slots + lazy dates, dates read', Transaction._from_row, rows, touch_dates=True)
+    measure('slots + lazy text dates, dates read', Transaction._from_row, legacy_rows, touch_dates=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Cash-flow ledger rendering: per-row utc_to_brasilia/strftime in the template
+vs. rows pre-formatted in the view with the batch helpers in utils.
+
+Usage: python benchmarks/bench_ledger_render.py [--rows 50000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The cells of templates/financial/cash_flow.html that depend on formatting,
+# before and after the change
+PER_ROW_TEMPLATE = '''{% for transaction in transactions %}
+<td>{{ utc_to_brasilia(transaction.date).strftime('%d/%m/%Y') if transaction.date else '-' }}</td>
+<td>{{ '+' if transaction.transaction_type == 'income' else '-' }}R$ {{ "%.2f"|format(transaction.amount|float) }}</td>
+{% endfor %}'''
+
+PRE_FORMATTED_TEMPLATE = '''{% for transaction, date_label, amount_label in rows %}
+<td>{{ date_label }}</td>
+<td>{{ amount_label }}</td>
+{% endfor %}'''
+
+def make_transactions(count, seed=42):
+    from database import Transaction, to_epoch
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    return [Transaction._from_row((i + 1, 1, f'Transação {i}', round(rng.uniform(1, 50000), 2),
+                                   rng.choice(('income', 'expense')), 'vendas',
+                                   to_epoch(start + timedelta(seconds=rng.randint(0, 3 * 365 * 86400))),
+                                   None, 0, None, None))
+            for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', ':memory:')
+    from jinja2 import Environment
+    from utils import utc_to_brasilia, format_brasilia_dates, format_currency_many
+
+    env = Environment()
+    per_row = env.from_string(PER_ROW_TEMPLATE)
+    pre_formatted = env.from_string(PRE_FORMATTED_TEMPLATE)
+
+    def render_per_row():
+        # Fresh rows each run: the lazy dates must be decoded like on a real request
+        transactions = make_transactions(args.rows)
+        start = time.perf_counter()
+        per_row.render(transactions=transactions, utc_to_brasilia=utc_to_brasilia)
+        return time.perf_counter() - start
+
+    def render_pre_formatted():
+        transactions = make_transactions(args.rows)
+        start = time.perf_counter()
+        dates = format_brasilia_dates([t.date_ts for t in transactions])
+        amounts = format_currency_many([t.amount for t in transactions])
+        rows = [(t, date_label, ('+' if t.transaction_type == 'income' else '-') + amount_label)
+                for t, date_label, amount_label in zip(transactions, dates, amounts)]
+        pre_formatted.render(rows=rows)
+        return time.perf_counter() - start
+
+    print(f"{args.rows:,} rows, median of {args.repeat}")
+    for label, render in (('per-row conversion in template', render_per_row),
+                          ('pre-formatted rows', render_pre_formatted)):
+        elapsed_ms = statistics.median(render() * 1000 for _ in range(args.repeat))
+        print(f"{label:<32} {elapsed_ms:>10.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Queries per page for a seeded tenant, checked against per-route budgets with
+query_log.assert_max_queries, plus the cost of query tracing itself.
+
+Usage: python benchmarks/bench_query_counts.py [--transactions 2000] [--repeat 5]
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Most statements each page may run once its fragment caches are warm (login lookup included)
+QUERY_BUDGETS = {
+    '/dashboard/': 2,
+    '/financial/transactions': 3,
+    '/financial/cash-flow': 3,
+    '/financial/accounts': 3,
+    '/goals/': 3,
+    '/reports/': 2
+}
+
+def populate(count, seed=42):
+    from database import User, Transaction, Account, FinancialGoal
+    rng = random.Random(seed)
+    user = User.create('queries', 'queries@example.com', 'senha123', 'Query Budget')
+    start = datetime.utcnow() - timedelta(days=365)
+    for i in range(count):
+        Transaction(user_id=user.id, description=f'Lançamento {i}', amount=round(rng.uniform(10, 5000), 2),
+                    transaction_type=rng.choice(('income', 'expense')), category='vendas',
+                    date=start + timedelta(seconds=rng.randint(0, 365 * 86400))).save()
+    for i in range(20):
+        Account(user_id=user.id, name=f'Conta {i}', account_type=rng.choice(('payable', 'receivable')),
+                amount=100 + i, due_date=datetime.utcnow() + timedelta(days=i - 10)).save()
+    FinancialGoal(user_id=user.id, title='Reserva', target_amount=10000,
+                  target_date=datetime.utcnow() + timedelta(days=90)).save()
+    return user
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = os.path.join(tempfile.mkdtemp(), 'bench_query_counts.db')
+    os.environ['PRECOMPILE_TEMPLATES'] = '0'
+    logging.disable(logging.CRITICAL)
+    from app import app
+    from database import db_manager
+    from query_log import assert_max_queries
+
+    user = populate(args.transactions)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+    failures = 0
+    print(f"{'route':<34} {'status':>6} {'queries':>8} {'db ms':>8} {'budget':>7}")
+    for path, budget in QUERY_BUDGETS.items():
+        client.get(path)  # warm caches so the budget covers the steady state
+        try:
+            with assert_max_queries(budget) as stats:
+                status = client.get(path).status_code
+            verdict = ''
+        except AssertionError as error:
+            failures += 1
+            verdict = '\n' + str(error)
+        print(f"{path:<34} {status:>6} {stats.count:>8} {stats.elapsed_ms:>8.1f} {budget:>7}{verdict}")
+
+    def median_ms(path):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            client.get(path)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    print(f"\nTracing overhead on /financial/cash-flow (median of {args.repeat})")
+    traced = median_ms('/financial/cash-flow')
+    # Drop every listener (query log and metrics) so connections are not wrapped
+    listeners = list(db_manager.query_listeners)
+    for listener in listeners:
+        db_manager.remove_query_listener(listener)
+    untraced = median_ms('/financial/cash-flow')
+    print(f"{'traced':<12} {traced:>8.1f} ms\n{'untraced':<12} {untraced:>8.1f} ms")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""End-to-end route load test: synthetic tenants hit the dashboard, chart data,
+cash flow, reports and PDF export concurrently through the Flask test client.
+
+Reports p50/p95/p99 latency and throughput per route and exits non-zero when a
+route's p95 exceeds its budget, or regresses against a saved baseline.
+
+Usage: python benchmarks/bench_routes.py [--users 20] [--transactions 500]
+           [--concurrency 8] [--requests 100] [--baseline FILE [--save-baseline]]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Route -> p95 budget in milliseconds at the default dataset size
+ROUTES = {
+    '/dashboard/': 150,
+    '/dashboard/chart-data': 200,
+    '/financial/cash-flow': 500,
+    '/reports/': 150,
+    '/reports/export-pdf': 1000
+}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def run_route(app, path, user_ids, concurrency, requests, seed):
+    """Send requests to path from concurrency threads, each logged in as a random tenant;
+    returns (latencies in ms, wall-clock seconds, non-200 count)"""
+    rng = random.Random(seed)
+    plan = [rng.choice(user_ids) for _ in range(requests)]
+    clients = threading.local()
+    errors = []
+
+    def client_for(user_id):
+        cache = clients.__dict__.setdefault('by_user', {})
+        client = cache.get(user_id)
+        if client is None:
+            client = cache[user_id] = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+        return client
+
+    def one(user_id):
+        client = client_for(user_id)
+        start = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            errors.append(response.status_code)
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, plan))
+    return latencies, time.perf_counter() - start, len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=500, help='mean transactions per user')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to --baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 regression vs. baseline')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_routes.db')
+    os.environ['DATABASE_URL'] = path
+    os.environ['PRECOMPILE_TEMPLATES'] = '1'
+    logging.disable(logging.CRITICAL)
+    from synthetic import generate
+    user_ids = generate(path, users=args.users, transactions=args.transactions, seed=args.seed)
+    from app import app
+    from database import User
+
+    # PDF export and reports are paid features; keep tenants whose plan includes them
+    paid = [user_id for user_id in user_ids if User.get_by_id(user_id).get_plan_features()['reports']]
+
+    results, skipped = {}, []
+    print(f"{len(user_ids)} tenants ({len(paid)} paid), {args.concurrency} threads, {args.requests} requests per route")
+    print(f"{'route':<24} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'errors':>7} {'budget':>7}")
+    for route, budget in ROUTES.items():
+        tenants = paid if route.startswith('/reports/') else user_ids
+        # Small datasets may have no paid tenant; there is nothing to measure then
+        if not tenants:
+            skipped.append(route)
+            print(f"{route:<24} {'skipped: no paid tenants':>40}")
+            continue
+        # One untimed pass per tenant primes template and fragment caches
+        run_route(app, route, tenants, args.concurrency, len(tenants), args.seed)
+        latencies, wall, errors = run_route(app, route, tenants, args.concurrency, args.requests, args.seed)
+        results[route] = {
+            'p50': statistics.median(latencies),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'throughput': args.requests / wall,
+            'errors': errors
+        }
+        r = results[route]
+        print(f"{route:<24} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} {r['throughput']:>8.1f} {errors:>7} {budget:>7}")
+
+    failures = [f"{route}: p95 {r['p95']:.1f} ms over budget {ROUTES[route]} ms"
+                for route, r in results.items() if r['p95'] > ROUTES[route]]
+    failures += [f"{route}: {r['errors']} non-200 response(s)" for route, r in results.items() if r['errors']]
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for route, r in results.items():
+            previous = baseline.get(route)
+            if previous and r['p95'] > previous['p95'] * (1 + args.tolerance):
+                failures.append(f"{route}: p95 {r['p95']:.1f} ms regressed from {previous['p95']:.1f} ms "
+                                f"(> {args.tolerance:.0%})")
+
+    if skipped:
+        print(f"\nSkipped (no paid tenants): {', '.join(skipped)}")
+    if failures:
+        print('\nFAIL\n' + '\n'.join(failures))
+        sys.exit(1)
+    print('\nOK')
+
+if __name__ == '__main__':
+    main()
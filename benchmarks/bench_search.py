@@ -0,0 +1,99 @@
+"""Full-text transaction search vs. LIKE scan on a large local ledger.
+
+Usage: python benchmarks/bench_search.py [--rows 1000000] [--users 1000] [--db PATH]
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ['pagamento', 'fornecedor', 'venda', 'serviço', 'aluguel', 'energia', 'internet',
+         'café', 'material', 'escritório', 'imposto', 'salário', 'consultoria', 'marketing',
+         'transporte', 'combustível', 'manutenção', 'licença', 'software', 'cliente']
+CATEGORIES = ['vendas', 'servicos', 'marketing', 'fornecedores', 'impostos', 'despesas_gerais', 'outros']
+QUERIES = ['café', 'aluguel energia', 'consult', 'software licença', 'loja137']
+
+# Realistic vocabulary: a few very common words plus a long tail of merchant names
+VOCABULARY = WORDS + [f'loja{n}' for n in range(5000)]
+CUM_WEIGHTS = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+def populate(path, rows, users, seed=42):
+    from database import Database
+    Database(path)  # creates schema, FTS table and triggers
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO users (id, username, email, password_hash, full_name) VALUES (?, ?, ?, ?, ?)',
+                     [(u, f'user{u}', f'user{u}@example.com', '-', f'User {u}') for u in range(1, users + 1)])
+    batch = []
+    for _ in range(rows):
+        description = ' '.join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=rng.randint(2, 4)))
+        batch.append((rng.randint(1, users), description, round(rng.uniform(5, 5000), 2),
+                      rng.choice(('income', 'expense')), rng.choice(CATEGORIES)))
+        if len(batch) == 50000:
+            conn.executemany('INSERT INTO transactions (user_id, description, amount, transaction_type, category) '
+                             'VALUES (?, ?, ?, ?, ?)', batch)
+            batch.clear()
+    if batch:
+        conn.executemany('INSERT INTO transactions (user_id, description, amount, transaction_type, category) '
+                         'VALUES (?, ?, ?, ?, ?)', batch)
+    conn.commit()
+    conn.close()
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='reuse/populate this SQLite file instead of a temporary one')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+    os.environ['DATABASE_URL'] = path
+
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        populate(path, args.rows, args.users)
+        print(f"Populated {args.rows} rows for {args.users} users in {time.perf_counter() - start:.1f}s ({path})")
+
+    from database import Transaction
+    conn = sqlite3.connect(path)
+    user_id = args.users // 2
+
+    print(f"{'query':<20} {'fts ms':>10} {'like ms':>10} {'matches':>8}")
+    for query in QUERIES:
+        fts_ms = timed(lambda: Transaction.search(user_id, query, per_page=20), args.repeat)
+        _, matches = Transaction.search(user_id, query, per_page=20)
+
+        # The LIKE alternative has to scan every tenant's rows, once for the
+        # total and once for the page
+        like_filter = ' AND '.join('description LIKE ?' for _ in query.split())
+        like_params = (user_id,) + tuple(f'%{term}%' for term in query.split())
+
+        def like_search():
+            conn.execute(f'SELECT COUNT(*) FROM transactions WHERE user_id = ? AND {like_filter}', like_params).fetchone()
+            conn.execute(f'SELECT id FROM transactions WHERE user_id = ? AND {like_filter} '
+                         'ORDER BY date_ts DESC LIMIT 20', like_params).fetchall()
+
+        like_ms = timed(like_search, args.repeat)
+
+        print(f"{query:<20} {fts_ms:>10.2f} {like_ms:>10.2f} {matches:>8}")
+    conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""EXPLAIN QUERY PLAN regression check for every statement the app issues.
+
+Builds a populated local database with the synthetic tenant generator, drives
+every page, API endpoint, model method and background job while a
+query_plans.StatementCollector records each distinct statement, then explains
+them all (plus every TransactionQuery filter combination). Exits 1 if any plan
+scans a large table without an ALLOWED_SCANS entry in query_plans.py.
+
+Usage: python benchmarks/check_query_plans.py [--users 20] [--transactions 500] [--verbose]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Archive horizon (days) while statements are collected
+ARCHIVE_DAYS = 180
+
+# Endpoints that never finish (event stream) or end the session
+SKIPPED_ENDPOINTS = {'static', 'asset', 'dashboard.events', 'auth.logout'}
+
+# Endpoints whose templates fail to build a URL (BuildError); any other 5xx fails the check
+KNOWN_BROKEN_ENDPOINTS = {'settings', 'subscription.checkout'}
+
+def drive_routes(app, user, token, ids):
+    """GET every route, filling URL arguments with the tenant's own records, then the goal actions;
+    returns (endpoint, request, status code) of every request"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    headers = {'Authorization': f'Bearer {token}'}
+    adapter = app.url_map.bind('localhost')
+    statuses = []
+
+    def send(method, path, **kwargs):
+        response = client.open(path, method=method, headers=headers, **kwargs)
+        endpoint = adapter.match(path.split('?')[0], method)[0]
+        statuses.append((endpoint, f'{method} {path}', response.status_code))
+
+    arguments = {'account_id': ids['account'], 'goal_id': ids['goal'], 'plan_id': 'professional',
+                 'resource': 'transactions'}
+
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint in SKIPPED_ENDPOINTS or 'GET' not in rule.methods:
+            continue
+        values = {name: arguments[name] for name in rule.arguments}
+        paths = [rule.build(values)[1]]
+        if rule.endpoint == 'api.list_items':
+            paths = [rule.build({'resource': resource})[1] for resource in ('transactions', 'accounts', 'goals')]
+        elif rule.endpoint == 'financial.transactions_json':
+            paths += [paths[0] + '?start=2024-01-01&end=2024-12-31&category=vendas&type=income'
+                      '&min_amount=10&max_amount=500&sort=amount_desc']
+        elif rule.endpoint == 'financial.search':
+            paths = [paths[0] + '?q=venda']
+        for path in paths:
+            send('GET', path)
+
+    for action in ('update_progress', 'complete', 'reactivate'):
+        send('POST', f"/goals/{action}/{ids['goal']}", data={'amount': '10'})
+    send('POST', f"/goals/delete/{ids['spare_goal']}")
+    send('POST', '/api/v1/transactions/batch', json={
+        'create': [{'description': 'Lote', 'amount': 10, 'transaction_type': 'income'}]})
+    return statuses
+
+def server_errors(statuses):
+    """Requests answered with a 5xx outside KNOWN_BROKEN_ENDPOINTS"""
+    return [(request, status) for endpoint, request, status in statuses
+            if status >= 500 and endpoint not in KNOWN_BROKEN_ENDPOINTS]
+
+def drive_models(user):
+    """Model methods and background jobs that pages do not reach"""
+    from database import User, ApiToken, Transaction, TransactionQuery, Account, AccountAlert, FinancialGoal
+    from jobs import sweep_subscriptions, scan_account_alerts
+    from archive import archive_transactions
+
+    User.get_by_email(user.email)
+    User.get_by_username(user.username)
+    User.create('planner', 'planner@example.com', 'senha123', 'Query Planner')
+    token, plain = ApiToken.create(user.id, 'planner')
+    ApiToken.get_user_id(plain)
+    ApiToken.get_by_user_id(user.id)
+    ApiToken.revoke(token.id, user.id)
+
+    transaction = Transaction(user_id=user.id, description='Plano', amount=10.0, transaction_type='income',
+                              category='vendas').save()
+    transaction.amount = 12.0
+    transaction.save()
+    Transaction.search(user.id, 'plano')
+    Transaction.get_monthly_summary(user.id, datetime.utcnow().month, datetime.utcnow().year)
+    Transaction.get_by_user_id(user.id, start=datetime.utcnow() - timedelta(days=300))
+    TransactionQuery(user.id).category('vendas').paginate(1, 20)
+    Transaction.rebuild_search_index()
+
+    account = Account(user_id=user.id, name='Plano', account_type='payable', amount=10.0,
+                      due_date=datetime.utcnow() + timedelta(days=3)).save()
+    account.status = 'paid'
+    account.save()
+    Account.get_by_id(account.id, user.id)
+    Account.get_pending_total(user.id, 'payable')
+    AccountAlert.get_by_user_id(user.id)
+
+    goal = FinancialGoal(user_id=user.id, title='Plano', target_amount=100.0).save()
+    FinancialGoal.get_by_id(goal.id, user.id)
+    goal.delete()
+
+    sweep_subscriptions()
+    scan_account_alerts()
+    # A later horizon brings part of the archive back
+    archive_transactions(now=datetime.utcnow() - timedelta(days=60))
+
+def collect_statements(app, user_id):
+    """Archive, then drive every route, model method and job as user_id (moved to the
+    enterprise plan); returns each distinct statement issued as (origin, sql, params) and
+    the status of every request (see drive_routes).
+    Archiving must be on (database.TRANSACTION_ARCHIVE_DAYS > 0)"""
+    from database import db_manager, User, ApiToken, Account, FinancialGoal, to_epoch
+    from query_plans import StatementCollector
+    from archive import archive_transactions
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    conn = db_manager.get_connection()
+    conn.execute("UPDATE users SET subscription_plan = 'enterprise', subscription_status = 'active', "
+                 "subscription_end_ts = ? WHERE id = ?", (to_epoch(datetime.utcnow() + timedelta(days=30)), user_id))
+    conn.commit()
+    conn.close()
+    user = User.get_by_id(user_id)
+    _, token = ApiToken.create(user.id, 'check-query-plans')
+    goals = FinancialGoal.get_by_user_id(user.id)
+    spare = FinancialGoal(user_id=user.id, title='Descartável', target_amount=50.0).save()
+    ids = {'account': Account.get_by_user_id(user.id)[0].id,
+           'goal': goals[0].id if goals else spare.id, 'spare_goal': spare.id}
+
+    collector = db_manager.add_query_listener(StatementCollector())
+    try:
+        archive_transactions()
+        statuses = drive_routes(app, user, token, ids)
+        drive_models(user)
+    finally:
+        db_manager.remove_query_listener(collector)
+    return [(origin, sql, params) for sql, params, origin in collector.statements.values()], statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=500)
+    parser.add_argument('--verbose', action='store_true', help='print every statement with its plan')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'check_query_plans.db')
+    os.environ['DATABASE_URL'] = path
+    os.environ['PRECOMPILE_TEMPLATES'] = '0'
+    logging.disable(logging.CRITICAL)
+    from synthetic import generate
+    user_ids = generate(path, users=args.users, transactions=args.transactions)
+    from app import app
+    import database
+    from database import db_manager
+    # Half of the generated year is archived, so reads reaching past it union archive tables
+    database.TRANSACTION_ARCHIVE_DAYS = ARCHIVE_DAYS
+    from query_plans import check_statements, explain, transaction_query_statements
+
+    # A failing page answers 500 instead of aborting the run; see server_errors below
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    statements, statuses = collect_statements(app, user_ids[0])
+    distinct = len(statements)
+    statements += transaction_query_statements()
+    failures = check_statements(statements)
+    errors = server_errors(statuses)
+
+    if args.verbose:
+        conn = db_manager.get_connection()
+        cursor = conn.cursor()
+        for origin, sql, params in statements:
+            if sql.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')):
+                print(f"{origin}\n  {' '.join(sql.split())}\n    " + '\n    '.join(explain(cursor, sql, params)))
+        conn.close()
+
+    print(f"{distinct} distinct statements collected from {len(statuses)} requests, {len(statements)} checked")
+    for origin, sql, violations in failures:
+        print(f"\nFAIL {origin}\n  {' '.join(sql.split())}\n  " + '\n  '.join(violations))
+    for request, status in errors:
+        print(f"\nFAIL {request} answered {status}")
+    if failures or errors:
+        sys.exit(1)
+    print("No unexpected scans of large tables")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Data-layer microbenchmarks: row hydration, date parsing and conversion,
+currency formatting and the Python-side totals of the cash-flow and goals views.
+
+Every case uses fixed seeds. Timings are the median of --repeat runs in ns per
+operation. Memory comes from tracemalloc: the peak during one run and what
+stays allocated afterwards. Results can be saved as JSON and compared with an
+earlier run (e.g. from another commit).
+
+Usage: python benchmarks/microbench.py [--size 10000] [--repeat 7] [--only NAME ...]
+           [--output results.json] [--compare previous.json [--tolerance 0.15]]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SEED = 42
+START = datetime(2023, 1, 1)
+
+def _moments(rng, size):
+    return [START + timedelta(seconds=rng.randint(0, 3 * 365 * 86400), microseconds=rng.randint(0, 999999))
+            for _ in range(size)]
+
+def _transaction_rows(rng, size):
+    """Rows shaped like Transaction.COLUMNS"""
+    from database import to_epoch
+    return [(i + 1, 1, f'Transação {i}', round(rng.uniform(1, 50000), 2), rng.choice(('income', 'expense')),
+             'vendas', to_epoch(moment), to_epoch(moment), 0, None, None)
+            for i, moment in enumerate(_moments(rng, size))]
+
+def _goal_rows(rng, size):
+    """Rows shaped like FinancialGoal.COLUMNS"""
+    return [(i + 1, 1, f'Meta {i}', round(rng.uniform(1000, 50000), 2), round(rng.uniform(0, 1000), 2),
+             19800 + i % 365, 1700000000 + i, 0) for i in range(size)]
+
+# Each case: setup(rng, size) -> (function run once per repeat, operations per run)
+
+def case_transaction_hydration(rng, size):
+    from database import Transaction
+    rows = _transaction_rows(rng, size)
+    return lambda: [Transaction._from_row(row) for row in rows], size
+
+def case_transaction_hydration_with_dates(rng, size):
+    from database import Transaction
+    rows = _transaction_rows(rng, size)
+
+    def run():
+        transactions = [Transaction._from_row(row) for row in rows]
+        return [t.date for t in transactions]
+    return run, size
+
+def _parse_case(formatter):
+    def setup(rng, size):
+        from database import parse_datetime
+        values = [formatter(moment) for moment in _moments(rng, size)]
+        return lambda: [parse_datetime(value) for value in values], size
+    return setup
+
+# The three text formats found in legacy rows
+case_parse_datetime_sqlite = _parse_case(lambda moment: moment.strftime('%Y-%m-%d %H:%M:%S'))
+case_parse_datetime_isoformat = _parse_case(lambda moment: moment.isoformat())
+case_parse_datetime_utc_suffix = _parse_case(lambda moment: moment.strftime('%Y-%m-%dT%H:%M:%S') + 'Z')
+
+def case_from_epoch(rng, size):
+    from database import from_epoch, to_epoch
+    values = [to_epoch(moment) for moment in _moments(rng, size)]
+    return lambda: [from_epoch(value) for value in values], size
+
+def case_utc_to_brasilia(rng, size):
+    from utils import utc_to_brasilia
+    moments = _moments(rng, size)
+    return lambda: [utc_to_brasilia(moment) for moment in moments], size
+
+def case_utc_to_brasilia_many(rng, size):
+    from utils import utc_to_brasilia_many
+    moments = _moments(rng, size)
+    return lambda: utc_to_brasilia_many(moments), size
+
+def case_format_currency(rng, size):
+    from utils import format_currency
+    amounts = [round(rng.uniform(-50000, 5000000), 2) for _ in range(size)]
+    return lambda: [format_currency(amount) for amount in amounts], size
+
+def case_format_currency_many(rng, size):
+    from utils import format_currency_many
+    amounts = [round(rng.uniform(-50000, 5000000), 2) for _ in range(size)]
+    return lambda: format_currency_many(amounts), size
+
+def case_cash_flow_totals(rng, size):
+    from database import Transaction
+    transactions = [Transaction._from_row(row) for row in _transaction_rows(rng, size)]
+
+    def run():
+        # As in financial.cash_flow
+        total_income = sum(float(t.amount) for t in transactions if t.transaction_type == 'income')
+        total_expenses = sum(float(t.amount) for t in transactions if t.transaction_type == 'expense')
+        return total_income - total_expenses
+    return run, size
+
+def case_goals_totals(rng, size):
+    from database import FinancialGoal
+    goals = [FinancialGoal._from_row(row) for row in _goal_rows(rng, size)]
+
+    def run():
+        # As in goals.goals_list
+        total_target = sum(goal.target_amount for goal in goals)
+        total_current = sum(goal.current_amount for goal in goals)
+        return (total_current / total_target * 100) if total_target > 0 else 0
+    return run, size
+
+CASES = {name[len('case_'):]: setup for name, setup in globals().items() if name.startswith('case_')}
+
+def measure(setup, size, repeat):
+    run, operations = setup(random.Random(SEED), size)
+    run()  # warm caches (lru_cache, code objects) before timing
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter_ns()
+        run()
+        timings.append((time.perf_counter_ns() - start) / operations)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return {
+        'ns_per_op': round(statistics.median(timings), 1),
+        'min_ns_per_op': round(min(timings), 1),
+        'operations': operations,
+        'peak_kib': round((peak - before) / 1024, 1),
+        'retained_bytes_per_op': round((current - before) / operations, 1)
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous, current, tolerance):
+    """Print per-case deltas; returns the names slower than tolerance"""
+    regressions = []
+    print(f"\n{'case':<34} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if not before:
+            print(f"{name:<34} {'-':>10} {result['ns_per_op']:>10.1f} {'new':>8}")
+            continue
+        change = result['ns_per_op'] / before['ns_per_op'] - 1
+        flag = '  REGRESSION' if change > tolerance else ''
+        print(f"{name:<34} {before['ns_per_op']:>10.1f} {result['ns_per_op']:>10.1f} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=10_000, help='items per run')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES), help='run only these cases')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown before --compare fails')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', ':memory:')
+    results = {}
+    print(f"{'case':<34} {'ns/op':>10} {'min':>10} {'peak KiB':>10} {'B/op kept':>10}")
+    for name in args.only or CASES:
+        result = results[name] = measure(CASES[name], args.size, args.repeat)
+        print(f"{name:<34} {result['ns_per_op']:>10.1f} {result['min_ns_per_op']:>10.1f} "
+              f"{result['peak_kib']:>10.1f} {result['retained_bytes_per_op']:>10.1f}")
+
+    report = {
+        'meta': {'commit': _git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'date': datetime.utcnow().isoformat(timespec='seconds'), 'seed': SEED,
+                 'size': args.size, 'repeat': args.repeat},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
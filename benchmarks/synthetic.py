@@ -0,0 +1,150 @@
+"""Synthetic tenants for benchmarks: N users with transactions, accounts and goals
+in realistic proportions, bulk-loaded into a local SQLite database.
+
+Usage: python benchmarks/synthetic.py PATH [--users 50] [--transactions 500]
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (category, weight, income?, median amount in R$)
+CATEGORIES = [
+    ('vendas', 30, True, 180), ('servicos', 12, True, 650),
+    ('fornecedores', 18, False, 420), ('despesas_gerais', 16, False, 90),
+    ('impostos', 6, False, 380), ('marketing', 6, False, 250),
+    ('transporte', 7, False, 60), ('outros', 5, False, 120)
+]
+DESCRIPTIONS = {
+    'vendas': ['Venda balcão', 'Venda online', 'Venda cartão', 'Pix recebido'],
+    'servicos': ['Consultoria', 'Manutenção cliente', 'Projeto mensal'],
+    'fornecedores': ['Compra de mercadoria', 'Pagamento fornecedor', 'Material de estoque'],
+    'despesas_gerais': ['Energia elétrica', 'Internet fibra', 'Café e copa', 'Material de escritório'],
+    'impostos': ['DAS MEI', 'ISS', 'Taxa municipal'],
+    'marketing': ['Anúncio redes sociais', 'Panfletos', 'Impulsionamento'],
+    'transporte': ['Combustível', 'Aplicativo de transporte', 'Estacionamento'],
+    'outros': ['Tarifa bancária', 'Diversos']
+}
+# Fixed monthly costs most small businesses carry
+RECURRING = [('Aluguel loja', 'despesas_gerais', 1800), ('Contador', 'servicos', 350), ('Software de gestão', 'despesas_gerais', 89)]
+PLANS = [('trial', 25), ('mei', 35), ('professional', 30), ('enterprise', 10)]
+HISTORY_DAYS = 365
+
+def _weighted(rng, pairs):
+    return rng.choices([item for item, _ in pairs], weights=[weight for _, weight in pairs])[0]
+
+def _tenant_size(rng, mean):
+    # Lognormal: most tenants near the mean, a few with several times more activity
+    return max(1, int(rng.lognormvariate(math.log(mean) - 0.32, 0.8)))
+
+def generate(path, users=50, transactions=500, accounts=20, goals=3, seed=42, now=None):
+    """Create the schema at path and fill it; returns the list of user ids.
+
+    transactions/accounts/goals are per-user means. Every user's password is 'senha123'."""
+    from database import Database, to_epoch, to_day
+    from werkzeug.security import generate_password_hash
+
+    Database(path)  # schema, indexes, triggers
+    rng = random.Random(seed)
+    now = now or datetime.utcnow().replace(microsecond=0)
+    password_hash = generate_password_hash('senha123')
+    category_pairs = [(category, weight) for category, weight, _, _ in CATEGORIES]
+    category_info = {category: (income, median) for category, _, income, median in CATEGORIES}
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    user_ids = []
+    for index in range(users):
+        created = now - timedelta(days=rng.randint(30, HISTORY_DAYS + 200))
+        plan = _weighted(rng, PLANS)
+        status, subscription_end = ('trial', None) if plan == 'trial' else ('active', to_epoch(now + timedelta(days=rng.randint(1, 30))))
+        cursor.execute('''
+            INSERT INTO users (username, email, password_hash, full_name, created_ts, trial_start_ts,
+                               trial_end_ts, subscription_plan, subscription_status, subscription_end_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (f'tenant{index}', f'tenant{index}@example.com', password_hash, f'Empresa {index}',
+              to_epoch(created), to_epoch(created), to_epoch(now + timedelta(days=7)), plan, status, subscription_end))
+        user_id = cursor.lastrowid
+        user_ids.append(user_id)
+
+        rows = []
+        for _ in range(_tenant_size(rng, transactions)):
+            category = _weighted(rng, category_pairs)
+            income, median = category_info[category]
+            # Business hours on weekdays dominate
+            day = now - timedelta(days=rng.randint(0, HISTORY_DAYS))
+            if day.weekday() >= 5 and rng.random() < 0.6:
+                day -= timedelta(days=day.weekday() - 4)
+            moment = day.replace(hour=rng.randint(8, 19), minute=rng.randint(0, 59), second=rng.randint(0, 59))
+            amount = round(rng.lognormvariate(math.log(median), 0.7), 2)
+            rows.append((user_id, rng.choice(DESCRIPTIONS[category]), amount, 'income' if income else 'expense',
+                         category, to_epoch(moment), to_epoch(moment), 0, None))
+        for description, category, amount in RECURRING[:rng.randint(1, len(RECURRING))]:
+            for month in range(12):
+                moment = (now - timedelta(days=30 * month)).replace(day=5, hour=9)
+                rows.append((user_id, description, float(amount), 'expense', category,
+                             to_epoch(moment), to_epoch(moment), 1, 'monthly'))
+        cursor.executemany('''
+            INSERT INTO transactions (user_id, description, amount, transaction_type, category,
+                                      date_ts, created_ts, is_recurring, recurrence_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        rows = []
+        for number in range(_tenant_size(rng, accounts)):
+            due = (now + timedelta(days=rng.randint(-60, 60))).date()
+            # Most past-due accounts have been settled; future ones are still open
+            paid = due < now.date() and rng.random() < 0.8
+            kind = 'payable' if rng.random() < 0.6 else 'receivable'
+            rows.append((user_id, f"{'Boleto' if kind == 'payable' else 'Fatura'} {number + 1}", kind,
+                         round(rng.lognormvariate(math.log(400), 0.8), 2), to_day(due),
+                         'paid' if paid else 'pending', to_epoch(now - timedelta(days=rng.randint(0, 90)))))
+        cursor.executemany('''
+            INSERT INTO accounts (user_id, name, account_type, amount, due_day, status, created_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        rows = []
+        for number in range(rng.randint(0, goals * 2)):
+            target = round(rng.choice((2000, 5000, 10000, 25000, 50000)) * rng.uniform(0.8, 1.2), 2)
+            progress = min(1.0, rng.betavariate(2, 3) * 1.3)
+            rows.append((user_id, f'Meta {number + 1}', target, round(target * progress, 2),
+                         to_day((now + timedelta(days=rng.randint(-30, 365))).date()),
+                         to_epoch(now - timedelta(days=rng.randint(0, 180))), int(progress >= 1.0)))
+        cursor.executemany('''
+            INSERT INTO financial_goals (user_id, title, target_amount, current_amount, target_day,
+                                         created_ts, is_completed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+    conn.commit()
+    cursor.execute('ANALYZE')
+    conn.close()
+    return user_ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--transactions', type=int, default=500)
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--goals', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # Keep the module-level db_manager on the same local file
+    os.environ['DATABASE_URL'] = args.path
+    user_ids = generate(args.path, args.users, args.transactions, args.accounts, args.goals, args.seed)
+    conn = sqlite3.connect(args.path)
+    counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('transactions', 'accounts', 'financial_goals')}
+    conn.close()
+    print(f"{len(user_ids)} users, " + ', '.join(f"{count:,} {table}" for table, count in counts.items()))
+
+if __name__ == '__main__':
+    main()
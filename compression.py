@@ -0,0 +1,124 @@
+import zlib
+from werkzeug.http import parse_accept_header
+from werkzeug.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:  # optional: responses are gzip-only without it
+    brotli = None
+
+# Content types worth compressing. Everything else passes through: PDFs,
+# images and archives are already compressed, and text/event-stream is left
+# alone so server-sent events reach the client unbuffered
+COMPRESSIBLE_TYPES = ('text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+                      'application/json', 'application/javascript', 'application/xml',
+                      'image/svg+xml')
+
+class CompressionMiddleware:
+    """WSGI middleware that gzip/brotli-encodes text responses.
+
+    Responses with a Content-Length below minimum_size, an existing
+    Content-Encoding, Cache-Control: no-transform or a non-text type pass
+    through untouched. Responses without a Content-Length (generators) are
+    compressed as they stream, flushing after every chunk."""
+
+    def __init__(self, app, level=6, brotli_quality=5, minimum_size=500):
+        self.app = app
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.minimum_size = minimum_size
+
+    def _choose_encoding(self, environ):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return None
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accepted['br'] > 0:
+            return 'br'
+        if accepted['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.minimum_size
+
+    def _compressor(self, encoding):
+        """(compress(chunk), flush(), finish()) for the chosen encoding"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.flush, compressor.finish
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return (compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+                lambda: compressor.flush(zlib.Z_FINISH))
+
+    @staticmethod
+    def _mark_encoded(headers, encoding):
+        headers['Content-Encoding'] = encoding
+        # The encoded bytes differ from what a strong validator promised
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag
+
+    def __call__(self, environ, start_response):
+        encoding = self._choose_encoding(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        captured = {'written': []}
+
+        def capture_start_response(status, headers, exc_info=None):
+            # Headers are sent once the body is known to be compressible or not
+            captured['status'], captured['headers'], captured['exc_info'] = status, headers, exc_info
+            return captured['written'].append
+
+        app_iter = self.app(environ, capture_start_response)
+        return self._respond(app_iter, captured, start_response, encoding)
+
+    def _respond(self, app_iter, captured, start_response, encoding):
+        try:
+            chunks = iter(app_iter)
+            # Flask calls start_response before yielding, but a generator may defer it
+            first = next(chunks, None) if 'status' not in captured else None
+            status, headers = captured['status'], Headers(captured['headers'])
+            prefix = captured['written'] + ([first] if first else [])
+
+            if not self._should_compress(status, headers):
+                start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+                yield from prefix
+                yield from chunks
+                return
+
+            compress, flush, finish = self._compressor(encoding)
+            headers.add('Vary', 'Accept-Encoding')
+
+            if 'Content-Length' in headers:
+                # Whole body in hand: compress once and keep a correct length
+                body = b''.join(prefix) + b''.join(chunks)
+                compressed = compress(body) + finish()
+                if len(compressed) < len(body):
+                    self._mark_encoded(headers, encoding)
+                    body = compressed
+                headers['Content-Length'] = str(len(body))
+                start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+                yield body
+                return
+
+            self._mark_encoded(headers, encoding)
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            for chunk in prefix:
+                yield compress(chunk) + flush()
+            for chunk in chunks:
+                if chunk:
+                    yield compress(chunk) + flush()
+            yield finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
@@ -1,21 +1,43 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request, Response
 from flask_login import login_required, current_user
-from database import Transaction, Account, FinancialGoal
-from database import db_manager
+from database import User, Transaction, Account, FinancialGoal, AccountAlert
+from database import db_manager, to_day
+from events import broker, format_sse
+from forecast import forecast_cache
+from utils import now_brasilia
 from datetime import datetime, timedelta
+import os
+import time
 import calendar
+import functools
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Seconds between keep-alive comments on idle event streams; each one also checks
+# for writes made through other worker processes
+SSE_HEARTBEAT_INTERVAL = 15
+
+# Seconds an event stream stays open before the browser is left to reconnect,
+# so no stream holds a worker thread indefinitely
+SSE_STREAM_DURATION = int(os.environ.get('SSE_STREAM_DURATION', 300))
+
 @dashboard_bp.route('/')
 @login_required
 def dashboard():
     # Check subscription status
     if not current_user.is_subscription_active():
-        if current_user.subscription_status == 'trial' and current_user.is_trial_expired():
+        if current_user.is_trial_expired():
             return render_template('subscription/plans.html', 
                                  message='Seu período de teste expirou. Escolha um plano para continuar.')
     
+    # Queries run only when the page's cached fragments miss
+    user_id = current_user.id
+    return render_template('dashboard/dashboard.html',
+                         load_dashboard=functools.lru_cache(maxsize=None)(lambda: _dashboard_data(user_id)),
+                         cache_day=now_brasilia().date().isoformat())
+
+def _dashboard_data(user_id):
+    """Monthly cards, pending totals, recent transactions and goals for the dashboard"""
     # Get dashboard data
     today = datetime.utcnow()
     current_month = today.month
@@ -23,18 +45,18 @@ def dashboard():
     
     # Monthly summary
     monthly_income, monthly_expenses = Transaction.get_monthly_summary(
-        current_user.id, current_month, current_year)
+        user_id, current_month, current_year)
     monthly_balance = monthly_income - monthly_expenses
     
     # Recent transactions
-    recent_transactions = Transaction.get_by_user_id(current_user.id, limit=5)
+    recent_transactions = Transaction.get_by_user_id(user_id, limit=5)
     
     # Accounts summary
-    pending_receivables = Account.get_pending_total(current_user.id, 'receivable')
-    pending_payables = Account.get_pending_total(current_user.id, 'payable')
+    pending_receivables = Account.get_pending_total(user_id, 'receivable')
+    pending_payables = Account.get_pending_total(user_id, 'payable')
     
     # Financial goals
-    goals = FinancialGoal.get_by_user_id(current_user.id, is_completed=False)
+    goals = FinancialGoal.get_by_user_id(user_id, is_completed=False)
     goals_summary = {
         'total_goals': len(goals),
         'total_target': sum(goal.target_amount for goal in goals),
@@ -43,22 +65,37 @@ def dashboard():
     }
     
     # Calculate user level and progress (gamification)
-    transaction_count = Transaction.count_by_user_id(current_user.id)
+    transaction_count = Transaction.count_by_user_id(user_id)
     user_level = min(10, (transaction_count // 10) + 1)
     level_progress = (transaction_count % 10) * 10
     
-    return render_template('dashboard/dashboard.html',
-                         monthly_income=monthly_income,
-                         monthly_expenses=monthly_expenses,
-                         monthly_balance=monthly_balance,
-                         recent_transactions=recent_transactions,
-                         pending_receivables=pending_receivables,
-                         pending_payables=pending_payables,
-                         goals=goals,
-                         goals_summary=goals_summary,
-                         user_level=user_level,
-                         level_progress=level_progress,
-                         current_month=calendar.month_name[current_month])
+    return {
+        'monthly_income': monthly_income,
+        'monthly_expenses': monthly_expenses,
+        'monthly_balance': monthly_balance,
+        'recent_transactions': recent_transactions,
+        'pending_receivables': pending_receivables,
+        'pending_payables': pending_payables,
+        'goals': goals,
+        'goals_summary': goals_summary,
+        'user_level': user_level,
+        'level_progress': level_progress,
+        'current_month': calendar.month_name[current_month]
+    }
+
+@dashboard_bp.route('/summary')
+@login_required
+def summary():
+    """Monthly cards and pending account totals, refetched by the dashboard on change events"""
+    today = datetime.utcnow()
+    monthly_income, monthly_expenses = Transaction.get_monthly_summary(current_user.id, today.month, today.year)
+    return jsonify({
+        'monthly_income': float(monthly_income),
+        'monthly_expenses': float(monthly_expenses),
+        'monthly_balance': float(monthly_income - monthly_expenses),
+        'pending_receivables': Account.get_pending_total(current_user.id, 'receivable'),
+        'pending_payables': Account.get_pending_total(current_user.id, 'payable')
+    })
 
 @dashboard_bp.route('/chart-data')
 @login_required
@@ -87,4 +124,60 @@ def chart_data():
         'months': [m['month'] for m in months_data],
         'income': [m['income'] for m in months_data],
         'expenses': [m['expenses'] for m in months_data]
-    })
\ No newline at end of file
+    })
+
+@dashboard_bp.route('/forecast')
+@login_required
+def forecast():
+    """Projected daily balance, inflow and outflow for the next 90 days, cached per
+    user until the data version or the day changes"""
+    today = to_day(now_brasilia().date())
+    return jsonify(forecast_cache.get(current_user.id, (current_user.data_version, today)).data)
+
+@dashboard_bp.route('/notifications')
+@login_required
+def notifications():
+    """Overdue and due-soon account reminders, precomputed by the alert scan"""
+    return jsonify(AccountAlert.get_by_user_id(current_user.id).to_dict())
+
+@dashboard_bp.route('/events')
+@login_required
+def events():
+    """Server-Sent Events stream of the user's data changes.
+    
+    Events published by this process arrive as they happen. Writes handled by other
+    worker processes are noticed at the next heartbeat through users.data_version
+    and sent as a resync; the version is also the event id, so a reconnecting browser
+    (Last-Event-ID) is resynced when it missed changes. Every open stream occupies a
+    worker thread until SSE_STREAM_DURATION ends it: run gunicorn with a threaded or
+    async worker class (--worker-class gthread --threads N, or gevent), not the
+    default sync workers."""
+    user_id = current_user.id
+    last_event_id = request.headers.get('Last-Event-ID')
+    subscription = broker.subscribe(user_id)
+    
+    def stream():
+        version = User.get_data_version(user_id)
+        try:
+            yield f'retry: 5000\nid: {version}\n\n'
+            if last_event_id is not None and last_event_id != str(version):
+                yield format_sse({'event': 'resync', 'data': {}})
+            deadline = time.monotonic() + SSE_STREAM_DURATION
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=SSE_HEARTBEAT_INTERVAL)
+                if event is not None:
+                    yield format_sse(event)
+                    continue
+                # Also bumped by this process's own writes, which costs one
+                # redundant resync after them
+                current = User.get_data_version(user_id)
+                if current != version:
+                    version = current
+                    yield format_sse({'event': 'resync', 'data': {}, 'id': version})
+                else:
+                    yield ': heartbeat\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
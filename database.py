@@ -1,24 +1,311 @@
 import sqlitecloud
 import sqlite3
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 import logging
+import re
+import time
+import hashlib
+import functools
+import threading
+import secrets
+from events import publish
+from utils import utc_to_brasilia
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
+# Comma-separated connection strings holding per-user rows; unset keeps everything in DATABASE_URL
+DATABASE_SHARDS = [shard.strip() for shard in os.environ.get('DATABASE_SHARDS', '').split(',') if shard.strip()]
+
+# Seconds a user's shard placement is cached before the directory is read again
+SHARD_DIRECTORY_TTL = float(os.environ.get('SHARD_DIRECTORY_TTL', 5))
+
+# Width of each shard's id range for transactions, accounts and goals, so rows keep their ids when moved
+SHARD_ID_SPAN = 10 ** 12
+
+# Transactions dated more than this many days ago are moved into per-year archive tables
+# by the archive job (archive.py); 0 keeps every row live
+TRANSACTION_ARCHIVE_DAYS = int(os.environ.get('TRANSACTION_ARCHIVE_DAYS', 0))
+
+DEFAULT_CONNECTION_STRING = 'sqlitecloud://cmq6frwshz.g4.sqlite.cloud:8860/financial_system.db?apikey=Dor8OwUECYmrbcS5vWfsdGpjCpdm9ecSDJtywgvRw8k'
+
+# Literals and placeholder lists collapsed so repeated statements share a fingerprint
+_FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\s+'), ' ')
+)
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint_sql(sql):
+    """Normalized statement text used to group executions of the same query"""
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+class QueryEvent:
+    """One executed statement: SQL, parameter count, rows returned or changed, seconds spent"""
+    __slots__ = ('sql', 'params', 'rows', 'elapsed')
+    
+    def __init__(self, sql, params, rows, elapsed):
+        self.sql = sql
+        self.params = params
+        self.rows = rows
+        self.elapsed = elapsed
+    
+    @property
+    def fingerprint(self):
+        return fingerprint_sql(self.sql)
+
+class TracedCursor:
+    """Cursor wrapper that times execute and fetch calls and reports each statement
+    to the query listeners once its rows have been read (or the cursor moves on)"""
+    __slots__ = ('_cursor', '_listeners', '_event')
+    
+    def __init__(self, cursor, listeners):
+        self._cursor = cursor
+        self._listeners = listeners
+        self._event = None
+    
+    def _start(self, sql, params, execute, arguments):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            execute(sql, arguments)
+        finally:
+            rowcount = self._cursor.rowcount
+            self._event = QueryEvent(sql, params, rowcount if rowcount and rowcount > 0 else 0,
+                                     time.perf_counter() - start)
+        return self
+    
+    def execute(self, sql, params=()):
+        return self._start(sql, len(params), self._cursor.execute, params)
+    
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        return self._start(sql, sum(len(params) for params in seq_of_params),
+                           self._cursor.executemany, seq_of_params)
+    
+    def _fetched(self, start, rows, exhausted):
+        event = self._event
+        if event is not None:
+            event.elapsed += time.perf_counter() - start
+            event.rows += rows
+            if exhausted:
+                self._finish()
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+    
+    def fetchmany(self, *args):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(*args)
+        self._fetched(start, len(rows), not rows)
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+    
+    def __iter__(self):
+        return iter(self.fetchone, None)
+    
+    def _finish(self):
+        event, self._event = self._event, None
+        if event is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                # Instrumentation must never break the query it observes
+                logging.exception("Query listener failed")
+    
+    def close(self):
+        self._finish()
+        self._cursor.close()
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class TracedConnection:
+    """Connection wrapper handing out TracedCursors; closing it reports any statement still open"""
+    __slots__ = ('_conn', '_listeners', '_cursors', '_database')
+    
+    def __init__(self, conn, database):
+        self._conn = conn
+        self._listeners = database.query_listeners
+        self._cursors = []
+        self._database = database
+        database._count_connection('opened')
+    
+    def cursor(self):
+        cursor = TracedCursor(self._conn.cursor(), self._listeners)
+        self._cursors.append(cursor)
+        return cursor
+    
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+    
+    def close(self):
+        for cursor in self._cursors:
+            cursor._finish()
+        self._cursors.clear()
+        self._conn.close()
+        if self._database is not None:
+            self._database._count_connection('closed')
+            self._database = None
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach): a stable bucket in range(buckets) for an
+    integer key; growing buckets from n to n + 1 moves only 1/(n + 1) of the keys"""
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
 class Database:
-    def __init__(self, connection_string='sqlitecloud://cmq6frwshz.g4.sqlite.cloud:8860/financial_system.db?apikey=Dor8OwUECYmrbcS5vWfsdGpjCpdm9ecSDJtywgvRw8k'):
-        self.connection_string = connection_string
+    def __init__(self, connection_string=None, change_log=True, shards=(), shard_index=0):
+        # DATABASE_URL may point at a local SQLite file (development, benchmarks)
+        self.connection_string = connection_string or os.environ.get('DATABASE_URL', DEFAULT_CONNECTION_STRING)
+        # With shards, this database is the directory (users by email/username, API
+        # tokens) and each user's rows live in the shard the directory assigns
+        self.sharded = bool(shards)
+        self.is_shard = self.connection_string in shards
+        self.shard_index = shards.index(self.connection_string) if self.is_shard else shard_index
+        self.shards = []
+        self._placements = {}
+        # Whether writes are recorded in change_log (off for local replicas themselves)
+        self.change_log = change_log
+        # LocalReplica serving per-user reads, set by replica.init_replica
+        self.replica = None
+        # WriteBehind journal taking model saves, set by write_behind.init_write_behind
+        self.write_behind = None
+        # Callables receiving a QueryEvent per executed statement; connections are
+        # only wrapped for tracing while at least one is registered
+        self.query_listeners = []
+        # Traced connections opened and closed by this process (open = opened - closed)
+        self.connection_stats = {'opened': 0, 'closed': 0}
+        self._connection_stats_lock = threading.Lock()
         self.init_db()
+        
+        for index, connection_string in enumerate(shards):
+            if connection_string == self.connection_string:
+                self.shards.append(self)
+                continue
+            shard = Database(connection_string, change_log, shard_index=index)
+            # One tracing and connection-count view across the directory and its shards
+            shard.query_listeners = self.query_listeners
+            shard.connection_stats = self.connection_stats
+            shard._connection_stats_lock = self._connection_stats_lock
+            self.shards.append(shard)
+    
+    def all_shards(self):
+        """Every database holding user rows, for all-users jobs"""
+        return self.shards or [self]
+    
+    def shard_of(self, user_id, cached=True):
+        """Index of the shard holding user_id's rows (the directory entry, else the user_id hash)"""
+        placement = self._placements.get(user_id)
+        if cached and placement is not None and placement[1] > time.monotonic():
+            return placement[0]
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT shard FROM shard_directory WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        shard = row[0] if row else jump_hash(user_id, len(self.shards))
+        self._placements[user_id] = (shard, time.monotonic() + SHARD_DIRECTORY_TTL)
+        return shard
+    
+    def for_user(self, user_id):
+        """Database holding user_id's rows (this one when not sharded)"""
+        if not self.shards:
+            return self
+        return self.shards[self.shard_of(user_id)]
+    
+    def register_user(self, email, username):
+        """Directory entry for a new user, placed by the user_id hash; returns the user id"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO shard_directory (email, username, shard) VALUES (?, ?, -1)', (email, username))
+        user_id = cursor.lastrowid
+        cursor.execute('UPDATE shard_directory SET shard = ? WHERE user_id = ?',
+                       (jump_hash(user_id, len(self.shards)), user_id))
+        try:
+            conn.commit()
+        except Exception as e:
+            # SQLite Cloud auto-commit behavior - this is expected
+            pass
+        conn.close()
+        return user_id
+    
+    def lookup_user_id(self, column, value):
+        """User id for an email or username from the shard directory"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT user_id FROM shard_directory WHERE {column} = ?', (value,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    
+    def _count_connection(self, key):
+        with self._connection_stats_lock:
+            self.connection_stats[key] += 1
+    
+    def add_query_listener(self, listener):
+        if listener not in self.query_listeners:
+            self.query_listeners.append(listener)
+        return listener
+    
+    def remove_query_listener(self, listener):
+        if listener in self.query_listeners:
+            self.query_listeners.remove(listener)
     
     def get_connection(self):
-        conn = sqlitecloud.connect(self.connection_string)
-        # SQLite Cloud doesn't support sqlite3.Row directly
-        # We'll work with tuples and column names instead
+        if not self.connection_string.startswith('sqlitecloud://'):
+            conn = sqlite3.connect(self.connection_string, check_same_thread=False)
+        else:
+            # SQLite Cloud doesn't support sqlite3.Row directly
+            # We'll work with tuples and column names instead
+            conn = sqlitecloud.connect(self.connection_string)
+        if self.query_listeners:
+            return TracedConnection(conn, self)
         return conn
     
+    def get_read_connection(self, user_id, archived=False):
+        """Connection for reading one user's rows: the local replica when it holds a
+        verified copy of the user, otherwise the primary database. Reads that may
+        reach archived transactions (archived=True) always go to the primary, which
+        alone holds the archive tables and rollups.
+        
+        Writes still queued in the write-behind journal are visible either way: the
+        replica already holds them, and the primary is read only once they are flushed."""
+        pending = self.write_behind is not None and user_id is not None and self.write_behind.has_pending(user_id)
+        if self.replica is not None and user_id is not None and not archived:
+            conn = self.replica.connect_for(user_id, catch_up=not pending)
+            if conn is not None:
+                return conn
+        if pending:
+            self.write_behind.wait_for(user_id)
+        if user_id is None:
+            return self.get_connection()
+        return self.for_user(user_id).get_connection()
+    
     def init_db(self):
         """Initialize database with all required tables"""
         conn = self.get_connection()
@@ -33,13 +320,13 @@ class Database:
                 password_hash TEXT NOT NULL,
                 full_name TEXT NOT NULL,
                 phone TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                created_ts INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 active INTEGER DEFAULT 1,
-                trial_start_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                trial_end_date TEXT,
+                trial_start_ts INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                trial_end_ts INTEGER,
                 subscription_plan TEXT DEFAULT 'trial',
                 subscription_status TEXT DEFAULT 'trial',
-                subscription_end_date TEXT
+                subscription_end_ts INTEGER
             )
         ''')
         
@@ -52,8 +339,8 @@ class Database:
                 amount REAL NOT NULL,
                 transaction_type TEXT NOT NULL,
                 category TEXT,
-                date TEXT DEFAULT CURRENT_TIMESTAMP,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                date_ts INTEGER,
+                created_ts INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 is_recurring INTEGER DEFAULT 0,
                 recurrence_type TEXT,
                 account_id INTEGER,
@@ -70,9 +357,9 @@ class Database:
                 name TEXT NOT NULL,
                 account_type TEXT NOT NULL,
                 amount REAL DEFAULT 0,
-                due_date TEXT,
+                due_day INTEGER,
                 status TEXT DEFAULT 'pending',
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                created_ts INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
             )
         ''')
@@ -85,13 +372,199 @@ class Database:
                 title TEXT NOT NULL,
                 target_amount REAL NOT NULL,
                 current_amount REAL DEFAULT 0,
-                target_date TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                target_day INTEGER,
+                created_ts INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
                 is_completed INTEGER DEFAULT 0,
                 FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
             )
         ''')
         
+        # Hashed API tokens for the JSON API (enterprise plan)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS api_tokens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                token_hash TEXT UNIQUE NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TEXT,
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # Per-user listing indexes (rowid order within a user backs API cursors)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_accounts_user ON accounts (user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_financial_goals_user ON financial_goals (user_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens (user_id)')
+        
+        # Per-user payable/receivable reminders, refreshed by the batch alert scan
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS account_alerts (
+                user_id INTEGER PRIMARY KEY,
+                overdue_payables INTEGER DEFAULT 0,
+                overdue_payables_total REAL DEFAULT 0,
+                overdue_receivables INTEGER DEFAULT 0,
+                overdue_receivables_total REAL DEFAULT 0,
+                due_soon_payables INTEGER DEFAULT 0,
+                due_soon_payables_total REAL DEFAULT 0,
+                due_soon_receivables INTEGER DEFAULT 0,
+                due_soon_receivables_total REAL DEFAULT 0,
+                updated_at TEXT,
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # Archived transactions: one transactions_archive_<year> table per year listed
+        # here, and monthly totals of the archived rows so summaries need not read them
+        cursor.execute('CREATE TABLE IF NOT EXISTS transaction_archives (year INTEGER PRIMARY KEY)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transaction_rollups (
+                user_id INTEGER NOT NULL,
+                month_ts INTEGER NOT NULL,
+                transaction_type TEXT NOT NULL,
+                category TEXT NOT NULL DEFAULT '',
+                total REAL NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, month_ts, transaction_type, category)
+            )
+        ''')
+        
+        # Last run of each all-users periodic job, claimed by one process per interval (jobs.py)
+        cursor.execute('CREATE TABLE IF NOT EXISTS job_runs (name TEXT PRIMARY KEY, ran_ts INTEGER NOT NULL DEFAULT 0)')
+        
+        # Databases created before the integer date columns get them added and backfilled once
+        self._migrate_date_columns(cursor)
+        
+        # Per-user data version, bumped by triggers on every write to the user's
+        # ledger, accounts or goals; cached fragments are keyed on it
+        cursor.execute('PRAGMA table_info(users)')
+        if 'data_version' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE users ADD COLUMN data_version INTEGER DEFAULT 0')
+        for table in ('transactions', 'accounts', 'financial_goals'):
+            for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_data_version_{event.lower()}
+                    AFTER {event} ON {table} BEGIN
+                        UPDATE users SET data_version = data_version + 1 WHERE id = {row}.user_id;
+                    END
+                ''')
+        
+        if self.change_log:
+            # Row-level change log read by local replicas (see replica.py) to catch
+            # up on writes made by other processes and hosts
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS change_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    created_ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_user_seq ON change_log (user_id, seq)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_created ON change_log (created_ts)')
+            for table in ('transactions', 'accounts', 'financial_goals'):
+                for event, row, deleted in (('INSERT', 'new', 0), ('UPDATE', 'new', 0), ('DELETE', 'old', 1)):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table}_change_log_{event.lower()}
+                        AFTER {event} ON {table} BEGIN
+                            INSERT INTO change_log (user_id, table_name, row_id, deleted)
+                            VALUES ({row}.user_id, '{table}', {row}.id, {deleted});
+                        END
+                    ''')
+        
+        if self.shard_index:
+            # Each shard issues ids from its own range so rows keep their ids when a user moves
+            floor = self.shard_index * SHARD_ID_SPAN
+            for table in ('transactions', 'accounts', 'financial_goals'):
+                cursor.execute('''
+                    INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0
+                    WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+                ''', (table, table))
+                cursor.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?', (floor, table, floor))
+        
+        if self.sharded:
+            # User ids are issued here; users already in this database (when it is also
+            # a shard) are registered where their rows are
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS shard_directory (
+                    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT UNIQUE NOT NULL,
+                    username TEXT UNIQUE NOT NULL,
+                    shard INTEGER NOT NULL
+                )
+            ''')
+            if self.is_shard:
+                cursor.execute(f'''
+                    INSERT INTO shard_directory (user_id, email, username, shard)
+                    SELECT id, email, username, {self.shard_index} FROM users
+                    WHERE id NOT IN (SELECT user_id FROM shard_directory)
+                ''')
+        
+        # Partial indexes on pending accounts: the all-users alert scan ranges
+        # over due_day, per-user overdue counts over (user_id, due_day)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_accounts_pending_due_day
+            ON accounts (due_day) WHERE status = 'pending'
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_accounts_user_pending_due_day
+            ON accounts (user_id, due_day) WHERE status = 'pending'
+        ''')
+        
+        # Partial indexes backing the subscription expiry sweep
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_users_trial_expiry_ts
+            ON users (trial_end_ts) WHERE subscription_status = 'trial'
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_users_subscription_expiry_ts
+            ON users (subscription_end_ts) WHERE subscription_status = 'active'
+        ''')
+        
+        # Indexes backing TransactionQuery filters and sorts, all scoped by user
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_date_ts ON transactions (user_id, date_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_type_date_ts ON transactions (user_id, transaction_type, date_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_category_date_ts ON transactions (user_id, category, date_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_amount ON transactions (user_id, amount)')
+        
+        # Full-text index over transaction descriptions, kept in sync by triggers.
+        # user_id is indexed as a token so searches intersect with the user's rows
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'transactions_fts'")
+        fts_exists = cursor.fetchone()[0] > 0
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                description, category, user_id,
+                content='transactions', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+                INSERT INTO transactions_fts (rowid, description, category, user_id)
+                VALUES (new.id, new.description, new.category, new.user_id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+                INSERT INTO transactions_fts (transactions_fts, rowid, description, category, user_id)
+                VALUES ('delete', old.id, old.description, old.category, old.user_id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, category, user_id ON transactions BEGIN
+                INSERT INTO transactions_fts (transactions_fts, rowid, description, category, user_id)
+                VALUES ('delete', old.id, old.description, old.category, old.user_id);
+                INSERT INTO transactions_fts (rowid, description, category, user_id)
+                VALUES (new.id, new.description, new.category, new.user_id);
+            END
+        ''')
+        if not fts_exists:
+            # Index rows written before the search table existed
+            cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        
         try:
             conn.commit()
         except Exception as e:
@@ -100,45 +573,217 @@ class Database:
         conn.close()
         logging.info("Database initialized successfully")
 
+    # Integer date columns: epoch seconds (UTC) for instants, day numbers
+    # (days since 1970-01-01) for calendar dates. Each entry is
+    # (table, column, SQL expression backfilling it from the legacy text column)
+    DATE_COLUMNS = (
+        ('users', 'created_ts', "CAST(strftime('%s', created_at) AS INTEGER)"),
+        ('users', 'trial_start_ts', "CAST(strftime('%s', trial_start_date) AS INTEGER)"),
+        ('users', 'trial_end_ts', "CAST(strftime('%s', trial_end_date) AS INTEGER)"),
+        ('users', 'subscription_end_ts', "CAST(strftime('%s', subscription_end_date) AS INTEGER)"),
+        ('transactions', 'date_ts', "CAST(strftime('%s', date) AS INTEGER)"),
+        ('transactions', 'created_ts', "CAST(strftime('%s', created_at) AS INTEGER)"),
+        # Due dates were stored as Brasilia midnight in UTC (02:00/03:00Z), so
+        # the UTC calendar day is the intended one
+        ('accounts', 'due_day', "CAST(julianday(date(due_date)) - 2440587.5 AS INTEGER)"),
+        ('accounts', 'created_ts', "CAST(strftime('%s', created_at) AS INTEGER)"),
+        ('financial_goals', 'target_day', "CAST(julianday(date(target_date)) - 2440587.5 AS INTEGER)"),
+        ('financial_goals', 'created_ts', "CAST(strftime('%s', created_at) AS INTEGER)")
+    )
+    
+    # Indexes over the legacy text date columns, superseded by the integer ones
+    LEGACY_DATE_INDEXES = (
+        'idx_accounts_pending_due', 'idx_accounts_user_pending_due',
+        'idx_users_trial_expiry', 'idx_users_subscription_expiry',
+        'idx_transactions_user_date', 'idx_transactions_user_type_date',
+        'idx_transactions_user_category_date'
+    )
+    
+    def _migrate_date_columns(self, cursor):
+        """Add any missing integer date column and backfill it from the text column"""
+        existing = {}
+        for table, column, backfill in self.DATE_COLUMNS:
+            if table not in existing:
+                cursor.execute(f'PRAGMA table_info({table})')
+                existing[table] = {row[1] for row in cursor.fetchall()}
+            if column in existing[table]:
+                continue
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+            cursor.execute(f'UPDATE {table} SET {column} = {backfill}')
+            logging.info(f"Added and backfilled {table}.{column}")
+        
+        for index in self.LEGACY_DATE_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {index}')
+
 # Global database instance
-db_manager = Database()
+db_manager = Database(shards=DATABASE_SHARDS)
 
-class User:
+def parse_datetime(value):
+    """Convert stored date values to datetime objects"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(value, str):
+        try:
+            # Try parsing ISO format
+            return datetime.fromisoformat(value.replace('Z', '+00:00').replace('+00:00', ''))
+        except ValueError:
+            try:
+                # Try parsing with timezone info removed
+                return datetime.fromisoformat(value.split('+')[0].split('Z')[0])
+            except ValueError:
+                return None
+    return None
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch(value):
+    """Epoch seconds for a naive UTC datetime, date or legacy string"""
+    if value is None or isinstance(value, int):
+        return value
+    value = parse_datetime(value)
+    if value is None:
+        return None
+    return (value - EPOCH) // timedelta(seconds=1)
+
+def from_epoch(seconds):
+    """Naive UTC datetime for epoch seconds"""
+    return EPOCH + timedelta(seconds=seconds)
+
+def to_day(value):
+    """Day number (days since 1970-01-01) for a calendar date, datetime or legacy string"""
+    if value is None or isinstance(value, int):
+        return value
+    if not isinstance(value, date):
+        value = parse_datetime(value)
+        if value is None:
+            return None
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH.date()).days
+
+def from_day(day):
+    """Midnight datetime of a day number"""
+    return EPOCH + timedelta(days=day)
+
+def archive_horizon(now=None):
+    """Epoch seconds before which transactions may be archived, or None when archiving is off"""
+    if TRANSACTION_ARCHIVE_DAYS <= 0:
+        return None
+    return to_epoch(now or datetime.utcnow()) - TRANSACTION_ARCHIVE_DAYS * 86400
+
+class LazyDateTime:
+    """Date attribute that keeps the raw column value in a '_<name>' slot
+    and decodes it only the first time it is read. Integer values go through
+    decode (epoch seconds by default), legacy strings through parse_datetime"""
+    
+    def __init__(self, decode=from_epoch, encode=to_epoch):
+        self.decode = decode
+        self.encode = encode
+    
+    def __set_name__(self, owner, name):
+        self.slot = owner.__dict__['_' + name]
+    
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj)
+        if value is not None and not isinstance(value, datetime):
+            value = self.decode(value) if isinstance(value, int) else parse_datetime(value)
+            self.slot.__set__(obj, value)
+        return value
+    
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+def _as_float(value):
+    return float(value) if value else 0.0
+
+def _as_bool(value):
+    return bool(value) if value else False
+
+class Model:
+    """Base for the row-backed models: __slots__ storage plus one shared row mapper.
+    
+    ROW_FIELDS lists (attribute, converter) pairs in COLUMNS order; LazyDateTime
+    attributes receive the raw column value untouched in their '_<name>' slot."""
+    __slots__ = ()
+    ROW_FIELDS = ()
+    _ROW_SLOTS = ()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # (slot, converter) per column, resolved once per class
+        cls._ROW_SLOTS = tuple(('_' + name if isinstance(cls.__dict__.get(name), LazyDateTime) else name, convert)
+                               for name, convert in cls.ROW_FIELDS)
+    
+    @classmethod
+    def _from_row(cls, row):
+        """Build an instance from a row selected in COLUMNS order, skipping __init__"""
+        obj = cls.__new__(cls)
+        for (name, convert), value in zip(cls._ROW_SLOTS, row):
+            setattr(obj, name, convert(value) if convert else value)
+        return obj
+    
+    def _to_row(self):
+        """Column values in COLUMNS order as stored (the inverse of _from_row)"""
+        row = []
+        for name, _ in self.ROW_FIELDS:
+            descriptor = type(self).__dict__.get(name)
+            if isinstance(descriptor, LazyDateTime):
+                row.append(descriptor.encode(descriptor.slot.__get__(self)))
+            else:
+                row.append(getattr(self, name))
+        return tuple(row)
+    
+    @classmethod
+    def _upsert_sql(cls):
+        """INSERT of a _to_row() tuple that updates in place on an existing id"""
+        columns = [column.strip() for column in cls.COLUMNS.split(',')]
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != 'id')
+        return (f'INSERT INTO {cls.TABLE} ({cls.COLUMNS}) VALUES ({", ".join("?" * len(columns))}) '
+                f'ON CONFLICT(id) DO UPDATE SET {updates}')
+
+class User(Model):
+    TABLE = 'users'
+    COLUMNS = 'id, username, email, password_hash, full_name, phone, created_ts, active, trial_start_ts, trial_end_ts, subscription_plan, subscription_status, subscription_end_ts, data_version'
+    
+    __slots__ = ('id', 'username', 'email', 'password_hash', 'full_name', 'phone', '_created_at', 'active',
+                 '_trial_start_date', '_trial_end_date', 'subscription_plan', 'subscription_status',
+                 '_subscription_end_date', 'data_version')
+    
+    created_at = LazyDateTime()
+    trial_start_date = LazyDateTime()
+    trial_end_date = LazyDateTime()
+    subscription_end_date = LazyDateTime()
+    
+    ROW_FIELDS = (('id', None), ('username', None), ('email', None), ('password_hash', None),
+                  ('full_name', None), ('phone', None), ('created_at', None),
+                  ('active', lambda value: bool(value) if value is not None else True),
+                  ('trial_start_date', None), ('trial_end_date', None),
+                  ('subscription_plan', lambda value: value or 'trial'),
+                  ('subscription_status', lambda value: value or 'trial'),
+                  ('subscription_end_date', None), ('data_version', lambda value: value or 0))
+    
     def __init__(self, id=None, username=None, email=None, password_hash=None, 
                  full_name=None, phone=None, created_at=None, active=None,
                  trial_start_date=None, trial_end_date=None, subscription_plan=None,
-                 subscription_status=None, subscription_end_date=None):
+                 subscription_status=None, subscription_end_date=None, data_version=None):
         self.id = id
         self.username = username
         self.email = email
         self.password_hash = password_hash
         self.full_name = full_name
         self.phone = phone
-        self.created_at = self._parse_datetime(created_at)
+        self.created_at = created_at
         self.active = bool(active) if active is not None else True
-        self.trial_start_date = self._parse_datetime(trial_start_date)
-        self.trial_end_date = self._parse_datetime(trial_end_date)
+        self.trial_start_date = trial_start_date
+        self.trial_end_date = trial_end_date
         self.subscription_plan = subscription_plan or 'trial'
         self.subscription_status = subscription_status or 'trial'
-        self.subscription_end_date = self._parse_datetime(subscription_end_date)
-    
-    def _parse_datetime(self, date_str):
-        """Convert string dates to datetime objects"""
-        if date_str is None:
-            return None
-        if isinstance(date_str, datetime):
-            return date_str
-        if isinstance(date_str, str):
-            try:
-                # Try parsing ISO format
-                return datetime.fromisoformat(date_str.replace('Z', '+00:00').replace('+00:00', ''))
-            except ValueError:
-                try:
-                    # Try parsing with timezone info removed
-                    return datetime.fromisoformat(date_str.split('+')[0].split('Z')[0])
-                except ValueError:
-                    return None
-        return None
+        self.subscription_end_date = subscription_end_date
+        self.data_version = data_version or 0
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -161,26 +806,23 @@ class User:
         return str(self.id)
     
     def is_trial_expired(self):
-        if not self.trial_end_date:
+        # Lapsed trials are flagged by User.expire_lapsed_subscriptions; the end date
+        # covers the time until the next sweep
+        if self.subscription_plan != 'trial':
             return False
-        if isinstance(self.trial_end_date, datetime):
-            return datetime.utcnow() > self.trial_end_date
-        # If it's still a string, try to parse it
-        trial_end = self._parse_datetime(self.trial_end_date)
-        if trial_end:
-            return datetime.utcnow() > trial_end
-        return False
+        trial_end = to_epoch(self._trial_end_date)
+        return (self.subscription_status == 'expired' or
+                (trial_end is not None and to_epoch(datetime.utcnow()) > trial_end))
     
     def is_subscription_active(self):
+        # Compares the raw epoch columns, so no date is decoded
+        now = to_epoch(datetime.utcnow())
         if self.subscription_status == 'trial':
-            return not self.is_trial_expired()
-        if self.subscription_status == 'active' and self.subscription_end_date:
-            if isinstance(self.subscription_end_date, datetime):
-                return datetime.utcnow() <= self.subscription_end_date
-            # If it's still a string, try to parse it
-            sub_end = self._parse_datetime(self.subscription_end_date)
-            if sub_end:
-                return datetime.utcnow() <= sub_end
+            trial_end = to_epoch(self._trial_end_date)
+            return trial_end is None or now <= trial_end
+        if self.subscription_status == 'active':
+            subscription_end = to_epoch(self._subscription_end_date)
+            return subscription_end is not None and now <= subscription_end
         return False
     
     def get_plan_features(self):
@@ -190,28 +832,32 @@ class User:
                 'transactions_limit': 10,
                 'reports': False,
                 'automation': False,
-                'multi_user': False
+                'multi_user': False,
+                'api': False
             },
             'mei': {
                 'name': 'Plano MEI',
                 'transactions_limit': 100,
                 'reports': True,
                 'automation': False,
-                'multi_user': False
+                'multi_user': False,
+                'api': False
             },
             'professional': {
                 'name': 'Plano Profissional',
                 'transactions_limit': 500,
                 'reports': True,
                 'automation': True,
-                'multi_user': False
+                'multi_user': False,
+                'api': False
             },
             'enterprise': {
                 'name': 'Plano Empresarial',
                 'transactions_limit': -1,  # unlimited
                 'reports': True,
                 'automation': True,
-                'multi_user': True
+                'multi_user': True,
+                'api': True
             }
         }
         return features.get(self.subscription_plan, features['trial'])
@@ -219,18 +865,23 @@ class User:
     @staticmethod
     def create(username, email, password, full_name, phone=None):
         """Create a new user"""
-        conn = db_manager.get_connection()
+        # With shards the directory issues the id and picks the shard; otherwise the insert does
+        user_id = db_manager.register_user(email, username) if db_manager.shards else None
+        conn = db_manager.for_user(user_id).get_connection() if user_id else db_manager.get_connection()
         cursor = conn.cursor()
         
-        # Set trial end date (7 days from now)
-        trial_end = (datetime.utcnow() + timedelta(days=7)).isoformat()
+        # Trial starts now and ends 7 days from now
+        now = datetime.utcnow()
+        trial_end = now + timedelta(days=7)
         
         password_hash = generate_password_hash(password)
         
         cursor.execute('''
-            INSERT INTO users (username, email, password_hash, full_name, phone, trial_end_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (username, email, password_hash, full_name, phone, trial_end))
+            INSERT INTO users (id, username, email, password_hash, full_name, phone,
+                               created_ts, trial_start_ts, trial_end_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, username, email, password_hash, full_name, phone,
+              to_epoch(now), to_epoch(now), to_epoch(trial_end)))
         
         user_id = cursor.lastrowid
         try:
@@ -242,64 +893,182 @@ class User:
         
         return User.get_by_id(user_id)
     
+    @staticmethod
+    def expire_lapsed_subscriptions(now=None):
+        """Mark every lapsed trial or subscription as expired, returning how many changed"""
+        now = to_epoch(now or datetime.utcnow())
+        changed = 0
+        for shard in db_manager.all_shards():
+            conn = shard.get_connection()
+            cursor = conn.cursor()
+            
+            # One statement per partial index; an OR of both lets the planner scan users
+            for status, column in (('trial', 'trial_end_ts'), ('active', 'subscription_end_ts')):
+                cursor.execute(f'''
+                    UPDATE users SET subscription_status = 'expired'
+                    WHERE subscription_status = '{status}' AND {column} < ?
+                ''', (now,))
+                changed += cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
+        
+        return changed
+    
     @staticmethod
     def get_by_id(user_id):
         """Get user by ID"""
-        conn = db_manager.get_connection()
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT id, username, email, password_hash, full_name, phone, created_at, active, trial_start_date, trial_end_date, subscription_plan, subscription_status, subscription_end_date FROM users WHERE id = ?', (user_id,))
+        cursor.execute(f'SELECT {User.COLUMNS} FROM users WHERE id = ?', (user_id,))
         row = cursor.fetchone()
         conn.close()
         
         if row:
-            return User(
-                id=row[0], username=row[1], email=row[2], password_hash=row[3],
-                full_name=row[4], phone=row[5], created_at=row[6], active=row[7],
-                trial_start_date=row[8], trial_end_date=row[9], subscription_plan=row[10],
-                subscription_status=row[11], subscription_end_date=row[12]
-            )
+            return User._from_row(row)
         return None
     
+    @staticmethod
+    def get_data_version(user_id):
+        """The user's current data_version, bumped by every write to their rows"""
+        conn = db_manager.get_read_connection(user_id)
+        cursor = conn.cursor()
+        cursor.execute('SELECT data_version FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    
     @staticmethod
     def get_by_email(email):
         """Get user by email"""
+        if db_manager.shards:
+            user_id = db_manager.lookup_user_id('email', email)
+            return User.get_by_id(user_id) if user_id else None
         conn = db_manager.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT id, username, email, password_hash, full_name, phone, created_at, active, trial_start_date, trial_end_date, subscription_plan, subscription_status, subscription_end_date FROM users WHERE email = ?', (email,))
+        cursor.execute(f'SELECT {User.COLUMNS} FROM users WHERE email = ?', (email,))
         row = cursor.fetchone()
         conn.close()
         
         if row:
-            return User(
-                id=row[0], username=row[1], email=row[2], password_hash=row[3],
-                full_name=row[4], phone=row[5], created_at=row[6], active=row[7],
-                trial_start_date=row[8], trial_end_date=row[9], subscription_plan=row[10],
-                subscription_status=row[11], subscription_end_date=row[12]
-            )
+            return User._from_row(row)
         return None
     
     @staticmethod
     def get_by_username(username):
         """Get user by username"""
+        if db_manager.shards:
+            user_id = db_manager.lookup_user_id('username', username)
+            return User.get_by_id(user_id) if user_id else None
         conn = db_manager.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT id, username, email, password_hash, full_name, phone, created_at, active, trial_start_date, trial_end_date, subscription_plan, subscription_status, subscription_end_date FROM users WHERE username = ?', (username,))
+        cursor.execute(f'SELECT {User.COLUMNS} FROM users WHERE username = ?', (username,))
         row = cursor.fetchone()
         conn.close()
         
         if row:
-            return User(
-                id=row[0], username=row[1], email=row[2], password_hash=row[3],
-                full_name=row[4], phone=row[5], created_at=row[6], active=row[7],
-                trial_start_date=row[8], trial_end_date=row[9], subscription_plan=row[10],
-                subscription_status=row[11], subscription_end_date=row[12]
-            )
+            return User._from_row(row)
         return None
 
-class Transaction:
+class ApiToken:
+    def __init__(self, id=None, user_id=None, name=None, created_at=None, last_used_at=None):
+        self.id = id
+        self.user_id = user_id
+        self.name = name
+        self.created_at = created_at
+        self.last_used_at = last_used_at
+    
+    @staticmethod
+    def _hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    @staticmethod
+    def create(user_id, name):
+        """Issue a new token; the plain value is returned once and only its hash is stored"""
+        token = secrets.token_urlsafe(32)
+        conn = db_manager.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('INSERT INTO api_tokens (user_id, name, token_hash) VALUES (?, ?, ?)',
+                       (user_id, name, ApiToken._hash(token)))
+        token_id = cursor.lastrowid
+        try:
+            conn.commit()
+        except Exception as e:
+            # SQLite Cloud auto-commit behavior - this is expected
+            pass
+        conn.close()
+        
+        return ApiToken(id=token_id, user_id=user_id, name=name), token
+    
+    @staticmethod
+    def get_user_id(token):
+        """Resolve a plain token to its user id, recording its use"""
+        conn = db_manager.get_connection()
+        cursor = conn.cursor()
+        
+        token_hash = ApiToken._hash(token)
+        cursor.execute('SELECT user_id FROM api_tokens WHERE token_hash = ?', (token_hash,))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute('UPDATE api_tokens SET last_used_at = ? WHERE token_hash = ?',
+                           (datetime.utcnow().isoformat(), token_hash))
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+        conn.close()
+        
+        return row[0] if row else None
+    
+    @staticmethod
+    def get_by_user_id(user_id):
+        conn = db_manager.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, user_id, name, created_at, last_used_at FROM api_tokens WHERE user_id = ? ORDER BY id', (user_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [ApiToken(id=row[0], user_id=row[1], name=row[2], created_at=row[3], last_used_at=row[4]) for row in rows]
+    
+    @staticmethod
+    def revoke(token_id, user_id):
+        conn = db_manager.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM api_tokens WHERE id = ? AND user_id = ?', (token_id, user_id))
+        revoked = cursor.rowcount > 0
+        try:
+            conn.commit()
+        except Exception as e:
+            # SQLite Cloud auto-commit behavior - this is expected
+            pass
+        conn.close()
+        
+        return revoked
+
+class Transaction(Model):
+    TABLE = 'transactions'
+    COLUMNS = 'id, user_id, description, amount, transaction_type, category, date_ts, created_ts, is_recurring, recurrence_type, account_id'
+    
+    __slots__ = ('id', 'user_id', 'description', 'amount', 'transaction_type', 'category',
+                 '_date', '_created_at', 'is_recurring', 'recurrence_type', 'account_id')
+    
+    date = LazyDateTime()
+    created_at = LazyDateTime()
+    
+    ROW_FIELDS = (('id', None), ('user_id', None), ('description', None), ('amount', _as_float),
+                  ('transaction_type', None), ('category', None), ('date', None), ('created_at', None),
+                  ('is_recurring', _as_bool), ('recurrence_type', None), ('account_id', None))
+    
     def __init__(self, id=None, user_id=None, description=None, amount=None,
                  transaction_type=None, category=None, date=None, created_at=None,
                  is_recurring=None, recurrence_type=None, account_id=None):
@@ -309,89 +1078,183 @@ class Transaction:
         self.amount = float(amount) if amount else 0.0
         self.transaction_type = transaction_type
         self.category = category
-        self.date = self._parse_datetime(date)
-        self.created_at = self._parse_datetime(created_at)
+        self.date = date
+        self.created_at = created_at
         self.is_recurring = bool(is_recurring) if is_recurring else False
         self.recurrence_type = recurrence_type
         self.account_id = account_id
     
-    def _parse_datetime(self, date_str):
-        """Convert string dates to datetime objects"""
-        if date_str is None:
-            return None
-        if isinstance(date_str, datetime):
-            return date_str
-        if isinstance(date_str, str):
-            try:
-                # Try parsing ISO format
-                return datetime.fromisoformat(date_str.replace('Z', '+00:00').replace('+00:00', ''))
-            except ValueError:
-                try:
-                    # Try parsing with timezone info removed
-                    return datetime.fromisoformat(date_str.split('+')[0].split('Z')[0])
-                except ValueError:
-                    return None
-        return None
+    @property
+    def date_ts(self):
+        """The date as epoch seconds, without decoding a datetime"""
+        return to_epoch(self._date)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'description': self.description,
+            'amount': self.amount,
+            'transaction_type': self.transaction_type,
+            'category': self.category,
+            'date': self.date.isoformat() if self.date else None,
+            'is_recurring': self.is_recurring,
+            'recurrence_type': self.recurrence_type,
+            'account_id': self.account_id
+        }
     
     def save(self):
         """Save transaction to database"""
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        is_new = not self.id
+        if is_new:
+            if self._created_at is None:
+                self.created_at = datetime.utcnow()
+            if self._date is None:
+                self.date = self._created_at
         
-        if self.id:
-            # Update existing
-            cursor.execute('''
-                UPDATE transactions 
-                SET description=?, amount=?, transaction_type=?, category=?, 
-                    date=?, is_recurring=?, recurrence_type=?, account_id=?
-                WHERE id=?
-            ''', (self.description, self.amount, self.transaction_type, self.category,
-                  self.date, self.is_recurring, self.recurrence_type, self.account_id, self.id))
+        if db_manager.write_behind is not None:
+            db_manager.write_behind.save(self)
         else:
-            # Create new
-            cursor.execute('''
-                INSERT INTO transactions (user_id, description, amount, transaction_type, 
-                                        category, date, is_recurring, recurrence_type, account_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (self.user_id, self.description, self.amount, self.transaction_type,
-                  self.category, self.date, self.is_recurring, self.recurrence_type, self.account_id))
-            self.id = cursor.lastrowid
+            conn = db_manager.for_user(self.user_id).get_connection()
+            cursor = conn.cursor()
+            
+            if self.id:
+                # Update existing
+                cursor.execute('''
+                    UPDATE transactions 
+                    SET description=?, amount=?, transaction_type=?, category=?, 
+                        date_ts=?, is_recurring=?, recurrence_type=?, account_id=?
+                    WHERE id=?
+                ''', (self.description, self.amount, self.transaction_type, self.category,
+                      to_epoch(self._date), self.is_recurring, self.recurrence_type, self.account_id, self.id))
+            else:
+                # Create new
+                cursor.execute('''
+                    INSERT INTO transactions (user_id, description, amount, transaction_type, 
+                                            category, date_ts, created_ts, is_recurring, recurrence_type, account_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (self.user_id, self.description, self.amount, self.transaction_type,
+                      self.category, to_epoch(self._date), to_epoch(self._created_at),
+                      self.is_recurring, self.recurrence_type, self.account_id))
+                self.id = cursor.lastrowid
+            
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
         
-        try:
-            conn.commit()
-        except Exception as e:
-            # SQLite Cloud auto-commit behavior - this is expected
-            pass
-        conn.close()
+        if db_manager.replica is not None:
+            db_manager.replica.write_through(self)
+        
+        publish(self.user_id, 'transaction.created' if is_new else 'transaction.updated', self.to_dict())
         return self
     
     @staticmethod
-    def get_by_user_id(user_id, limit=None, order_by='date DESC'):
-        """Get transactions by user ID"""
-        conn = db_manager.get_connection()
+    def get_by_user_id(user_id, limit=None, order_by='date_desc', start=None, end=None):
+        """Get transactions by user ID, optionally with start <= date < end (order_by is a
+        TransactionQuery sort key); archived years are included when the range reaches them"""
+        return TransactionQuery(user_id).date_range(start, end).order_by(order_by).all(limit=limit)
+    
+    @staticmethod
+    def archive_table(year):
+        return f'transactions_archive_{int(year)}'
+    
+    @staticmethod
+    def create_archive_table(cursor, year):
+        """Create (if needed) and register the archive table for a calendar year (UTC)"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {Transaction.archive_table(year)} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                description TEXT NOT NULL,
+                amount REAL NOT NULL,
+                transaction_type TEXT NOT NULL,
+                category TEXT,
+                date_ts INTEGER,
+                created_ts INTEGER,
+                is_recurring INTEGER DEFAULT 0,
+                recurrence_type TEXT,
+                account_id INTEGER
+            )
+        ''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{Transaction.archive_table(year)}_user_date_ts '
+                       f'ON {Transaction.archive_table(year)} (user_id, date_ts)')
+        cursor.execute('INSERT OR IGNORE INTO transaction_archives (year) VALUES (?)', (int(year),))
+    
+    @staticmethod
+    def archive_years(cursor, start_ts=None, end_ts=None):
+        """Years with an archive table overlapping start_ts <= date_ts < end_ts (either may be None)"""
+        first = from_epoch(start_ts).year if start_ts is not None else 0
+        last = from_epoch(end_ts - 1).year if end_ts is not None else 9999
+        cursor.execute('SELECT year FROM transaction_archives WHERE year BETWEEN ? AND ? ORDER BY year',
+                       (first, last))
+        return [row[0] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _search_expression(user_id, text):
+        """Build an FTS5 MATCH expression limited to the user's rows, or None if text has no terms"""
+        terms = re.findall(r'\w+', text or '')
+        if not terms:
+            return None
+        # Every term must match (as a prefix) in description or category
+        matched_terms = ' AND '.join(f'"{term}"*' for term in terms)
+        return f'user_id:"{int(user_id)}" AND {{description category}}: ({matched_terms})'
+    
+    @staticmethod
+    def search(user_id, text, page=1, per_page=20):
+        """Full-text search over the user's transactions, best matches first.
+        
+        Returns (transactions, total_matches)."""
+        expression = Transaction._search_expression(user_id, text)
+        if expression is None:
+            return [], 0
+        
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
-        query = f'SELECT id, user_id, description, amount, transaction_type, category, date, created_at, is_recurring, recurrence_type, account_id FROM transactions WHERE user_id = ? ORDER BY {order_by}'
-        if limit:
-            query += f' LIMIT {limit}'
+        cursor.execute('SELECT COUNT(*) FROM transactions_fts WHERE transactions_fts MATCH ?', (expression,))
+        total = cursor.fetchone()[0]
         
-        cursor.execute(query, (user_id,))
+        # Column weights: description, category, user_id (filter only)
+        cursor.execute('''
+            SELECT t.id, t.user_id, t.description, t.amount, t.transaction_type, t.category,
+                   t.date_ts, t.created_ts, t.is_recurring, t.recurrence_type, t.account_id
+            FROM transactions_fts
+            JOIN transactions t ON t.id = transactions_fts.rowid
+            WHERE transactions_fts MATCH ?
+            ORDER BY bm25(transactions_fts, 10.0, 2.0, 0.0)
+            LIMIT ? OFFSET ?
+        ''', (expression, per_page, (page - 1) * per_page))
         rows = cursor.fetchall()
         conn.close()
         
-        return [Transaction(
-            id=row[0], user_id=row[1], description=row[2], amount=row[3],
-            transaction_type=row[4], category=row[5], date=row[6], created_at=row[7],
-            is_recurring=row[8], recurrence_type=row[9], account_id=row[10]
-        ) for row in rows]
+        return [Transaction._from_row(row) for row in rows], total
+    
+    @staticmethod
+    def rebuild_search_index():
+        """Rebuild the full-text index from the transactions table (on every shard)"""
+        for shard in db_manager.all_shards():
+            conn = shard.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
     
     @staticmethod
     def count_by_user_id(user_id):
-        """Count transactions by user ID"""
-        conn = db_manager.get_connection()
+        """Count transactions by user ID, archived ones included"""
+        conn = db_manager.get_read_connection(user_id, archived=archive_horizon() is not None)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT COUNT(*) FROM transactions WHERE user_id = ?', (user_id,))
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM transactions WHERE user_id = ?)
+                 + (SELECT COALESCE(SUM(count), 0) FROM transaction_rollups WHERE user_id = ?)
+        ''', (user_id, user_id))
         result = cursor.fetchone()
         conn.close()
         
@@ -400,33 +1263,215 @@ class Transaction:
     @staticmethod
     def get_monthly_summary(user_id, month, year):
         """Get monthly income and expenses summary"""
-        conn = db_manager.get_connection()
+        # Income and expenses in one integer range scan over the (UTC) month, plus
+        # the month's rollup of archived rows
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        horizon = archive_horizon()
+        conn = db_manager.get_read_connection(user_id, archived=horizon is not None and to_epoch(start) < horizon)
         cursor = conn.cursor()
         
-        # Get monthly income
         cursor.execute('''
-            SELECT COALESCE(SUM(amount), 0) FROM transactions 
-            WHERE user_id = ? AND transaction_type = 'income' 
-            AND strftime('%m', date) = ? AND strftime('%Y', date) = ?
-        ''', (user_id, f'{month:02d}', str(year)))
+            SELECT transaction_type, SUM(total) FROM (
+                SELECT transaction_type, SUM(amount) AS total FROM transactions 
+                WHERE user_id = ? AND date_ts >= ? AND date_ts < ?
+                GROUP BY transaction_type
+                UNION ALL
+                SELECT transaction_type, total FROM transaction_rollups
+                WHERE user_id = ? AND month_ts = ?
+            )
+            GROUP BY transaction_type
+        ''', (user_id, to_epoch(start), to_epoch(end), user_id, to_epoch(start)))
+        
+        totals = dict(cursor.fetchall())
+        conn.close()
         
-        income_result = cursor.fetchone()
-        income = income_result[0] if income_result else 0
+        return float(totals.get('income') or 0), float(totals.get('expense') or 0)
+    
+    @staticmethod
+    def get_category_totals(user_id, transaction_type='expense'):
+        """[(category, total)] over all of the user's transactions of a type, archived ones included"""
+        conn = db_manager.get_read_connection(user_id, archived=archive_horizon() is not None)
+        cursor = conn.cursor()
         
-        # Get monthly expenses
         cursor.execute('''
-            SELECT COALESCE(SUM(amount), 0) FROM transactions 
-            WHERE user_id = ? AND transaction_type = 'expense' 
-            AND strftime('%m', date) = ? AND strftime('%Y', date) = ?
-        ''', (user_id, f'{month:02d}', str(year)))
+            SELECT category, SUM(total) FROM (
+                SELECT category, SUM(amount) AS total FROM transactions 
+                WHERE user_id = ? AND transaction_type = ? AND category IS NOT NULL
+                GROUP BY category
+                UNION ALL
+                SELECT category, total FROM transaction_rollups
+                WHERE user_id = ? AND transaction_type = ? AND category <> ''
+            )
+            GROUP BY category
+        ''', (user_id, transaction_type, user_id, transaction_type))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [(category, float(total)) for category, total in rows]
+
+class TransactionQuery:
+    """Composable filter over one user's transactions.
+    
+    Predicates are always parameterized and sort keys come from a whitelist,
+    so request arguments never reach the SQL text. Each filter is backed by
+    an index that starts with user_id (see Database.init_db). When the date
+    range reaches past the archive horizon, the archive tables of the years it
+    covers are unioned in with the same predicates."""
+    
+    SORT_KEYS = {
+        'date_desc': 'date_ts DESC, id DESC',
+        'date_asc': 'date_ts ASC, id ASC',
+        'amount_desc': 'amount DESC, id DESC',
+        'amount_asc': 'amount ASC, id ASC'
+    }
+    
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._predicates = ['user_id = ?']
+        self._params = [user_id]
+        self._order = self.SORT_KEYS['date_desc']
+        self._start_ts = None
+        self._end_ts = None
+    
+    def _where(self, predicate, *params):
+        self._predicates.append(predicate)
+        self._params.extend(params)
+        return self
+    
+    def date_range(self, start=None, end=None):
+        """Keep transactions with start <= date < end (UTC datetimes, either may be None)"""
+        if start is not None:
+            self._start_ts = to_epoch(start)
+            self._where('date_ts >= ?', self._start_ts)
+        if end is not None:
+            self._end_ts = to_epoch(end)
+            self._where('date_ts < ?', self._end_ts)
+        return self
+    
+    def category(self, category):
+        if category:
+            self._where('category = ?', category)
+        return self
+    
+    def transaction_type(self, transaction_type):
+        if transaction_type:
+            if transaction_type not in ('income', 'expense'):
+                raise ValueError(f'Invalid transaction type: {transaction_type}')
+            self._where('transaction_type = ?', transaction_type)
+        return self
+    
+    def amount_range(self, minimum=None, maximum=None):
+        if minimum is not None:
+            self._where('amount >= ?', float(minimum))
+        if maximum is not None:
+            self._where('amount <= ?', float(maximum))
+        return self
+    
+    def order_by(self, sort_key):
+        if sort_key not in self.SORT_KEYS:
+            raise ValueError(f'Invalid sort key: {sort_key}')
+        self._order = self.SORT_KEYS[sort_key]
+        return self
+    
+    def _archive_horizon(self):
+        """The archive horizon when the date range starts before it, else None"""
+        horizon = archive_horizon()
+        if horizon is None or (self._start_ts is not None and self._start_ts >= horizon):
+            return None
+        return horizon
+    
+    def _tables(self, archive_years):
+        return ['transactions'] + [Transaction.archive_table(year) for year in archive_years]
+    
+    def _select_sql(self, limit=None, offset=0, archive_years=()):
+        tables = self._tables(archive_years)
+        where = " AND ".join(self._predicates)
+        sql = ' UNION ALL '.join(f'SELECT {Transaction.COLUMNS} FROM {table} WHERE {where}' for table in tables)
+        sql += f' ORDER BY {self._order}'
+        params = list(self._params) * len(tables)
+        if limit:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [int(limit), int(offset)]
+        return sql, params
+    
+    def _count_sql(self, archive_years=()):
+        tables = self._tables(archive_years)
+        where = " AND ".join(self._predicates)
+        if len(tables) == 1:
+            return f'SELECT COUNT(*) FROM transactions WHERE {where}', list(self._params)
+        counts = ' + '.join(f'(SELECT COUNT(*) FROM {table} WHERE {where})' for table in tables)
+        return f'SELECT {counts}', list(self._params) * len(tables)
+    
+    def all(self, limit=None, offset=0):
+        horizon = self._archive_horizon()
+        if horizon is None or (limit and self._order == self.SORT_KEYS['date_desc']):
+            conn = db_manager.get_read_connection(self.user_id)
+            cursor = conn.cursor()
+            
+            cursor.execute(*self._select_sql(limit, offset))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            transactions = [Transaction._from_row(row) for row in rows]
+            # Archived rows all predate the horizon, so a newest-first page of live
+            # rows that ends after it is already complete
+            if horizon is None or (len(transactions) == int(limit) and transactions[-1].date_ts is not None
+                                   and transactions[-1].date_ts >= horizon):
+                return transactions
+        
+        conn = db_manager.get_read_connection(self.user_id, archived=True)
+        cursor = conn.cursor()
+        
+        cursor.execute(*self._select_sql(limit, offset, Transaction.archive_years(cursor, self._start_ts, self._end_ts)))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [Transaction._from_row(row) for row in rows]
+    
+    def count(self):
+        horizon = self._archive_horizon()
+        conn = db_manager.get_read_connection(self.user_id, archived=horizon is not None)
+        cursor = conn.cursor()
+        
+        archive_years = Transaction.archive_years(cursor, self._start_ts, self._end_ts) if horizon is not None else ()
+        cursor.execute(*self._count_sql(archive_years))
+        result = cursor.fetchone()
+        conn.close()
+        
+        return result[0] if result else 0
+    
+    def paginate(self, page=1, per_page=20):
+        """Return (transactions, total) for a 1-based page"""
+        return self.all(limit=per_page, offset=(page - 1) * per_page), self.count()
+    
+    def explain(self):
+        """EXPLAIN QUERY PLAN details for the page and count queries"""
+        conn = db_manager.for_user(self.user_id).get_connection()
+        cursor = conn.cursor()
         
-        expenses_result = cursor.fetchone()
-        expenses = expenses_result[0] if expenses_result else 0
+        plans = []
+        for sql, params in (self._select_sql(limit=20), self._count_sql()):
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plans.append([row[-1] for row in cursor.fetchall()])
         conn.close()
         
-        return float(income), float(expenses)
+        return plans
 
-class Account:
+class Account(Model):
+    TABLE = 'accounts'
+    COLUMNS = 'id, user_id, name, account_type, amount, due_day, status, created_ts'
+    
+    __slots__ = ('id', 'user_id', 'name', 'account_type', 'amount', '_due_date', 'status', '_created_at')
+    
+    due_date = LazyDateTime(from_day, to_day)
+    created_at = LazyDateTime()
+    
+    ROW_FIELDS = (('id', None), ('user_id', None), ('name', None), ('account_type', None),
+                  ('amount', _as_float), ('due_date', None),
+                  ('status', lambda value: value or 'pending'), ('created_at', None))
+    
     def __init__(self, id=None, user_id=None, name=None, account_type=None,
                  amount=None, due_date=None, status=None, created_at=None):
         self.id = id
@@ -434,101 +1479,112 @@ class Account:
         self.name = name
         self.account_type = account_type
         self.amount = float(amount) if amount else 0.0
-        self.due_date = self._parse_datetime(due_date)
+        self.due_date = due_date
         self.status = status or 'pending'
-        self.created_at = self._parse_datetime(created_at)
+        self.created_at = created_at
     
-    def _parse_datetime(self, date_str):
-        """Convert string dates to datetime objects"""
-        if date_str is None:
-            return None
-        if isinstance(date_str, datetime):
-            return date_str
-        if isinstance(date_str, str):
-            try:
-                # Try parsing ISO format
-                return datetime.fromisoformat(date_str.replace('Z', '+00:00').replace('+00:00', ''))
-            except ValueError:
-                try:
-                    # Try parsing with timezone info removed
-                    return datetime.fromisoformat(date_str.split('+')[0].split('Z')[0])
-                except ValueError:
-                    return None
-        return None
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'account_type': self.account_type,
+            'amount': self.amount,
+            'due_date': self.due_date.date().isoformat() if self.due_date else None,
+            'status': self.status
+        }
     
     def save(self):
         """Save account to database"""
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        if not self.id and self._created_at is None:
+            self.created_at = datetime.utcnow()
         
-        if self.id:
-            # Update existing
-            cursor.execute('''
-                UPDATE accounts 
-                SET name=?, account_type=?, amount=?, due_date=?, status=?
-                WHERE id=?
-            ''', (self.name, self.account_type, self.amount, self.due_date, self.status, self.id))
+        # account.paid is published only on the transition to paid
+        newly_paid = self.status == 'paid' and (not self.id or self._stored_status() != 'paid')
+        
+        if db_manager.write_behind is not None:
+            # Alerts are refreshed when the journal is flushed
+            db_manager.write_behind.save(self)
         else:
-            # Create new
-            cursor.execute('''
-                INSERT INTO accounts (user_id, name, account_type, amount, due_date, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (self.user_id, self.name, self.account_type, self.amount, self.due_date, self.status))
-            self.id = cursor.lastrowid
+            conn = db_manager.for_user(self.user_id).get_connection()
+            cursor = conn.cursor()
+            
+            if self.id:
+                # Update existing
+                cursor.execute('''
+                    UPDATE accounts 
+                    SET name=?, account_type=?, amount=?, due_day=?, status=?
+                    WHERE id=?
+                ''', (self.name, self.account_type, self.amount, to_day(self._due_date), self.status, self.id))
+            else:
+                # Create new
+                cursor.execute('''
+                    INSERT INTO accounts (user_id, name, account_type, amount, due_day, status, created_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (self.user_id, self.name, self.account_type, self.amount, to_day(self._due_date),
+                      self.status, to_epoch(self._created_at)))
+                self.id = cursor.lastrowid
+            
+            # Keep the user's reminder row in step with the change
+            AccountAlert.refresh(cursor, user_id=self.user_id)
+            
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
         
-        try:
-            conn.commit()
-        except Exception as e:
-            # SQLite Cloud auto-commit behavior - this is expected
-            pass
-        conn.close()
+        if db_manager.replica is not None:
+            db_manager.replica.write_through(self)
+        
+        publish(self.user_id, 'account.paid' if newly_paid else 'account.saved', self.to_dict())
         return self
     
+    def _stored_status(self):
+        """Status of this account as last saved (journaled saves included)"""
+        conn = db_manager.get_read_connection(self.user_id)
+        cursor = conn.cursor()
+        cursor.execute('SELECT status FROM accounts WHERE id = ?', (self.id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    
     @staticmethod
     def get_by_user_id(user_id, account_type=None):
         """Get accounts by user ID and optionally by type"""
-        conn = db_manager.get_connection()
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
         if account_type:
-            cursor.execute('SELECT id, user_id, name, account_type, amount, due_date, status, created_at FROM accounts WHERE user_id = ? AND account_type = ?', 
+            cursor.execute(f'SELECT {Account.COLUMNS} FROM accounts WHERE user_id = ? AND account_type = ?', 
                           (user_id, account_type))
         else:
-            cursor.execute('SELECT id, user_id, name, account_type, amount, due_date, status, created_at FROM accounts WHERE user_id = ?', (user_id,))
+            cursor.execute(f'SELECT {Account.COLUMNS} FROM accounts WHERE user_id = ?', (user_id,))
         
         rows = cursor.fetchall()
         conn.close()
         
-        return [Account(
-            id=row[0], user_id=row[1], name=row[2], account_type=row[3],
-            amount=row[4], due_date=row[5], status=row[6], created_at=row[7]
-        ) for row in rows]
+        return [Account._from_row(row) for row in rows]
     
     @staticmethod
-    def get_by_id(account_id, user_id=None):
-        """Get account by ID, optionally filtered by user"""
-        conn = db_manager.get_connection()
+    def get_by_id(account_id, user_id):
+        """Get one of the user's accounts by ID; the user picks the shard to read"""
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
-        if user_id:
-            cursor.execute('SELECT id, user_id, name, account_type, amount, due_date, status, created_at FROM accounts WHERE id = ? AND user_id = ?', (account_id, user_id))
-        else:
-            cursor.execute('SELECT id, user_id, name, account_type, amount, due_date, status, created_at FROM accounts WHERE id = ?', (account_id,))
+        cursor.execute(f'SELECT {Account.COLUMNS} FROM accounts WHERE id = ? AND user_id = ?', (account_id, user_id))
         
         row = cursor.fetchone()
         conn.close()
         
         if row:
-            return Account(
-                id=row[0], user_id=row[1], name=row[2], account_type=row[3],
-                amount=row[4], due_date=row[5], status=row[6], created_at=row[7]
-            )
+            return Account._from_row(row)
         return None
     
     @staticmethod
     def get_pending_total(user_id, account_type):
         """Get total amount for pending accounts of a specific type"""
-        conn = db_manager.get_connection()
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -542,7 +1598,115 @@ class Account:
         
         return float(total)
 
-class FinancialGoal:
+class AccountAlert:
+    DUE_SOON_DAYS = 3
+    
+    COLUMNS = ('user_id', 'overdue_payables', 'overdue_payables_total',
+               'overdue_receivables', 'overdue_receivables_total',
+               'due_soon_payables', 'due_soon_payables_total',
+               'due_soon_receivables', 'due_soon_receivables_total', 'updated_at')
+    
+    def __init__(self, **fields):
+        for column in self.COLUMNS:
+            setattr(self, column, fields.get(column) or 0)
+        self.updated_at = fields.get('updated_at')
+    
+    def has_alerts(self):
+        return bool(self.overdue_payables or self.overdue_receivables or
+                    self.due_soon_payables or self.due_soon_receivables)
+    
+    def to_dict(self):
+        return {column: getattr(self, column) for column in self.COLUMNS}
+    
+    @staticmethod
+    def refresh(cursor, user_id=None, now=None):
+        """Rebuild alert rows from pending accounts, for one user or for everyone in one pass.
+        
+        Due dates are calendar days, so "today" is the Brasilia date of now (UTC)."""
+        today = to_day(utc_to_brasilia(now or datetime.utcnow()).date())
+        params = (today, today + AccountAlert.DUE_SOON_DAYS)
+        user_filter = ''
+        
+        if user_id is not None:
+            cursor.execute('DELETE FROM account_alerts WHERE user_id = ?', (user_id,))
+            user_filter = 'AND user_id = ?'
+            params += (user_id,)
+        else:
+            cursor.execute('DELETE FROM account_alerts')
+        
+        cursor.execute(f'''
+            INSERT INTO account_alerts (user_id, overdue_payables, overdue_payables_total,
+                                        overdue_receivables, overdue_receivables_total,
+                                        due_soon_payables, due_soon_payables_total,
+                                        due_soon_receivables, due_soon_receivables_total, updated_at)
+            SELECT user_id,
+                   SUM(overdue AND account_type = 'payable'),
+                   SUM(CASE WHEN overdue AND account_type = 'payable' THEN amount ELSE 0 END),
+                   SUM(overdue AND account_type = 'receivable'),
+                   SUM(CASE WHEN overdue AND account_type = 'receivable' THEN amount ELSE 0 END),
+                   SUM(NOT overdue AND account_type = 'payable'),
+                   SUM(CASE WHEN NOT overdue AND account_type = 'payable' THEN amount ELSE 0 END),
+                   SUM(NOT overdue AND account_type = 'receivable'),
+                   SUM(CASE WHEN NOT overdue AND account_type = 'receivable' THEN amount ELSE 0 END),
+                   CURRENT_TIMESTAMP
+            FROM (
+                SELECT user_id, account_type, amount, due_day < ? AS overdue
+                FROM accounts
+                WHERE status = 'pending' AND due_day <= ? {user_filter}
+            )
+            GROUP BY user_id
+        ''', params)
+    
+    @staticmethod
+    def refresh_all(now=None):
+        """Scan all users' overdue and due-soon accounts into account_alerts"""
+        users_with_alerts = 0
+        for shard in db_manager.all_shards():
+            conn = shard.get_connection()
+            cursor = conn.cursor()
+            
+            AccountAlert.refresh(cursor, now=now)
+            cursor.execute('SELECT COUNT(*) FROM account_alerts')
+            result = cursor.fetchone()
+            users_with_alerts += result[0] if result else 0
+            
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
+        
+        return users_with_alerts
+    
+    @staticmethod
+    def get_by_user_id(user_id):
+        """Get the user's alert summary (all zeros when nothing is due)"""
+        conn = db_manager.get_read_connection(user_id)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'SELECT {", ".join(AccountAlert.COLUMNS)} FROM account_alerts WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return AccountAlert(**dict(zip(AccountAlert.COLUMNS, row)))
+        return AccountAlert(user_id=user_id)
+
+class FinancialGoal(Model):
+    TABLE = 'financial_goals'
+    COLUMNS = 'id, user_id, title, target_amount, current_amount, target_day, created_ts, is_completed'
+    
+    __slots__ = ('id', 'user_id', 'title', 'target_amount', 'current_amount', '_target_date',
+                 '_created_at', 'is_completed')
+    
+    target_date = LazyDateTime(from_day, to_day)
+    created_at = LazyDateTime()
+    
+    ROW_FIELDS = (('id', None), ('user_id', None), ('title', None), ('target_amount', _as_float),
+                  ('current_amount', _as_float), ('target_date', None), ('created_at', None),
+                  ('is_completed', _as_bool))
+    
     def __init__(self, id=None, user_id=None, title=None, target_amount=None,
                  current_amount=None, target_date=None, created_at=None, is_completed=None):
         self.id = id
@@ -550,111 +1714,131 @@ class FinancialGoal:
         self.title = title
         self.target_amount = float(target_amount) if target_amount else 0.0
         self.current_amount = float(current_amount) if current_amount else 0.0
-        self.target_date = self._parse_datetime(target_date)
-        self.created_at = self._parse_datetime(created_at)
+        self.target_date = target_date
+        self.created_at = created_at
         self.is_completed = bool(is_completed) if is_completed else False
     
-    def _parse_datetime(self, date_str):
-        """Convert string dates to datetime objects"""
-        if date_str is None:
-            return None
-        if isinstance(date_str, datetime):
-            return date_str
-        if isinstance(date_str, str):
-            try:
-                # Try parsing ISO format
-                return datetime.fromisoformat(date_str.replace('Z', '+00:00').replace('+00:00', ''))
-            except ValueError:
-                try:
-                    # Try parsing with timezone info removed
-                    return datetime.fromisoformat(date_str.split('+')[0].split('Z')[0])
-                except ValueError:
-                    return None
-        return None
-    
     def get_progress_percentage(self):
         if self.target_amount == 0:
             return 0
         return min(100, (self.current_amount / self.target_amount) * 100)
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'target_amount': self.target_amount,
+            'current_amount': self.current_amount,
+            'target_date': self.target_date.date().isoformat() if self.target_date else None,
+            'is_completed': self.is_completed,
+            'progress': self.get_progress_percentage()
+        }
+    
     def save(self):
         """Save goal to database"""
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        if not self.id and self._created_at is None:
+            self.created_at = datetime.utcnow()
         
-        if self.id:
-            # Update existing
-            cursor.execute('''
-                UPDATE financial_goals 
-                SET title=?, target_amount=?, current_amount=?, target_date=?, is_completed=?
-                WHERE id=?
-            ''', (self.title, self.target_amount, self.current_amount, 
-                  self.target_date, self.is_completed, self.id))
+        # goal.completed is published only on the transition to completed
+        newly_completed = bool(self.is_completed) and (not self.id or not self._stored_is_completed())
+        
+        if db_manager.write_behind is not None:
+            db_manager.write_behind.save(self)
         else:
-            # Create new
-            cursor.execute('''
-                INSERT INTO financial_goals (user_id, title, target_amount, current_amount, target_date, is_completed)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (self.user_id, self.title, self.target_amount, self.current_amount, 
-                  self.target_date, self.is_completed))
-            self.id = cursor.lastrowid
+            conn = db_manager.for_user(self.user_id).get_connection()
+            cursor = conn.cursor()
+            
+            if self.id:
+                # Update existing
+                cursor.execute('''
+                    UPDATE financial_goals 
+                    SET title=?, target_amount=?, current_amount=?, target_day=?, is_completed=?
+                    WHERE id=?
+                ''', (self.title, self.target_amount, self.current_amount, 
+                      to_day(self._target_date), self.is_completed, self.id))
+            else:
+                # Create new
+                cursor.execute('''
+                    INSERT INTO financial_goals (user_id, title, target_amount, current_amount, target_day,
+                                                 created_ts, is_completed)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (self.user_id, self.title, self.target_amount, self.current_amount, 
+                      to_day(self._target_date), to_epoch(self._created_at), self.is_completed))
+                self.id = cursor.lastrowid
+            
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
         
-        try:
-            conn.commit()
-        except Exception as e:
-            # SQLite Cloud auto-commit behavior - this is expected
-            pass
-        conn.close()
+        if db_manager.replica is not None:
+            db_manager.replica.write_through(self)
+        
+        publish(self.user_id, 'goal.completed' if newly_completed else 'goal.updated', self.to_dict())
         return self
     
+    def _stored_is_completed(self):
+        """is_completed of this goal as last saved (journaled saves included)"""
+        conn = db_manager.get_read_connection(self.user_id)
+        cursor = conn.cursor()
+        cursor.execute('SELECT is_completed FROM financial_goals WHERE id = ?', (self.id,))
+        row = cursor.fetchone()
+        conn.close()
+        return bool(row[0]) if row else False
+    
     @staticmethod
     def get_by_user_id(user_id, is_completed=None):
         """Get financial goals by user ID"""
-        conn = db_manager.get_connection()
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
         if is_completed is not None:
-            cursor.execute('SELECT id, user_id, title, target_amount, current_amount, target_date, created_at, is_completed FROM financial_goals WHERE user_id = ? AND is_completed = ? ORDER BY created_at DESC', 
+            cursor.execute(f'SELECT {FinancialGoal.COLUMNS} FROM financial_goals WHERE user_id = ? AND is_completed = ? ORDER BY created_ts DESC', 
                           (user_id, is_completed))
         else:
-            cursor.execute('SELECT id, user_id, title, target_amount, current_amount, target_date, created_at, is_completed FROM financial_goals WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
+            cursor.execute(f'SELECT {FinancialGoal.COLUMNS} FROM financial_goals WHERE user_id = ? ORDER BY created_ts DESC', (user_id,))
         
         rows = cursor.fetchall()
         conn.close()
         
-        return [FinancialGoal(
-            id=row[0], user_id=row[1], title=row[2], target_amount=row[3],
-            current_amount=row[4], target_date=row[5], created_at=row[6], is_completed=row[7]
-        ) for row in rows]
+        return [FinancialGoal._from_row(row) for row in rows]
     
     @staticmethod
-    def get_by_id(goal_id):
-        """Get financial goal by ID"""
-        conn = db_manager.get_connection()
+    def get_by_id(goal_id, user_id):
+        """Get one of the user's financial goals by ID; the user picks the shard to read"""
+        conn = db_manager.get_read_connection(user_id)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT id, user_id, title, target_amount, current_amount, target_date, created_at, is_completed FROM financial_goals WHERE id = ?', (goal_id,))
+        cursor.execute(f'SELECT {FinancialGoal.COLUMNS} FROM financial_goals WHERE id = ? AND user_id = ?',
+                      (goal_id, user_id))
         row = cursor.fetchone()
         conn.close()
         
         if row:
-            return FinancialGoal(
-                id=row[0], user_id=row[1], title=row[2], target_amount=row[3],
-                current_amount=row[4], target_date=row[5], created_at=row[6], is_completed=row[7]
-            )
+            return FinancialGoal._from_row(row)
         return None
     
     def delete(self):
         """Delete goal from database"""
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM financial_goals WHERE id = ?', (self.id,))
-        try:
-            conn.commit()
-        except Exception as e:
-            # SQLite Cloud auto-commit behavior - this is expected
-            pass
-        conn.close()
+        if db_manager.write_behind is not None:
+            db_manager.write_behind.delete(self)
+        else:
+            conn = db_manager.for_user(self.user_id).get_connection()
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM financial_goals WHERE id = ?', (self.id,))
+            try:
+                conn.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            conn.close()
+        
+        if db_manager.replica is not None:
+            db_manager.replica.delete_through(self)
+        
+        publish(self.user_id, 'goal.deleted', {'id': self.id})
     
     def get_days_remaining(self):
         """Get days remaining to reach target date"""
@@ -0,0 +1,90 @@
+import os
+import json
+import queue
+import threading
+import logging
+
+# Events buffered per open connection before the client is told to resync
+EVENT_BUFFER_SIZE = int(os.environ.get('EVENT_BUFFER_SIZE', 100))
+
+class Subscription:
+    """One open event stream for a user, with a bounded buffer"""
+
+    def __init__(self, user_id, buffer_size=EVENT_BUFFER_SIZE):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow consumer: drop the event and ask the client to reload instead
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrived within timeout"""
+        if self.overflowed:
+            self.overflowed = False
+            self._drain()
+            return {'event': 'resync', 'data': {}}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+class EventBroker:
+    """In-process publish/subscribe of per-user change events. Streams served by
+    other worker processes learn of changes through users.data_version instead
+    (see dashboard.events)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, event, data):
+        """Fan an event out to every open stream of the user"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.push({'event': event, 'data': data})
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+def format_sse(event):
+    """Serialize an event (with an optional id) in text/event-stream format"""
+    prefix = f"id: {event['id']}\n" if 'id' in event else ''
+    return f"{prefix}event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+def publish(user_id, event, data):
+    """Publish a change event; never lets a failure break the write that caused it"""
+    try:
+        broker.publish(user_id, event, data)
+    except Exception:
+        logging.exception(f"Failed to publish {event} event")
+
+# Global broker instance
+broker = EventBroker()
@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from models import Transaction, Account
+from models import Transaction, TransactionQuery, Account
 from forms import TransactionForm, AccountForm
-from datetime import datetime
-from utils import now_brasilia, brasilia_to_utc
+from datetime import datetime, timedelta
+from utils import now_brasilia, brasilia_to_utc, format_brasilia_dates, format_currency_many
 
 financial_bp = Blueprint('financial', __name__)
 
@@ -17,20 +17,32 @@ def cash_flow():
     if features['transactions_limit'] != -1 and transaction_count >= features['transactions_limit']:
         flash('Você atingiu o limite de transações do seu plano. Faça upgrade para continuar.', 'warning')
     
+    return render_template('financial/cash_flow.html',
+                         features=features,
+                         **_ledger(current_user.id))
+
+def _ledger(user_id):
+    """Transactions, formatted ledger rows and totals for financial/cash_flow.html"""
     # Get all transactions
-    transactions = Transaction.get_by_user_id(current_user.id)
+    transactions = Transaction.get_by_user_id(user_id)
     
     # Calculate totals
     total_income = sum(float(t.amount) for t in transactions if t.transaction_type == 'income')
     total_expenses = sum(float(t.amount) for t in transactions if t.transaction_type == 'expense')
-    current_balance = total_income - total_expenses
     
-    return render_template('financial/cash_flow.html',
-                         transactions=transactions,
-                         total_income=total_income,
-                         total_expenses=total_expenses,
-                         current_balance=current_balance,
-                         features=features)
+    # Format the whole ledger at once: (transaction, date label, signed amount label)
+    dates = format_brasilia_dates([t.date_ts for t in transactions])
+    amounts = format_currency_many([t.amount for t in transactions])
+    rows = [(t, date_label, ('+' if t.transaction_type == 'income' else '-') + amount_label)
+            for t, date_label, amount_label in zip(transactions, dates, amounts)]
+    
+    return {
+        'transactions': transactions,
+        'rows': rows,
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'current_balance': total_income - total_expenses
+    }
 
 @financial_bp.route('/add-transaction', methods=['GET', 'POST'])
 @login_required
@@ -69,22 +81,12 @@ def add_transaction():
     if not form.date.data:
         form.date.data = now_brasilia().date()
     
-    # Get all transactions to calculate totals (same as cash_flow function)
-    transactions = Transaction.get_by_user_id(current_user.id)
-    
-    # Calculate totals
-    total_income = sum(float(t.amount) for t in transactions if t.transaction_type == 'income')
-    total_expenses = sum(float(t.amount) for t in transactions if t.transaction_type == 'expense')
-    current_balance = total_income - total_expenses
-    
+    # Same ledger and totals as cash_flow, under the form
     return render_template('financial/cash_flow.html',
                          form=form,
                          show_form=True,
-                         transactions=transactions,
-                         total_income=total_income,
-                         total_expenses=total_expenses,
-                         current_balance=current_balance,
-                         features=features)
+                         features=features,
+                         **_ledger(current_user.id))
 
 @financial_bp.route('/accounts')
 @login_required
@@ -107,19 +109,13 @@ def accounts():
 def add_account():
     form = AccountForm()
     if form.validate_on_submit():
-        # Convert due_date from Brasilia to UTC for storage
-        if form.due_date.data:
-            due_date = datetime.combine(form.due_date.data, datetime.min.time())
-            due_date_utc = brasilia_to_utc(due_date)
-        else:
-            due_date_utc = None
-        
+        # Due dates are stored as Brasilia calendar days
         account = Account(
             user_id=current_user.id,
             name=form.name.data,
             account_type=form.account_type.data,
             amount=form.amount.data,
-            due_date=due_date_utc.isoformat() if due_date_utc else None
+            due_date=form.due_date.data
         )
         account.save()
         
@@ -161,9 +157,64 @@ def mark_paid(account_id):
         amount=account.amount,
         transaction_type=transaction_type,
         category='pagamentos',
-        date=brasilia_to_utc(now_brasilia()).isoformat()
+        date=brasilia_to_utc(now_brasilia()).isoformat(),
+        account_id=account.id
     )
     transaction.save()
     
     flash('Conta marcada como paga e transação criada!', 'success')
-    return redirect(url_for('financial.accounts'))
\ No newline at end of file
+    return redirect(url_for('financial.accounts'))
+
+@financial_bp.route('/transactions')
+@login_required
+def transactions_json():
+    """Filtered, sorted and paginated transactions as JSON.
+    
+    Query args: start/end (YYYY-MM-DD, Brasilia dates, inclusive), category,
+    type (income|expense), min_amount, max_amount, sort, page, per_page."""
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(100, max(1, request.args.get('per_page', 20, type=int)))
+    
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start_utc = brasilia_to_utc(datetime.strptime(start, '%Y-%m-%d')) if start else None
+        end_utc = brasilia_to_utc(datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)) if end else None
+        
+        query = (TransactionQuery(current_user.id)
+                 .date_range(start_utc, end_utc)
+                 .category(request.args.get('category'))
+                 .transaction_type(request.args.get('type'))
+                 .amount_range(request.args.get('min_amount', type=float),
+                               request.args.get('max_amount', type=float))
+                 .order_by(request.args.get('sort', 'date_desc')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    transactions, total = query.paginate(page, per_page)
+    
+    return jsonify({
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'results': [t.to_dict() for t in transactions]
+    })
+
+@financial_bp.route('/search')
+@login_required
+def search():
+    """Full-text search over the user's transactions (JSON, ranked and paginated)"""
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(100, max(1, request.args.get('per_page', 20, type=int)))
+    
+    transactions, total = Transaction.search(current_user.id, query, page=page, per_page=per_page)
+    
+    return jsonify({
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'results': [t.to_dict() for t in transactions]
+    })
\ No newline at end of file
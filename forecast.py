@@ -0,0 +1,167 @@
+import os
+import numpy as np
+from database import db_manager, Transaction, archive_horizon, to_day, to_epoch, from_day
+from analytics import VersionedCache, snapshot_cache, local_days, month_of, first_day, TYPES
+from utils import now_brasilia, brasilia_to_utc
+
+# Days projected from today on
+FORECAST_DAYS = 90
+
+# Days of unscheduled history averaged into the projection
+FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 90))
+
+# Recurrence types projected forward, as (days, months) between occurrences
+RECURRENCES = {
+    'daily': (1, 0),
+    'weekly': (7, 0),
+    'biweekly': (14, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+    'yearly': (0, 12)
+}
+
+def weekdays(days):
+    """Weekday (Monday 0) of day numbers; 1970-01-01 was a Thursday"""
+    return (np.asarray(days) + 3) % 7
+
+def occurrences(last_days, step_days, step_months, end_day):
+    """Day numbers of the occurrences after last_days of series stepping step_days days or
+    step_months months (keeping the day of month, clipped to each month's length), as a
+    (series, steps) array reaching at least end_day"""
+    shortest = np.where(step_months > 0, step_months * 28, step_days)
+    steps = np.arange(1, int(((end_day - last_days) // shortest).max()) + 3)
+    by_days = last_days[:, None] + step_days[:, None] * steps
+    last_months = month_of(last_days)
+    months = last_months[:, None] + step_months[:, None] * steps
+    first = first_day(months)
+    day_of_month = (last_days - first_day(last_months))[:, None]
+    by_months = first + np.minimum(day_of_month, first_day(months + 1) - first - 1)
+    return np.where(step_months[:, None] > 0, by_months, by_days)
+
+class Forecast:
+    """One user's projected daily cash flow for FORECAST_DAYS days from today, built from
+    transactions already dated in that range, pending accounts by due date, recurring
+    transaction series stepped forward and a weekday profile of unscheduled history"""
+    __slots__ = ('version', 'data')
+
+    def __init__(self, version, data):
+        self.version = version
+        self.data = data
+
+    @classmethod
+    def load(cls, user_id):
+        """Project from the user's cached snapshot plus one read of pending accounts and
+        recent recurring transactions; the version is (data_version, today)"""
+        today = to_day(now_brasilia().date())
+        end_day = today + FORECAST_DAYS
+        # Two yearly periods back is the oldest series still projected
+        since = to_epoch(brasilia_to_utc(from_day(today - 2 * 366)))
+        archived = archive_horizon() is not None
+        conn = db_manager.get_read_connection(user_id, archived=archived)
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT data_version FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+        cursor.execute('''
+            SELECT account_type, amount, due_day FROM accounts
+            WHERE user_id = ? AND status = 'pending' AND due_day < ?
+        ''', (user_id, end_day))
+        accounts = cursor.fetchall()
+        tables = ['transactions']
+        if archived:
+            tables += [Transaction.archive_table(year) for year in Transaction.archive_years(cursor, since)]
+        cursor.execute(' UNION ALL '.join(f'SELECT date_ts, description, transaction_type, category, recurrence_type, '
+                                          f'amount FROM {table} WHERE user_id = ? AND date_ts >= ? AND is_recurring = 1'
+                                          for table in tables), [user_id, since] * len(tables))
+        recurring = cursor.fetchall()
+        conn.close()
+
+        version = row[0] if row else None
+        snapshot = snapshot_cache.get(user_id, version)
+        return cls((version, today), project(snapshot, accounts, recurring, today))
+
+def _series(recurring):
+    """(last day, signed amount, step days, step months) arrays of the recurring series,
+    keyed by description, type, category and recurrence type, at their latest occurrence"""
+    latest = {}
+    for row in sorted(recurring, key=lambda row: row[0]):
+        date_ts, description, transaction_type, category, recurrence_type, amount = row
+        if recurrence_type in RECURRENCES:
+            latest[(description, transaction_type, category or '', recurrence_type)] = (date_ts, amount)
+    if not latest:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    keys, values = zip(*latest.items())
+    steps = np.array([RECURRENCES[key[3]] for key in keys], dtype=np.int64)
+    amounts = np.array([amount for _, amount in values], dtype=np.float64)
+    return (local_days(np.array([date_ts for date_ts, _ in values], dtype=np.int64)),
+            np.where(np.array([key[1] for key in keys]) == 'expense', -amounts, amounts),
+            steps[:, 0], steps[:, 1])
+
+def project(snapshot, accounts, recurring, today):
+    """JSON-ready projection for days today..today + FORECAST_DAYS - 1; accounts are
+    (account_type, amount, due_day) rows and recurring (date_ts, description, type,
+    category, recurrence_type, amount) rows"""
+    end_day = today + FORECAST_DAYS
+    income, expense = TYPES.index('income'), TYPES.index('expense')
+
+    def bucket(days, amounts):
+        """(inflow, outflow) per forecast day of signed amounts dated days"""
+        offsets = np.asarray(days, dtype=np.int64) - today
+        amounts = np.asarray(amounts, dtype=np.float64)
+        return (np.bincount(offsets, weights=np.maximum(amounts, 0), minlength=FORECAST_DAYS),
+                np.bincount(offsets, weights=np.maximum(-amounts, 0), minlength=FORECAST_DAYS))
+
+    # Balance so far, and transactions already entered for the coming days
+    past = np.searchsorted(snapshot.day, today)
+    opening = float(snapshot.signed[:past].sum())
+    dated = snapshot.between(today, end_day)
+    entered = bucket(snapshot.day[dated], snapshot.signed[dated])
+
+    # Pending accounts on their due day, overdue ones today
+    kinds, amounts, due_days = zip(*accounts) if accounts else ((), (), ())
+    amounts = np.array(amounts, dtype=np.float64)
+    pending = bucket(np.maximum(np.array(due_days, dtype=np.int64), today),
+                     np.where(np.array(kinds, dtype=str) == 'payable', -amounts, amounts))
+
+    # Recurring series that missed at most one occurrence, stepped forward
+    last_days, signed, step_days, step_months = _series(recurring)
+    if last_days.size:
+        upcoming = occurrences(last_days, step_days, step_months, end_day)
+        active = (upcoming[:, 1] >= today)[:, None]
+        due = active & (upcoming >= today) & (upcoming < end_day)
+        scheduled = bucket(upcoming[due], np.broadcast_to(signed[:, None], upcoming.shape)[due])
+    else:
+        scheduled = bucket((), ())
+
+    # Weekday profile of unscheduled history, applied from tomorrow on
+    first = int(snapshot.day[0]) if snapshot.day.size else today
+    history_start = max(today - FORECAST_HISTORY_DAYS, first)
+    rows = snapshot.between(history_start, today)
+    unscheduled = ~snapshot.scheduled[rows]
+    days, type_codes = snapshot.day[rows][unscheduled], snapshot.type_code[rows][unscheduled]
+    profile = np.bincount(type_codes.astype(np.int64) * 7 + weekdays(days), weights=snapshot.amount[rows][unscheduled],
+                          minlength=len(TYPES) * 7).reshape(len(TYPES), 7)
+    profile = profile / np.maximum(np.bincount(weekdays(np.arange(history_start, today)), minlength=7), 1)
+    future = weekdays(np.arange(today, end_day))
+    tomorrow_on = np.arange(FORECAST_DAYS) > 0
+    average = (profile[income][future] * tomorrow_on, profile[expense][future] * tomorrow_on)
+
+    inflow = entered[0] + pending[0] + scheduled[0] + average[0]
+    outflow = entered[1] + pending[1] + scheduled[1] + average[1]
+    balance = opening + np.cumsum(inflow - outflow)
+    lowest = int(np.argmin(balance))
+    return {
+        'days': np.arange(today, end_day).astype('datetime64[D]').astype(str).tolist(),
+        'opening_balance': round(opening, 2),
+        'balance': np.round(balance, 2).tolist(),
+        'inflow': np.round(inflow, 2).tolist(),
+        'outflow': np.round(outflow, 2).tolist(),
+        'components': {name: round(float(flows[0].sum() - flows[1].sum()), 2)
+                       for name, flows in (('entered', entered), ('accounts', pending),
+                                           ('recurring', scheduled), ('average', average))},
+        'lowest': {'day': str(np.datetime64(today + lowest, 'D')), 'balance': round(float(balance[lowest]), 2)},
+        'history_days': today - history_start
+    }
+
+# Global forecast cache for this process
+forecast_cache = VersionedCache(Forecast.load)
@@ -0,0 +1,141 @@
+import os
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# Rendered fragments kept in memory per process
+FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 1024))
+
+# Optional directory shared by all processes; unset keeps the cache in memory only
+FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR')
+
+# Seconds an on-disk fragment stays valid (keys carry a data version, so this
+# only bounds how long superseded fragments linger)
+FRAGMENT_CACHE_DISK_TTL = int(os.environ.get('FRAGMENT_CACHE_DISK_TTL', 86400))
+
+class FragmentCache:
+    """LRU of rendered template fragments, optionally backed by a directory"""
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE, directory=FRAGMENT_CACHE_DIR,
+                 disk_ttl=FRAGMENT_CACHE_DISK_TTL):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.disk_ttl = disk_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + '.html')
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return value
+
+        value = self._read_disk(key) if self.directory else None
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.stats['disk_hits'] += 1
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        self._remember(key, value)
+        if self.directory:
+            self._write_disk(key, value)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.disk_ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        # Write then rename so readers in other processes never see a partial file
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            logging.exception("Failed to write fragment cache entry")
+
+    def prune(self):
+        """Delete on-disk fragments older than the TTL, returning how many were removed"""
+        if not self.directory:
+            return 0
+        removed = 0
+        cutoff = time.time() - self.disk_ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'name', key_part, ... %}...{% endcache %}
+
+    Renders the body once per distinct key and serves it from fragment_cache
+    afterwards. Per-user fragments must include the user id and a data
+    version (users.data_version) among the key parts, plus anything else the
+    body depends on (e.g. the current day)."""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_support', [nodes.List(args)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, key_parts, caller):
+        key = ':'.join(str(part) for part in key_parts)
+        value = fragment_cache.get(key)
+        if value is None:
+            value = str(caller())
+            fragment_cache.set(key, value)
+        # The body was already escaped when it was rendered
+        return Markup(value)
+
+# Global fragment cache instance
+fragment_cache = FragmentCache()
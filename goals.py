@@ -53,8 +53,8 @@ def create_goal():
 @login_required
 def edit_goal(goal_id):
     """Edit existing financial goal"""
-    goal = FinancialGoal.get_by_id(goal_id)
-    if not goal or goal.user_id != current_user.id:
+    goal = FinancialGoal.get_by_id(goal_id, current_user.id)
+    if not goal:
         flash('Meta não encontrada.', 'error')
         return redirect(url_for('goals.goals_list'))
     
@@ -83,8 +83,8 @@ def edit_goal(goal_id):
 @login_required
 def delete_goal(goal_id):
     """Delete financial goal"""
-    goal = FinancialGoal.get_by_id(goal_id)
-    if not goal or goal.user_id != current_user.id:
+    goal = FinancialGoal.get_by_id(goal_id, current_user.id)
+    if not goal:
         flash('Meta não encontrada.', 'error')
         return redirect(url_for('goals.goals_list'))
     
@@ -96,8 +96,8 @@ def delete_goal(goal_id):
 @login_required
 def update_progress(goal_id):
     """Update goal progress via AJAX"""
-    goal = FinancialGoal.get_by_id(goal_id)
-    if not goal or goal.user_id != current_user.id:
+    goal = FinancialGoal.get_by_id(goal_id, current_user.id)
+    if not goal:
         return jsonify({'error': 'Meta não encontrada'}), 404
     
     data = request.get_json()
@@ -131,8 +131,8 @@ def update_progress(goal_id):
 @login_required
 def complete_goal(goal_id):
     """Mark goal as completed"""
-    goal = FinancialGoal.get_by_id(goal_id)
-    if not goal or goal.user_id != current_user.id:
+    goal = FinancialGoal.get_by_id(goal_id, current_user.id)
+    if not goal:
         flash('Meta não encontrada.', 'error')
         return redirect(url_for('goals.goals_list'))
     
@@ -147,8 +147,8 @@ def complete_goal(goal_id):
 @login_required
 def reactivate_goal(goal_id):
     """Reactivate completed goal"""
-    goal = FinancialGoal.get_by_id(goal_id)
-    if not goal or goal.user_id != current_user.id:
+    goal = FinancialGoal.get_by_id(goal_id, current_user.id)
+    if not goal:
         flash('Meta não encontrada.', 'error')
         return redirect(url_for('goals.goals_list'))
     
@@ -0,0 +1,138 @@
+import os
+import logging
+import threading
+import time
+from datetime import datetime
+from database import db_manager, User, AccountAlert, TRANSACTION_ARCHIVE_DAYS
+from fragment_cache import fragment_cache
+from replica import prune_change_log
+from archive import archive_transactions
+
+# Run the periodic jobs in this process; enable it in exactly one process (or run
+# `flask run-jobs`), since every job covers all users and must not run once per worker
+RUN_BACKGROUND_JOBS = os.environ.get('RUN_BACKGROUND_JOBS', '0') == '1'
+
+# How often (in seconds) lapsed trials and subscriptions are swept
+SUBSCRIPTION_SWEEP_INTERVAL = int(os.environ.get('SUBSCRIPTION_SWEEP_INTERVAL', 300))
+
+# How often (in seconds) overdue and due-soon accounts are rescanned
+ACCOUNT_ALERT_SCAN_INTERVAL = int(os.environ.get('ACCOUNT_ALERT_SCAN_INTERVAL', 300))
+
+# How often (in seconds) change_log entries past their retention are deleted
+CHANGE_LOG_PRUNE_INTERVAL = int(os.environ.get('CHANGE_LOG_PRUNE_INTERVAL', 3600))
+
+# How often (in seconds) transactions past TRANSACTION_ARCHIVE_DAYS are archived
+TRANSACTION_ARCHIVE_INTERVAL = int(os.environ.get('TRANSACTION_ARCHIVE_INTERVAL', 86400))
+
+# How often (in seconds) expired on-disk template fragments are deleted
+FRAGMENT_CACHE_PRUNE_INTERVAL = int(os.environ.get('FRAGMENT_CACHE_PRUNE_INTERVAL', 3600))
+
+# Sweep metrics, exposed for monitoring
+sweep_stats = {
+    'runs': 0,
+    'last_run': None,
+    'last_changed': 0,
+    'total_changed': 0
+}
+
+# Alert scan metrics, exposed for monitoring
+alert_scan_stats = {
+    'runs': 0,
+    'last_run': None,
+    'users_with_alerts': 0
+}
+
+_started = False
+_start_lock = threading.Lock()
+
+def sweep_subscriptions():
+    """Expire lapsed trials and subscriptions for all users in one pass"""
+    changed = User.expire_lapsed_subscriptions()
+
+    sweep_stats['runs'] += 1
+    sweep_stats['last_run'] = datetime.utcnow()
+    sweep_stats['last_changed'] = changed
+    sweep_stats['total_changed'] += changed
+
+    logging.info(f"Subscription sweep expired {changed} account(s)")
+    return changed
+
+def scan_account_alerts():
+    """Rebuild every user's overdue/due-soon account reminders in one pass"""
+    users_with_alerts = AccountAlert.refresh_all()
+
+    alert_scan_stats['runs'] += 1
+    alert_scan_stats['last_run'] = datetime.utcnow()
+    alert_scan_stats['users_with_alerts'] = users_with_alerts
+
+    logging.info(f"Account alert scan found {users_with_alerts} user(s) with pending reminders")
+    return users_with_alerts
+
+def prune_fragment_cache():
+    """Delete on-disk fragments past their TTL"""
+    removed = fragment_cache.prune()
+    if removed:
+        logging.info(f"Fragment cache prune removed {removed} file(s)")
+    return removed
+
+def prune_replica_change_log():
+    """Delete change_log entries older than the replica retention window"""
+    removed = prune_change_log()
+    if removed:
+        logging.info(f"Change log prune removed {removed} entry(ies)")
+    return removed
+
+def claim_job_run(name, interval, now=None):
+    """Whether this process runs job name now: the first claim in each interval wins,
+    across every process sharing the database"""
+    now = int(time.time()) if now is None else now
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('INSERT OR IGNORE INTO job_runs (name, ran_ts) VALUES (?, 0)', (name,))
+    cursor.execute('UPDATE job_runs SET ran_ts = ? WHERE name = ? AND ran_ts <= ? RETURNING name',
+                   (now, name, now - interval))
+    claimed = cursor.fetchone() is not None
+    try:
+        conn.commit()
+    except Exception as e:
+        # SQLite Cloud auto-commit behavior - this is expected
+        pass
+    conn.close()
+    return claimed
+
+def _run_periodically(job, interval, claimed):
+    """Run job forever, sleeping interval seconds between runs; claimed jobs cover every
+    user and run only when this process claims the interval"""
+    while True:
+        try:
+            if not claimed or claim_job_run(job.__name__, interval):
+                job()
+        except Exception:
+            logging.exception(f"Background job {job.__name__} failed")
+        time.sleep(interval)
+
+def start_background_jobs():
+    """Start the periodic maintenance threads once per process; callers decide which
+    single process that is (RUN_BACKGROUND_JOBS, or the run-jobs command)"""
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    # (thread name, job, interval, claimed): the fragment cache is local to this host
+    schedule = [
+        ('subscription-sweeper', sweep_subscriptions, SUBSCRIPTION_SWEEP_INTERVAL, True),
+        ('account-alert-scanner', scan_account_alerts, ACCOUNT_ALERT_SCAN_INTERVAL, True),
+        ('change-log-pruner', prune_replica_change_log, CHANGE_LOG_PRUNE_INTERVAL, True)
+    ]
+    if TRANSACTION_ARCHIVE_DAYS > 0:
+        schedule.append(('transaction-archiver', archive_transactions, TRANSACTION_ARCHIVE_INTERVAL, True))
+    if fragment_cache.directory:
+        schedule.append(('fragment-cache-pruner', prune_fragment_cache, FRAGMENT_CACHE_PRUNE_INTERVAL, False))
+    for name, job, interval, claimed in schedule:
+        thread = threading.Thread(target=_run_periodically, args=(job, interval, claimed),
+                                  name=name, daemon=True)
+        thread.start()
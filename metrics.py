@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import tempfile
+import threading
+from contextlib import contextmanager
+from flask import Response, g, request, abort
+
+# Directory shared by pre-forked workers (like gunicorn's); each process writes
+# its own snapshot there and /metrics sums them. Unset keeps metrics per process.
+# Empty it on deploy: snapshots of exited workers keep counting towards totals.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+# Seconds between snapshot writes from a worker (a scrape always writes first)
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PDF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name: (type, help, histogram buckets); gauges marked 'livesum' are summed over running processes only
+DEFINITIONS = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint and status', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency until the response is ready', REQUEST_BUCKETS),
+    'http_requests_in_flight': ('livesum', 'Requests being handled right now', None),
+    'db_query_duration_seconds': ('histogram', 'Statement latency including row fetches', QUERY_BUCKETS),
+    'db_connections_opened_total': ('counter', 'Database connections opened', None),
+    'db_connections_open': ('livesum', 'Database connections currently open', None),
+    'cache_hits_total': ('counter', 'Cache lookups answered from the cache', None),
+    'cache_misses_total': ('counter', 'Cache lookups that had to compute the value', None),
+    'cache_hit_ratio': ('gauge', 'Hits / lookups since start, over all processes', None),
+    'pdf_render_duration_seconds': ('histogram', 'Time to build a PDF report', PDF_BUCKETS),
+    'job_runs_total': ('counter', 'Background job runs', None),
+    'job_items_total': ('counter', 'Items changed or flagged by background jobs', None),
+    'event_stream_connections': ('livesum', 'Open server-sent event streams', None),
+}
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._collectors = []
+        self._last_flush = 0.0
+        # set_total values inherited from the parent process, subtracted after a fork
+        self._baselines = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def after_fork(self):
+        """Start the child from zero so the parent's counts are not reported twice"""
+        self._baselines = {}
+        for collector in self._collectors:
+            collector(self)
+        with self._lock:
+            self._baselines = dict(self._counters)
+        self.reset()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_total(self, name, value, **labels):
+        """Set a counter whose running total is kept elsewhere (cache and job stats)"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = value - self._baselines.get(key, 0)
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def add(self, name, amount, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = DEFINITIONS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(self, collector):
+        """Register a callable run before each snapshot to refresh derived metrics"""
+        self._collectors.append(collector)
+        return collector
+
+    def snapshot(self):
+        for collector in self._collectors:
+            collector(self)
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self._gauges.items()],
+                'histograms': [[name, list(labels), list(buckets), total, count]
+                               for (name, labels), (buckets, total, count) in self._histograms.items()]
+            }
+
+    def flush(self, force=False):
+        """Write this process's snapshot to METRICS_DIR (at most every METRICS_FLUSH_INTERVAL seconds)"""
+        if not METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_INTERVAL:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = now
+            snapshot = self.snapshot()
+            # Write then rename so a scraping process never reads a partial file
+            fd, temp_path = tempfile.mkstemp(dir=METRICS_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, os.path.join(METRICS_DIR, f"metrics-{snapshot['pid']}.json"))
+        finally:
+            self._flush_lock.release()
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _load_snapshots():
+    if not METRICS_DIR:
+        return [metrics.snapshot()]
+    metrics.flush(force=True)
+    snapshots = []
+    for name in os.listdir(METRICS_DIR):
+        if not (name.startswith('metrics-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def merge_snapshots(snapshots):
+    """Sum counters and histograms over every process ever written, live gauges over running ones"""
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        alive = snapshot['pid'] == os.getpid() or _process_alive(snapshot['pid'])
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot['gauges']:
+            if alive:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+
+    # Ratios are derived after summing so they weigh every process by its traffic
+    for (name, labels), hits in list(counters.items()):
+        if name == 'cache_hits_total':
+            lookups = hits + counters.get(('cache_misses_total', labels), 0)
+            gauges[('cache_hit_ratio', labels)] = hits / lookups if lookups else 0.0
+    return counters, gauges, histograms
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+def render_prometheus(snapshots):
+    """Prometheus text exposition format (version 0.0.4)"""
+    counters, gauges, histograms = merge_snapshots(snapshots)
+    lines = []
+    for name, (kind, help_text, buckets) in DEFINITIONS.items():
+        if kind == 'histogram':
+            samples = sorted((key, value) for key, value in histograms.items() if key[0] == name)
+        else:
+            source = counters if kind == 'counter' else gauges
+            samples = sorted((key, value) for key, value in source.items() if key[0] == name)
+        if not samples:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f"# TYPE {name} {'gauge' if kind == 'livesum' else kind}")
+        for (_, labels), value in samples:
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+                continue
+            bucket_counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+# Global registry for this process
+metrics = MetricsRegistry()
+
+@metrics.add_collector
+def _collect_runtime_stats(registry):
+    from database import db_manager
+    from fragment_cache import fragment_cache
+    from analytics import snapshot_cache
+    from forecast import forecast_cache
+    from events import broker
+    from jobs import sweep_stats, alert_scan_stats
+
+    stats = db_manager.connection_stats
+    registry.set('db_connections_open', stats['opened'] - stats['closed'])
+    registry.set('event_stream_connections', broker.connection_count())
+    registry.set_total('db_connections_opened_total', stats['opened'])
+    registry.set_total('cache_hits_total', fragment_cache.stats['hits'], cache='fragment')
+    registry.set_total('cache_misses_total', fragment_cache.stats['misses'], cache='fragment')
+    registry.set_total('cache_hits_total', snapshot_cache.stats['hits'], cache='analytics')
+    registry.set_total('cache_misses_total', snapshot_cache.stats['misses'], cache='analytics')
+    registry.set_total('cache_hits_total', forecast_cache.stats['hits'], cache='forecast')
+    registry.set_total('cache_misses_total', forecast_cache.stats['misses'], cache='forecast')
+    registry.set_total('job_runs_total', sweep_stats['runs'], job='subscription_sweep')
+    registry.set_total('job_items_total', sweep_stats['total_changed'], job='subscription_sweep')
+    registry.set_total('job_runs_total', alert_scan_stats['runs'], job='account_alert_scan')
+
+def _observe_query(event):
+    statement = event.sql.lstrip().split(None, 1)[0].upper() if event.sql.strip() else 'OTHER'
+    metrics.observe('db_query_duration_seconds', event.elapsed, statement=statement)
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_in_flight = True
+    metrics.add('http_requests_in_flight', 1)
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        labels = {'blueprint': request.blueprint or 'app',
+                  # Unmatched URLs share one label so scanners cannot blow up cardinality
+                  'endpoint': request.endpoint or 'unmatched',
+                  'method': request.method}
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started, **labels)
+        metrics.inc('http_requests_total', status=str(response.status_code), **labels)
+    return response
+
+def _end_request(exc):
+    if g.pop('metrics_in_flight', False):
+        metrics.add('http_requests_in_flight', -1)
+    metrics.flush()
+
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        abort(401)
+    return Response(render_prometheus(_load_snapshots()), mimetype='text/plain; version=0.0.4')
+
+def init_metrics(app):
+    """Record request/DB metrics and serve them at /metrics in Prometheus text format"""
+    from database import db_manager
+
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        atexit.register(metrics.flush, force=True)
+    os.register_at_fork(after_in_child=metrics.after_fork)
+    db_manager.add_query_listener(_observe_query)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
@@ -1,4 +1,4 @@
 # Compatibility imports for existing code
 # All models are now defined in database.py using pure SQLite3
 
-from database import User, Transaction, Account, FinancialGoal
\ No newline at end of file
+from database import User, Transaction, TransactionQuery, Account, FinancialGoal, AccountAlert, ApiToken
\ No newline at end of file
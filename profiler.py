@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import threading
+from collections import Counter
+from flask import g, request
+
+# Requests carrying "X-Profile: <PROFILE_TOKEN>" are profiled; unset disables the header trigger
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+
+# Fraction of requests profiled at random (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+
+# Comma-separated endpoints eligible for random sampling, e.g. financial.cash_flow,reports.reports
+PROFILE_ENDPOINTS = {endpoint for endpoint in os.environ.get('PROFILE_ENDPOINTS', '').split(',') if endpoint}
+
+# Milliseconds between stack samples of a profiled request
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+
+# Where collapsed stacks are written, one subdirectory per endpoint
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'financeiro-profiles'))
+
+# Profiles kept per endpoint; older ones are deleted as new ones arrive
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 50))
+
+def _frame_label(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_qualname}"
+
+class SamplingProfiler:
+    """Wall-clock stack sampler for the threads of profiled requests.
+
+    One daemon thread wakes every interval while at least one request is being
+    profiled and records the stack of each of those threads, so time spent
+    waiting on the database shows up next to time spent in Python."""
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id):
+        """Collapsed stacks ({'a;b;c': samples}) recorded for the thread"""
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+                    continue
+                thread_ids = list(self._active)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    with self._lock:
+                        samples = self._active.get(thread_id)
+                        if samples is not None:
+                            samples[';'.join(reversed(stack))] += 1
+            del frames
+            time.sleep(self.interval)
+
+def write_profile(endpoint, samples, directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+    """Write one request's collapsed stacks (flamegraph.pl / speedscope input) and
+    trim the endpoint's directory to the newest max_files profiles"""
+    endpoint_dir = os.path.join(directory, endpoint)
+    os.makedirs(endpoint_dir, exist_ok=True)
+    # Names sort by time, so retention can keep the tail of a sorted listing
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}.folded"
+    path = os.path.join(endpoint_dir, name)
+    with open(path, 'w') as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+    profiles = sorted(entry for entry in os.listdir(endpoint_dir) if entry.endswith('.folded'))
+    for old in profiles[:-max_files] if max_files > 0 else ():
+        try:
+            os.remove(os.path.join(endpoint_dir, old))
+        except OSError:
+            pass
+    return path
+
+def aggregate_profiles(directory=PROFILE_DIR):
+    """Sum the retained profiles of each endpoint into <endpoint>.folded next to its
+    directory; returns {endpoint: (profiles merged, Counter of stacks)}"""
+    results = {}
+    if not os.path.isdir(directory):
+        return results
+    for endpoint in sorted(os.listdir(directory)):
+        endpoint_dir = os.path.join(directory, endpoint)
+        if not os.path.isdir(endpoint_dir):
+            continue
+        merged, profiles = Counter(), 0
+        for name in os.listdir(endpoint_dir):
+            if not name.endswith('.folded'):
+                continue
+            profiles += 1
+            with open(os.path.join(endpoint_dir, name)) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        merged[stack] += int(count)
+        with open(os.path.join(directory, f"{endpoint}.folded"), 'w') as f:
+            for stack, count in merged.most_common():
+                f.write(f"{stack} {count}\n")
+        results[endpoint] = (profiles, merged)
+    return results
+
+def self_time(samples):
+    """Counter of leaf frames: where samples landed, not what was on the stack"""
+    leaves = Counter()
+    for stack, count in samples.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    return leaves
+
+# Global profiler instance
+profiler = SamplingProfiler()
+
+def _should_profile():
+    if PROFILE_TOKEN and request.headers.get('X-Profile') == PROFILE_TOKEN:
+        return True
+    if PROFILE_SAMPLE_RATE <= 0 or (PROFILE_ENDPOINTS and request.endpoint not in PROFILE_ENDPOINTS):
+        return False
+    return random.random() < PROFILE_SAMPLE_RATE
+
+def _start_request():
+    if request.endpoint and _should_profile():
+        g.profile_thread = threading.get_ident()
+        profiler.start(g.profile_thread)
+
+def _finish_request(response):
+    thread_id = g.pop('profile_thread', None)
+    if thread_id is None:
+        return response
+    samples = profiler.stop(thread_id)
+    if samples:
+        try:
+            path = write_profile(request.endpoint, samples)
+            response.headers['X-Profile-File'] = os.path.basename(path)
+        except OSError:
+            logging.exception("Failed to write request profile")
+    return response
+
+def _end_request(exc):
+    # Requests that failed before after_request still release their sampler slot
+    thread_id = g.pop('profile_thread', None)
+    if thread_id is not None:
+        profiler.stop(thread_id)
+
+def init_profiler(app):
+    """Profile requests selected by the X-Profile header or PROFILE_SAMPLE_RATE"""
+    if not PROFILE_TOKEN and PROFILE_SAMPLE_RATE <= 0:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
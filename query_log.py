@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from database import db_manager
+
+# Statements taking longer than this (milliseconds) are logged one by one
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# Set QUERY_LOG=0 to stop tracing queries per request (no Server-Timing, no log line)
+QUERY_LOG_ENABLED = os.environ.get('QUERY_LOG', '1') == '1'
+
+# Statement groups listed in the per-request log line, slowest first
+QUERY_LOG_TOP = int(os.environ.get('QUERY_LOG_TOP', 5))
+
+class QueryStats:
+    """Statements executed during one request or one assert_max_queries block"""
+
+    def __init__(self):
+        self.events = []
+
+    def add(self, event):
+        self.events.append(event)
+
+    @property
+    def count(self):
+        return len(self.events)
+
+    @property
+    def elapsed_ms(self):
+        return sum(event.elapsed for event in self.events) * 1000
+
+    def by_fingerprint(self):
+        """[{'sql', 'count', 'rows', 'ms'}] per distinct statement, slowest first"""
+        groups = {}
+        for event in self.events:
+            group = groups.setdefault(event.fingerprint, {'sql': event.fingerprint, 'count': 0, 'rows': 0, 'ms': 0.0})
+            group['count'] += 1
+            group['rows'] += event.rows
+            group['ms'] += event.elapsed * 1000
+        return sorted(groups.values(), key=lambda group: group['ms'], reverse=True)
+
+# assert_max_queries blocks open on the current thread
+_local = threading.local()
+
+def _record_query(event):
+    elapsed_ms = event.elapsed * 1000
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logging.warning(f"Slow query ({elapsed_ms:.1f} ms, {event.params} params, {event.rows} rows): {event.fingerprint}")
+    if has_request_context() and 'query_stats' in g:
+        g.query_stats.add(event)
+    for stats in getattr(_local, 'blocks', ()):
+        stats.add(event)
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block executes more than limit statements, listing what ran:
+
+        with assert_max_queries(6):
+            client.get('/financial/cash-flow')
+    """
+    # Tracing stays on only if something else (the request log, an outer block) enabled it
+    added = _record_query not in db_manager.query_listeners
+    db_manager.add_query_listener(_record_query)
+    stats = QueryStats()
+    blocks = _local.__dict__.setdefault('blocks', [])
+    blocks.append(stats)
+    try:
+        yield stats
+    finally:
+        blocks.remove(stats)
+        if added:
+            db_manager.remove_query_listener(_record_query)
+    if stats.count > limit:
+        details = '\n'.join(f"  {group['count']}x {group['ms']:.1f} ms  {group['sql']}"
+                            for group in stats.by_fingerprint())
+        raise AssertionError(f"{stats.count} queries executed, expected at most {limit}:\n{details}")
+
+def _start_request():
+    g.query_stats = QueryStats()
+    g.request_started = time.perf_counter()
+
+def _finish_request(response):
+    stats = g.pop('query_stats', None)
+    if stats is None:
+        return response
+    duration_ms = (time.perf_counter() - g.request_started) * 1000
+    response.headers.add('Server-Timing', f'db;dur={stats.elapsed_ms:.1f};desc="{stats.count} queries"')
+    response.headers.add('Server-Timing', f'app;dur={duration_ms:.1f}')
+    logging.info('request ' + json.dumps({
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(duration_ms, 1),
+        'queries': stats.count,
+        'db_ms': round(stats.elapsed_ms, 1),
+        'top_queries': [{**group, 'ms': round(group['ms'], 1)} for group in stats.by_fingerprint()[:QUERY_LOG_TOP]]
+    }, ensure_ascii=False))
+    return response
+
+def init_query_log(app):
+    """Trace every statement per request: Server-Timing header, one JSON log line, slow-query warnings"""
+    if not QUERY_LOG_ENABLED:
+        return
+    db_manager.add_query_listener(_record_query)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
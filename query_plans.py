@@ -0,0 +1,127 @@
+import os
+import re
+import sys
+import itertools
+from datetime import datetime
+from database import db_manager, fingerprint_sql
+
+# Tables that grow with users or activity; a full scan of any of them is a regression
+LARGE_TABLES = {'users', 'transactions', 'accounts', 'financial_goals', 'api_tokens', 'account_alerts',
+                'transactions_fts'}
+
+# Scans that are intended: (table, pattern matched against the statement fingerprint, reason)
+ALLOWED_SCANS = [
+    ('transactions_fts', r'^INSERT INTO transactions_fts \(transactions_fts\)',
+     'FTS rebuild reads the whole table by design (rebuild-search-index)'),
+    ('accounts', r'^INSERT INTO account_alerts .* FROM \( SELECT user_id, account_type, amount, due_day',
+     'Alert scan job covers every user; walking the user-ordered index avoids a GROUP BY sort'),
+    ('account_alerts', r'^SELECT COUNT\(\*\) FROM account_alerts$',
+     'Alert scan job reports how many users have reminders'),
+    ('users', r'^SELECT id FROM users$',
+     'Archive job visits every user, one short database transaction each'),
+]
+
+# Statement kinds whose plans are checked; DDL, PRAGMA and transaction control have none worth reading
+EXPLAINED_KINDS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+# "SCAN transactions", "SCAN t", "SCAN transactions USING COVERING INDEX ..." (full index walk)
+_SCAN_PATTERN = re.compile(r'^SCAN (\w+)(?: AS (\w+))?')
+
+# Virtual tables report constrained lookups (e.g. FTS MATCH) as "SCAN ... VIRTUAL TABLE INDEX n:<plan>"
+_VIRTUAL_LOOKUP = re.compile(r'VIRTUAL TABLE INDEX \d+:\S')
+
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class StatementCollector:
+    """Query listener keeping one example of every distinct statement and where it came from"""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, event):
+        fingerprint = event.fingerprint
+        if fingerprint in self.statements or fingerprint.upper().startswith('EXPLAIN'):
+            return
+        self.statements[fingerprint] = (event.sql, event.params, _caller())
+
+def _caller():
+    """file:line (function) of the innermost application frame that ran the statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if (os.path.dirname(os.path.abspath(code.co_filename)) == _SOURCE_DIR
+                and not code.co_qualname.startswith(('Traced', 'StatementCollector'))
+                and os.path.basename(code.co_filename) != 'query_plans.py'):
+            return f"{os.path.basename(code.co_filename)}:{frame.f_lineno} ({code.co_qualname})"
+        frame = frame.f_back
+    return '?'
+
+def transaction_query_statements():
+    """(label, sql, params) for every TransactionQuery filter combination and sort key"""
+    from database import TransactionQuery
+
+    filters = {
+        'date': lambda q: q.date_range(datetime(2024, 1, 1), datetime(2024, 2, 1)),
+        'category': lambda q: q.category('vendas'),
+        'type': lambda q: q.transaction_type('income'),
+        'amount': lambda q: q.amount_range(10, 100)
+    }
+    statements = []
+    for size in range(len(filters) + 1):
+        for combination in itertools.combinations(filters, size):
+            for sort_key in TransactionQuery.SORT_KEYS:
+                query = TransactionQuery(0).order_by(sort_key)
+                for name in combination:
+                    filters[name](query)
+                label = f"TransactionQuery {'+'.join(combination) or 'none'} / {sort_key}"
+                statements.append((label, *query._select_sql(limit=20)))
+                statements.append((label, *query._count_sql()))
+    return statements
+
+def explain(cursor, sql, params):
+    """EXPLAIN QUERY PLAN detail lines; params may be a count (bound as NULL) or values"""
+    if isinstance(params, int):
+        params = [None] * params
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    return [row[-1] for row in cursor.fetchall()]
+
+def disallowed_scans(plan, sql, large_tables=LARGE_TABLES, allowed=ALLOWED_SCANS):
+    """Plan lines scanning a large table without an ALLOWED_SCANS entry"""
+    fingerprint = fingerprint_sql(sql)
+    violations = []
+    for detail in plan:
+        match = _SCAN_PATTERN.match(detail)
+        if not match or match.group(1) not in large_tables or _VIRTUAL_LOOKUP.search(detail):
+            continue
+        table = match.group(1)
+        if any(table == allowed_table and re.search(pattern, fingerprint)
+               for allowed_table, pattern, _ in allowed):
+            continue
+        violations.append(detail)
+    return violations
+
+def check_statements(statements):
+    """[(origin, sql, violations)] for statements whose plan scans a large table.
+
+    statements is an iterable of (origin, sql, params); aliases are resolved so
+    "SCAN t" is reported against the table t stands for."""
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    failures = []
+    for origin, sql, params in statements:
+        if not sql.lstrip().upper().startswith(EXPLAINED_KINDS):
+            continue
+        plan = [_resolve_alias(detail, sql) for detail in explain(cursor, sql, params)]
+        violations = disallowed_scans(plan, sql)
+        if violations:
+            failures.append((origin, sql, violations))
+    conn.close()
+    return failures
+
+def _resolve_alias(detail, sql):
+    match = _SCAN_PATTERN.match(detail)
+    if not match or match.group(2) or match.group(1) in LARGE_TABLES:
+        return detail
+    alias = match.group(1)
+    table = re.search(rf'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)\s+(?:AS\s+)?{alias}\b', sql, re.IGNORECASE)
+    return detail.replace(f'SCAN {alias}', f'SCAN {table.group(1)} AS {alias}', 1) if table else detail
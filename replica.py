@@ -0,0 +1,285 @@
+import os
+import time
+import logging
+import threading
+from flask_login import user_logged_in
+from database import Database, db_manager, User, Transaction, Account, AccountAlert, FinancialGoal
+
+# Local SQLite file mirroring the rows of logged-in users; unset disables the replica
+LOCAL_REPLICA_PATH = os.environ.get('LOCAL_REPLICA_PATH')
+
+# Seconds a replicated user is read locally before catching up on the remote change log
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 30))
+
+# Days change_log entries are kept; replicas idle for longer rehydrate from scratch
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 7))
+
+# Per-user data tables, in the order rows are copied
+MODELS = (Transaction, Account, FinancialGoal)
+_MODELS_BY_TABLE = {model.TABLE: model for model in MODELS}
+
+# One round trip: the users row plus per-table row counts for the consistency check
+_PROBE_SQL = (f'SELECT {User.COLUMNS}, '
+              + ', '.join(f'(SELECT COUNT(*) FROM {model.TABLE} WHERE user_id = users.id)' for model in MODELS)
+              + ' FROM users WHERE id = ?')
+
+def _close(conn):
+    try:
+        conn.commit()
+    except Exception as e:
+        # SQLite Cloud auto-commit behavior - this is expected
+        pass
+    conn.close()
+
+class ReplicaMismatch(Exception):
+    """Local row counts disagree with the remote database after catching up"""
+
+class LocalReplica:
+    """Local SQLite copy of active users' rows, serving their reads.
+
+    A user is copied on login (or on the first read after a restart), then kept
+    fresh two ways: model save/delete write through to the local copy right after
+    the remote commit, and every REPLICA_CHECK_INTERVAL seconds the remote
+    change_log is replayed from the last applied seq, which picks up writes from
+    other processes, hosts and bulk paths. Each catch-up ends with a row-count
+    check against the remote; on a mismatch the user's copy is dropped and reads
+    go to the remote database until it is rebuilt."""
+
+    def __init__(self, path, primary=db_manager):
+        self.primary = primary
+        self.db = Database(path, change_log=False)
+        # Statements run against the replica are traced like primary ones
+        self.db.query_listeners = primary.query_listeners
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.stats = {'hydrations': 0, 'syncs': 0, 'changes_applied': 0, 'mismatches': 0,
+                      'local_reads': 0, 'remote_fallbacks': 0}
+
+        conn = self.db.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS replica_users (
+                user_id INTEGER PRIMARY KEY,
+                last_seq INTEGER NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        ''')
+        # last_seq is a position in one shard's change_log; copies made before sharding are on shard 0
+        if 'shard' not in {row[1] for row in conn.execute('PRAGMA table_info(replica_users)')}:
+            conn.execute('ALTER TABLE replica_users ADD COLUMN shard INTEGER NOT NULL DEFAULT 0')
+        _close(conn)
+
+    def _lock(self, user_id):
+        with self._locks_lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _state(self, user_id):
+        conn = self.db.get_connection()
+        row = conn.execute('SELECT last_seq, checked_at, shard FROM replica_users WHERE user_id = ?', (user_id,)).fetchone()
+        conn.close()
+        return row
+
+    def connect_for(self, user_id, catch_up=True):
+        """Local connection for reading user_id's rows, or None to read from the remote.
+        
+        catch_up=False serves the local copy as is (it holds writes the remote does
+        not have yet) and returns None when there is no copy to serve."""
+        try:
+            state = self._state(user_id)
+            now = time.time()
+            if not catch_up:
+                if state is None:
+                    return None
+            elif (state is None or now - state[1] > CHANGE_LOG_RETENTION_DAYS * 86400
+                    or (self.primary.shards and state[2] != self.primary.shard_of(user_id))):
+                # New, idle past the log retention, or moved to another shard
+                self.hydrate(user_id)
+            elif now - state[1] > REPLICA_CHECK_INTERVAL:
+                self.sync(user_id)
+        except ReplicaMismatch:
+            self.stats['mismatches'] += 1
+            self.stats['remote_fallbacks'] += 1
+            logging.warning(f"Replica of user {user_id} disagrees with the remote database; reading remotely")
+            self.drop(user_id)
+            return None
+        except Exception:
+            self.stats['remote_fallbacks'] += 1
+            logging.exception(f"Replica unavailable for user {user_id}; reading remotely")
+            return None
+
+        self.stats['local_reads'] += 1
+        return self.db.get_connection()
+
+    def hydrate(self, user_id):
+        """Copy all of the user's rows from the remote database"""
+        if self.primary.write_behind is not None:
+            # Journaled writes must reach the remote before it is copied
+            self.primary.write_behind.wait_for(user_id)
+        with self._lock(user_id):
+            shard = self.primary.shard_of(user_id, cached=False) if self.primary.shards else 0
+            remote = self.primary.all_shards()[shard].get_connection()
+            cursor = remote.cursor()
+            # Read the log position first: changes made while copying are replayed by the next sync
+            cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log WHERE user_id = ?', (user_id,))
+            last_seq = cursor.fetchone()[0]
+            cursor.execute(f'SELECT {User.COLUMNS} FROM users WHERE id = ?', (user_id,))
+            user_row = cursor.fetchone()
+            rows = {}
+            for model in MODELS:
+                cursor.execute(f'SELECT {model.COLUMNS} FROM {model.TABLE} WHERE user_id = ?', (user_id,))
+                rows[model] = cursor.fetchall()
+            remote.close()
+
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            for model in MODELS:
+                cursor.execute(f'DELETE FROM {model.TABLE} WHERE user_id = ?', (user_id,))
+            if user_row is None:
+                cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            else:
+                for model in MODELS:
+                    cursor.executemany(model._upsert_sql(), rows[model])
+                cursor.execute(User._upsert_sql(), user_row)
+            AccountAlert.refresh(cursor, user_id=user_id)
+            cursor.execute('INSERT OR REPLACE INTO replica_users (user_id, last_seq, checked_at, shard) '
+                           'VALUES (?, ?, ?, ?)', (user_id, last_seq, time.time(), shard))
+            _close(conn)
+        self.stats['hydrations'] += 1
+
+    def sync(self, user_id):
+        """Apply the user's remote change_log entries since the last sync, then check row counts"""
+        with self._lock(user_id):
+            state = self._state(user_id)
+            if state is None:
+                return
+            if time.time() - state[1] <= REPLICA_CHECK_INTERVAL:
+                # Another thread caught up while this one waited
+                return
+            last_seq = state[0]
+
+            remote = self.primary.all_shards()[state[2]].get_connection()
+            cursor = remote.cursor()
+            cursor.execute('SELECT seq, table_name, row_id, deleted FROM change_log '
+                           'WHERE user_id = ? AND seq > ? ORDER BY seq', (user_id, last_seq))
+            changes = cursor.fetchall()
+            # Last entry per row wins; rows still present are refetched, the rest deleted
+            latest = {(table, row_id): deleted for _, table, row_id, deleted in changes}
+            fetched = {}
+            for table, model in _MODELS_BY_TABLE.items():
+                ids = [row_id for (changed_table, row_id), deleted in latest.items()
+                       if changed_table == table and not deleted]
+                if ids:
+                    cursor.execute(f'SELECT {model.COLUMNS} FROM {table} WHERE user_id = ? AND id IN '
+                                   f'({", ".join("?" * len(ids))})', (user_id, *ids))
+                    fetched[table] = cursor.fetchall()
+            cursor.execute(_PROBE_SQL, (user_id,))
+            probe = cursor.fetchone()
+            remote.close()
+
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            for (table, row_id), deleted in latest.items():
+                if deleted:
+                    cursor.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+            for table, rows in fetched.items():
+                present = {row[0] for row in rows}
+                cursor.executemany(_MODELS_BY_TABLE[table]._upsert_sql(), rows)
+                # Changed rows gone by now were deleted after the log was read
+                for (changed_table, row_id), deleted in latest.items():
+                    if changed_table == table and not deleted and row_id not in present:
+                        cursor.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+            if probe is None:
+                _close(conn)
+                raise ReplicaMismatch(user_id)
+            # Remote users row last: its data_version replaces the one bumped by the local triggers
+            user_columns = len(User.ROW_FIELDS)
+            cursor.execute(User._upsert_sql(), probe[:user_columns])
+            if 'accounts' in {table for table, _ in latest}:
+                AccountAlert.refresh(cursor, user_id=user_id)
+
+            local_counts = tuple(cursor.execute(f'SELECT COUNT(*) FROM {model.TABLE} WHERE user_id = ?',
+                                                (user_id,)).fetchone()[0] for model in MODELS)
+            if local_counts != tuple(probe[user_columns:]):
+                _close(conn)
+                raise ReplicaMismatch(user_id)
+
+            new_seq = changes[-1][0] if changes else last_seq
+            cursor.execute('UPDATE replica_users SET last_seq = ?, checked_at = ? WHERE user_id = ?',
+                           (new_seq, time.time(), user_id))
+            _close(conn)
+        self.stats['syncs'] += 1
+        self.stats['changes_applied'] += len(changes)
+
+    def touch(self, user_id):
+        """Catch up on the remote change log at the user's next read (after writes
+        that bypass the models, e.g. API batches or subscription changes)"""
+        conn = self.db.get_connection()
+        conn.execute('UPDATE replica_users SET checked_at = 0 WHERE user_id = ?', (user_id,))
+        _close(conn)
+
+    def drop(self, user_id):
+        """Forget the user's copy; the next read rebuilds it"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM replica_users WHERE user_id = ?', (user_id,))
+        for model in MODELS:
+            cursor.execute(f'DELETE FROM {model.TABLE} WHERE user_id = ?', (user_id,))
+        _close(conn)
+
+    def _apply(self, user_id, statement, params, refresh_alerts=False):
+        """Run one write-through statement if the user is replicated"""
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            if cursor.execute('SELECT 1 FROM replica_users WHERE user_id = ?', (user_id,)).fetchone():
+                cursor.execute(statement, params)
+                if refresh_alerts:
+                    AccountAlert.refresh(cursor, user_id=user_id)
+            _close(conn)
+        except Exception:
+            # The remote write already succeeded; rebuild the copy rather than serve it stale
+            logging.exception(f"Replica write-through failed for user {user_id}")
+            try:
+                self.drop(user_id)
+            except Exception:
+                logging.exception(f"Could not drop replica of user {user_id}")
+
+    def write_through(self, obj):
+        """Mirror a model save that has just been committed remotely"""
+        self._apply(obj.user_id, type(obj)._upsert_sql(), obj._to_row(), refresh_alerts=isinstance(obj, Account))
+
+    def delete_through(self, obj):
+        """Mirror a model delete that has just been committed remotely"""
+        self._apply(obj.user_id, f'DELETE FROM {type(obj).TABLE} WHERE id = ?', (obj.id,),
+                    refresh_alerts=isinstance(obj, Account))
+
+def touch(user_id):
+    """replica.touch for callers that write around the models; no-op without a replica"""
+    if db_manager.replica is not None:
+        db_manager.replica.touch(user_id)
+
+def prune_change_log(now=None):
+    """Delete change_log entries older than CHANGE_LOG_RETENTION_DAYS (on every shard)"""
+    cutoff = int((now or time.time()) - CHANGE_LOG_RETENTION_DAYS * 86400)
+    removed = 0
+    for shard in db_manager.all_shards():
+        conn = shard.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM change_log WHERE created_ts < ?', (cutoff,))
+        removed += cursor.rowcount
+        _close(conn)
+    return removed
+
+def init_replica(app):
+    """Serve per-user reads from LOCAL_REPLICA_PATH, copying each user on login"""
+    if not LOCAL_REPLICA_PATH:
+        return
+    db_manager.replica = LocalReplica(LOCAL_REPLICA_PATH)
+
+    @user_logged_in.connect_via(app)
+    def hydrate_on_login(sender, user):
+        try:
+            db_manager.replica.hydrate(user.id)
+        except Exception:
+            logging.exception(f"Replica hydration failed for user {user.id}")
+
+    logging.info(f"Local read replica at {LOCAL_REPLICA_PATH}")
@@ -1,9 +1,10 @@
-from flask import Blueprint, render_template, jsonify, flash, redirect, url_for, make_response
+from flask import Blueprint, render_template, jsonify, flash, redirect, url_for, make_response, request
 from flask_login import login_required, current_user
 from models import Transaction, Account
-from database import db_manager
+from database import db_manager, to_day
 from datetime import datetime, timedelta
 import calendar
+import functools
 import io
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
@@ -11,7 +12,9 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-from utils import utc_to_brasilia, format_currency
+from utils import utc_to_brasilia, now_brasilia, format_currency, format_brasilia_dates, format_currency_many
+from metrics import metrics
+from analytics import snapshot_cache, MAX_REPORT_DAYS, MAX_ROLLING_WINDOW
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -25,10 +28,17 @@ def reports():
                              access_denied=True,
                              message='Relatórios estão disponíveis apenas para planos pagos.')
     
+    # Queries run only when the page's cached fragments miss
+    user_id = current_user.id
+    return render_template('reports/reports.html',
+                         load_report=functools.lru_cache(maxsize=None)(lambda: _report_data(user_id)),
+                         cache_day=now_brasilia().date().isoformat(),
+                         features=features)
+
+def _report_data(user_id):
+    """Monthly performance, category breakdown and KPIs for the reports page"""
     # Generate reports data
     today = datetime.utcnow()
-    current_month = today.month
-    current_year = today.year
     
     # Monthly performance
     monthly_data = []
@@ -37,7 +47,7 @@ def reports():
         month = month_date.month
         year = month_date.year
         
-        income, expenses = Transaction.get_monthly_summary(current_user.id, month, year)
+        income, expenses = Transaction.get_monthly_summary(user_id, month, year)
         
         monthly_data.append({
             'month': calendar.month_name[month],
@@ -49,48 +59,64 @@ def reports():
     monthly_data.reverse()
     
     # Category analysis
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT category, SUM(amount) as total 
-        FROM transactions 
-        WHERE user_id = ? AND transaction_type = 'expense' AND category IS NOT NULL
-        GROUP BY category
-    ''', (current_user.id,))
-    
-    category_data = [{'category': row[0], 'total': float(row[1])} for row in cursor.fetchall()]
-    conn.close()
+    category_data = [{'category': category, 'total': total}
+                     for category, total in Transaction.get_category_totals(user_id, 'expense')]
     
     # Calculate KPIs
     total_income = sum(m['income'] for m in monthly_data)
     total_expenses = sum(m['expenses'] for m in monthly_data)
     net_profit = total_income - total_expenses
     
-    transaction_count = Transaction.count_by_user_id(current_user.id)
+    transaction_count = Transaction.count_by_user_id(user_id)
     avg_ticket = total_income / max(1, transaction_count)
     
     # Overdue accounts
-    conn = db_manager.get_connection()
+    conn = db_manager.get_read_connection(user_id)
     cursor = conn.cursor()
     
     cursor.execute('''
         SELECT COUNT(*) FROM accounts 
-        WHERE user_id = ? AND status = 'pending' AND due_date < ?
-    ''', (current_user.id, today.isoformat()))
+        WHERE user_id = ? AND status = 'pending' AND due_day < ?
+    ''', (user_id, to_day(utc_to_brasilia(today).date())))
     
     overdue_accounts = cursor.fetchone()[0]
     conn.close()
     
-    return render_template('reports/reports.html',
-                         monthly_data=monthly_data,
-                         category_data=category_data,
-                         total_income=total_income,
-                         total_expenses=total_expenses,
-                         net_profit=net_profit,
-                         avg_ticket=avg_ticket,
-                         overdue_accounts=overdue_accounts,
-                         features=features)
+    return {
+        'monthly_data': monthly_data,
+        'category_data': category_data,
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'net_profit': net_profit,
+        'avg_ticket': avg_ticket,
+        'overdue_accounts': overdue_accounts
+    }
+
+@reports_bp.route('/analytics')
+@login_required
+def analytics_json():
+    """Range analysis for the reports page as JSON: monthly totals against the same
+    months a year earlier, expenses by category per month, the rolling net balance
+    and amount percentiles, computed on the user's cached columnar snapshot.
+    
+    Query args: start/end (YYYY-MM-DD, Brasilia dates, inclusive; default the last
+    365 days), window (days in the rolling balance, default 30)."""
+    if not current_user.get_plan_features()['reports']:
+        return jsonify({'error': 'Relatórios estão disponíveis apenas para planos pagos.'}), 403
+    
+    try:
+        end = request.args.get('end')
+        end_day = (to_day(datetime.strptime(end, '%Y-%m-%d').date()) if end else to_day(now_brasilia().date())) + 1
+        start = request.args.get('start')
+        start_day = to_day(datetime.strptime(start, '%Y-%m-%d').date()) if start else end_day - 365
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not 0 < end_day - start_day <= MAX_REPORT_DAYS:
+        return jsonify({'error': f'O período deve ter entre 1 e {MAX_REPORT_DAYS} dias'}), 400
+    window = min(MAX_ROLLING_WINDOW, max(1, request.args.get('window', 30, type=int)))
+    
+    snapshot = snapshot_cache.get(current_user.id, current_user.data_version)
+    return jsonify(snapshot.report(start_day, end_day, window))
 
 @reports_bp.route('/export-pdf')
 @login_required
@@ -116,8 +142,9 @@ def export_pdf():
         )
         
         # Build PDF content
-        content = build_pdf_content()
-        doc.build(content)
+        with metrics.timer('pdf_render_duration_seconds'):
+            content = build_pdf_content()
+            doc.build(content)
         
         # Prepare response
         pdf_buffer.seek(0)
@@ -217,18 +244,10 @@ def build_pdf_content():
         # Transactions table
         trans_data = [['Data', 'Descrição', 'Categoria', 'Tipo', 'Valor']]
         
-        for transaction in recent_transactions:
-            if transaction.date:
-                try:
-                    date_obj = datetime.fromisoformat(transaction.date.replace('Z', '+00:00'))
-                    date_str = utc_to_brasilia(date_obj).strftime('%d/%m/%Y')
-                except:
-                    date_str = '-'
-            else:
-                date_str = '-'
-                
+        dates = format_brasilia_dates([t.date_ts for t in recent_transactions])
+        amounts = format_currency_many([t.amount for t in recent_transactions])
+        for transaction, date_str, amount_str in zip(recent_transactions, dates, amounts):
             type_str = 'Receita' if transaction.transaction_type == 'income' else 'Despesa'
-            amount_str = f'R$ {float(transaction.amount):,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
             if transaction.transaction_type == 'expense':
                 amount_str = f'-{amount_str}'
             else:
@@ -264,18 +283,7 @@ def build_pdf_content():
     # Category analysis
     content.append(Paragraph("Análise por Categorias", subtitle_style))
     
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT category, SUM(amount) as total 
-        FROM transactions 
-        WHERE user_id = ? AND transaction_type = 'expense' AND category IS NOT NULL
-        GROUP BY category
-    ''', (current_user.id,))
-    
-    category_data = cursor.fetchall()
-    conn.close()
+    category_data = Transaction.get_category_totals(current_user.id, 'expense')
     
     if category_data:
         cat_data = [['Categoria', 'Total Gasto']]
@@ -0,0 +1,158 @@
+import os
+import time
+import logging
+from database import db_manager, jump_hash, User, Transaction, Account, FinancialGoal, AccountAlert, SHARD_DIRECTORY_TTL
+
+# Seconds to wait after switching a user's shard, so every process's cached placement expires
+SHARD_MOVE_SETTLE = float(os.environ.get('SHARD_MOVE_SETTLE', SHARD_DIRECTORY_TTL * 2))
+
+# Change-log replays before the switch; stops early once a round finds nothing new
+MAX_CATCH_UP_ROUNDS = 5
+
+MODELS = {model.TABLE: model for model in (Transaction, Account, FinancialGoal)}
+
+def _commit(conn):
+    try:
+        conn.commit()
+    except Exception as e:
+        # SQLite Cloud auto-commit behavior - this is expected
+        pass
+
+def _copy_user_row(source, destination, user_id):
+    source.execute(f'SELECT {User.COLUMNS} FROM users WHERE id = ?', (user_id,))
+    row = source.fetchone()
+    if row:
+        destination.execute(User._upsert_sql(), row)
+
+def _copy_archive(source, destination, user_id):
+    """Copy the user's archived transactions and their rollups; returns the rows copied"""
+    copied = 0
+    for year in Transaction.archive_years(source):
+        table = Transaction.archive_table(year)
+        source.execute(f'SELECT {Transaction.COLUMNS} FROM {table} WHERE user_id = ?', (user_id,))
+        rows = source.fetchall()
+        if rows:
+            Transaction.create_archive_table(destination, year)
+            destination.executemany(f'INSERT OR REPLACE INTO {table} ({Transaction.COLUMNS}) '
+                                    f'VALUES ({", ".join("?" * len(rows[0]))})', rows)
+            copied += len(rows)
+    source.execute('SELECT user_id, month_ts, transaction_type, category, total, count FROM transaction_rollups '
+                   'WHERE user_id = ?', (user_id,))
+    destination.executemany('INSERT OR REPLACE INTO transaction_rollups '
+                            '(user_id, month_ts, transaction_type, category, total, count) VALUES (?, ?, ?, ?, ?, ?)',
+                            source.fetchall())
+    return copied
+
+def _catch_up(source, destination, user_id, last_seq):
+    """Replay the user's source change_log after last_seq onto the destination;
+    returns (entries replayed, new last_seq)"""
+    source.execute('SELECT seq, table_name, row_id, deleted FROM change_log WHERE user_id = ? AND seq > ? '
+                   'ORDER BY seq', (user_id, last_seq))
+    changes = source.fetchall()
+    if not changes:
+        return 0, last_seq
+    latest = {(table, row_id): deleted for _, table, row_id, deleted in changes}
+    for (table, row_id), deleted in latest.items():
+        row = None
+        if not deleted:
+            source.execute(f'SELECT {MODELS[table].COLUMNS} FROM {table} WHERE id = ?', (row_id,))
+            row = source.fetchone()
+        if row:
+            destination.execute(MODELS[table]._upsert_sql(), row)
+        else:
+            destination.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+    if any(table == Account.TABLE for table, _ in latest):
+        AccountAlert.refresh(destination, user_id=user_id)
+    return len(changes), changes[-1][0]
+
+def _start_move(user_id, target):
+    """Copy the user's rows to shard target and switch the directory; returns the state
+    _finish_move needs, or None when the user is already there"""
+    source_index = db_manager.shard_of(user_id, cached=False)
+    if source_index == target:
+        return None
+    source_db, destination_db = db_manager.shards[source_index], db_manager.shards[target]
+    if db_manager.write_behind is not None:
+        # Journaled writes are applied to the source before it is copied
+        db_manager.write_behind.wait_for(user_id)
+
+    source_conn, destination_conn = source_db.get_connection(), destination_db.get_connection()
+    source, destination = source_conn.cursor(), destination_conn.cursor()
+    # Read the log position first: changes made while copying are replayed below
+    source.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log WHERE user_id = ?', (user_id,))
+    last_seq = source.fetchone()[0]
+    copied = 0
+    for table, model in MODELS.items():
+        source.execute(f'SELECT {model.COLUMNS} FROM {table} WHERE user_id = ?', (user_id,))
+        rows = source.fetchall()
+        destination.executemany(model._upsert_sql(), rows)
+        copied += len(rows)
+    copied += _copy_archive(source, destination, user_id)
+    AccountAlert.refresh(destination, user_id=user_id)
+    _commit(destination_conn)
+
+    for _ in range(MAX_CATCH_UP_ROUNDS):
+        replayed, last_seq = _catch_up(source, destination, user_id, last_seq)
+        _commit(destination_conn)
+        if not replayed:
+            break
+    # Users row last, so its data_version replaces the one the destination triggers bumped
+    _copy_user_row(source, destination, user_id)
+    _commit(destination_conn)
+    source_conn.close()
+    destination_conn.close()
+
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE shard_directory SET shard = ? WHERE user_id = ?', (target, user_id))
+    _commit(conn)
+    conn.close()
+    db_manager._placements.pop(user_id, None)
+    return user_id, source_db, destination_db, last_seq, copied
+
+def _finish_move(user_id, source_db, destination_db, last_seq, copied):
+    """Replay writes that reached the source after the switch, then delete the source rows"""
+    source_conn, destination_conn = source_db.get_connection(), destination_db.get_connection()
+    source, destination = source_conn.cursor(), destination_conn.cursor()
+    _catch_up(source, destination, user_id, last_seq)
+    # Again, in case the archive job moved rows on the source in the meantime
+    _copy_archive(source, destination, user_id)
+    _commit(destination_conn)
+    archive_tables = [Transaction.archive_table(year) for year in Transaction.archive_years(source)]
+    for table in (*MODELS, 'account_alerts', 'transaction_rollups', *archive_tables):
+        source.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
+    source.execute('DELETE FROM users WHERE id = ?', (user_id,))
+    _commit(source_conn)
+    source_conn.close()
+    destination_conn.close()
+    logging.info(f"Moved user {user_id} ({copied} rows) from shard {source_db.shard_index} "
+                 f"to shard {destination_db.shard_index}")
+
+def move_users(moves, settle=None):
+    """Move users to other shards while the app keeps serving them; moves is an
+    iterable of (user_id, target shard). Returns {user_id: rows copied}.
+
+    Each user's rows are bulk-copied, the source change_log is replayed until it is
+    quiet and the directory entry is switched. After every process has dropped its
+    cached placement (one settle period for the whole batch), writes that still
+    reached the source are replayed once more and the source rows are deleted.
+    Row ids are unique across shards, so rows keep them. Changes to the users row
+    itself during the settle window stay on the source and are lost."""
+    started = [state for state in (_start_move(user_id, target) for user_id, target in moves) if state]
+    if started:
+        time.sleep(SHARD_MOVE_SETTLE if settle is None else settle)
+    for state in started:
+        _finish_move(*state)
+    return {state[0]: state[-1] for state in started}
+
+def misplaced_users():
+    """(user_id, current shard, hashed shard) for users not on the shard their id hashes to,
+    e.g. after a shard was added to DATABASE_SHARDS"""
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT user_id, shard FROM shard_directory')
+    rows = cursor.fetchall()
+    conn.close()
+    count = len(db_manager.shards)
+    return [(user_id, shard, jump_hash(user_id, count)) for user_id, shard in rows
+            if shard != jump_hash(user_id, count)]
@@ -65,6 +65,7 @@ function initializeCharts() {
     
     // Load chart data and create financial chart
     loadChartData();
+    loadForecast();
 }
 
 // Load chart data via AJAX
@@ -80,12 +81,15 @@ function loadChartData() {
         });
 }
 
+// Main chart instance, kept for incremental updates
+let financialChart = null;
+
 // Create the main financial chart
 function createFinancialChart(data) {
     const ctx = document.getElementById('financialChart');
     if (!ctx) return;
     
-    new Chart(ctx, {
+    financialChart = new Chart(ctx, {
         type: 'line',
         data: {
             labels: data.months,
@@ -168,6 +172,141 @@ function createFinancialChart(data) {
     });
 }
 
+// Forecast chart instance, redrawn when the user's data changes
+let forecastChart = null;
+
+// Load the 90-day cash flow forecast into its chart
+function loadForecast() {
+    const ctx = document.getElementById('forecastChart');
+    if (!ctx) return;
+    
+    fetch('/dashboard/forecast')
+        .then(response => response.json())
+        .then(data => {
+            const labels = data.days.map(day => day.slice(8, 10) + '/' + day.slice(5, 7));
+            const lowest = document.getElementById('forecastLowest');
+            if (lowest) {
+                const day = data.lowest.day;
+                lowest.textContent = `Menor saldo previsto: ${formatCurrency(data.lowest.balance)} em ` +
+                    `${day.slice(8, 10)}/${day.slice(5, 7)}/${day.slice(0, 4)}`;
+                lowest.classList.toggle('text-danger', data.lowest.balance < 0);
+            }
+            if (forecastChart) {
+                forecastChart.data.labels = labels;
+                forecastChart.data.datasets[0].data = data.balance;
+                forecastChart.data.datasets[1].data = data.inflow;
+                forecastChart.data.datasets[2].data = data.outflow;
+                forecastChart.update();
+                return;
+            }
+            createForecastChart(ctx, labels, data);
+        })
+        .catch(error => {
+            console.error('Error loading forecast:', error);
+        });
+}
+
+// Create the forecast chart: projected balance over daily inflow/outflow bars
+function createForecastChart(ctx, labels, data) {
+    forecastChart = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: labels,
+            datasets: [{
+                type: 'line',
+                label: 'Saldo previsto',
+                data: data.balance,
+                borderColor: 'rgb(59, 130, 246)',
+                backgroundColor: 'rgba(59, 130, 246, 0.1)',
+                pointRadius: 0,
+                tension: 0.3,
+                fill: true,
+                yAxisID: 'y'
+            }, {
+                label: 'Entradas',
+                data: data.inflow,
+                backgroundColor: 'rgba(34, 197, 94, 0.6)',
+                yAxisID: 'flow'
+            }, {
+                label: 'Saídas',
+                data: data.outflow,
+                backgroundColor: 'rgba(239, 68, 68, 0.6)',
+                yAxisID: 'flow'
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            interaction: {
+                intersect: false,
+                mode: 'index'
+            },
+            scales: {
+                y: {
+                    position: 'left',
+                    grid: {
+                        color: 'rgba(0, 0, 0, 0.05)'
+                    },
+                    ticks: {
+                        maxTicksLimit: 6,
+                        font: {
+                            size: 11
+                        },
+                        callback: function(value) {
+                            return formatCurrency(value);
+                        }
+                    }
+                },
+                flow: {
+                    position: 'right',
+                    beginAtZero: true,
+                    grid: {
+                        display: false
+                    },
+                    ticks: {
+                        maxTicksLimit: 4,
+                        font: {
+                            size: 11
+                        }
+                    }
+                },
+                x: {
+                    grid: {
+                        display: false
+                    },
+                    ticks: {
+                        maxTicksLimit: 12,
+                        font: {
+                            size: 11
+                        }
+                    }
+                }
+            },
+            plugins: {
+                legend: {
+                    position: 'top',
+                    labels: {
+                        usePointStyle: true,
+                        padding: 12,
+                        boxWidth: 12,
+                        font: {
+                            size: 12
+                        }
+                    }
+                },
+                tooltip: {
+                    backgroundColor: 'rgba(0, 0, 0, 0.8)',
+                    callbacks: {
+                        label: function(context) {
+                            return context.dataset.label + ': ' + formatCurrency(context.parsed.y);
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
 // Format currency values
 function formatCurrency(value) {
     return new Intl.NumberFormat('pt-BR', {
@@ -231,7 +370,107 @@ function setupRealtimeUpdates() {
     
     // Check for new notifications
     checkNotifications();
-    setInterval(checkNotifications, 300000); // Check every 5 minutes
+    
+    // Changes are pushed by the server instead of polled
+    subscribeToEvents();
+}
+
+// Subscribe to the server's change event stream
+function subscribeToEvents() {
+    if (typeof EventSource === 'undefined') {
+        setInterval(checkNotifications, 300000); // Fallback: check every 5 minutes
+        return;
+    }
+    
+    const source = new EventSource('/dashboard/events');
+    
+    source.addEventListener('transaction.created', event => {
+        const transaction = JSON.parse(event.data);
+        refreshDashboard();
+        showNotification(`Nova transação: ${transaction.description}`, 'info');
+    });
+    source.addEventListener('transaction.updated', () => {
+        refreshDashboard();
+    });
+    source.addEventListener('account.paid', () => {
+        refreshDashboard();
+        checkNotifications();
+    });
+    source.addEventListener('account.saved', () => {
+        refreshDashboard();
+        checkNotifications();
+    });
+    source.addEventListener('goal.completed', event => {
+        const goal = JSON.parse(event.data);
+        showNotification(`Parabéns! Meta "${goal.title}" concluída!`, 'success');
+    });
+    // Bulk API writes, writes handled by other workers and dropped events all
+    // invalidate the whole view
+    source.addEventListener('batch.applied', () => {
+        refreshDashboard();
+        checkNotifications();
+    });
+    source.addEventListener('resync', () => {
+        refreshDashboard();
+        checkNotifications();
+    });
+}
+
+// Refetch everything a change can move: totals, the chart and the forecast
+function refreshDashboard() {
+    refreshTotals();
+    refreshChartData();
+    loadForecast();
+}
+
+// Show an amount, keeping its raw value in data-value
+function setDisplayedAmount(id, value) {
+    const element = document.getElementById(id);
+    if (!element) return;
+    
+    element.setAttribute('data-value', value);
+    element.textContent = formatCurrency(value);
+}
+
+// Refetch the monthly cards and pending account totals; the server's totals are
+// authoritative, so repeated or out-of-order events cannot skew them
+function refreshTotals() {
+    fetch('/dashboard/summary')
+        .then(response => response.json())
+        .then(data => {
+            setDisplayedAmount('monthlyIncome', data.monthly_income);
+            setDisplayedAmount('monthlyExpenses', data.monthly_expenses);
+            setDisplayedAmount('monthlyBalance', data.monthly_balance);
+            const balance = document.getElementById('monthlyBalance');
+            if (balance) {
+                balance.classList.toggle('text-success', data.monthly_balance >= 0);
+                balance.classList.toggle('text-danger', data.monthly_balance < 0);
+            }
+            setDisplayedAmount('pendingReceivables', data.pending_receivables);
+            setDisplayedAmount('pendingPayables', data.pending_payables);
+        })
+        .catch(error => {
+            console.error('Error refreshing totals:', error);
+        });
+}
+
+// Refetch chart data into the existing chart
+function refreshChartData() {
+    if (!financialChart) {
+        initializeCharts();
+        return;
+    }
+    fetch('/dashboard/chart-data')
+        .then(response => response.json())
+        .then(data => {
+            financialChart.data.labels = data.months;
+            financialChart.data.datasets[0].data = data.income;
+            financialChart.data.datasets[1].data = data.expenses;
+            financialChart.update();
+        })
+        .catch(error => {
+            console.error('Error refreshing chart data:', error);
+        });
 }
 
 // Update time display
@@ -250,18 +489,33 @@ function updateTimeDisplay() {
 
 // Check for notifications
 function checkNotifications() {
-    // This would typically make an API call to check for new notifications
-    // For now, we'll simulate with random notifications
-    if (Math.random() < 0.1) { // 10% chance
-        const messages = [
-            'Nova transação adicionada com sucesso!',
-            'Lembrete: Você tem contas vencendo em 3 dias',
-            'Seu relatório mensal está disponível',
-            'Parabéns! Você atingiu sua meta de economia'
-        ];
-        const randomMessage = messages[Math.floor(Math.random() * messages.length)];
-        showNotification(randomMessage, 'info');
-    }
+    // Reminders are precomputed server-side by the account alert scan,
+    // so this poll is a single-row lookup
+    fetch('/dashboard/notifications')
+        .then(response => response.json())
+        .then(alerts => {
+            // Only notify when the reminder counts changed since the last check
+            const stamp = [alerts.overdue_payables, alerts.overdue_receivables,
+                           alerts.due_soon_payables, alerts.due_soon_receivables].join(':');
+            if (stamp === '0:0:0:0' || sessionStorage.getItem('accountAlertsSeen') === stamp) return;
+            sessionStorage.setItem('accountAlertsSeen', stamp);
+
+            if (alerts.overdue_payables > 0) {
+                showNotification(`Você tem ${alerts.overdue_payables} conta(s) a pagar vencida(s): ${formatCurrency(alerts.overdue_payables_total)}`, 'error');
+            }
+            if (alerts.overdue_receivables > 0) {
+                showNotification(`Você tem ${alerts.overdue_receivables} conta(s) a receber vencida(s): ${formatCurrency(alerts.overdue_receivables_total)}`, 'warning');
+            }
+            if (alerts.due_soon_payables > 0) {
+                showNotification(`Lembrete: ${alerts.due_soon_payables} conta(s) a pagar vencendo em breve`, 'info');
+            }
+            if (alerts.due_soon_receivables > 0) {
+                showNotification(`Lembrete: ${alerts.due_soon_receivables} conta(s) a receber vencendo em breve`, 'info');
+            }
+        })
+        .catch(error => {
+            console.error('Error checking notifications:', error);
+        });
 }
 
 // Handle responsive elements
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from models import User
-from database import db_manager
+from database import db_manager, to_epoch
+import replica
 from datetime import datetime, timedelta
 
 subscription_bp = Blueprint('subscription', __name__)
@@ -94,20 +95,21 @@ def activate_plan(plan_id):
         return redirect(url_for('subscription.plans'))
     
     # Update user subscription in database
-    conn = db_manager.get_connection()
+    conn = db_manager.for_user(current_user.id).get_connection()
     cursor = conn.cursor()
     
     # Set subscription end date to 30 days from now
-    end_date = (datetime.utcnow() + timedelta(days=30)).isoformat()
+    end_date = datetime.utcnow() + timedelta(days=30)
     
     cursor.execute('''
         UPDATE users 
-        SET subscription_plan = ?, subscription_status = 'active', subscription_end_date = ?
+        SET subscription_plan = ?, subscription_status = 'active', subscription_end_ts = ?
         WHERE id = ?
-    ''', (plan_id, end_date, current_user.id))
+    ''', (plan_id, to_epoch(end_date), current_user.id))
     
     conn.commit()
     conn.close()
+    replica.touch(current_user.id)
     
     # Update current_user object
     current_user.subscription_plan = plan_id
@@ -0,0 +1,51 @@
+"""Shared fixtures: one seeded local SQLite database per test session.
+
+The app reads DATABASE_URL when database.py is imported, so the environment is
+set up (and the synthetic tenants generated) before anything imports it."""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['DATABASE_URL'] = DB_PATH
+os.environ['PRECOMPILE_TEMPLATES'] = '0'
+for name in ('DATABASE_SHARDS', 'LOCAL_REPLICA_PATH', 'WRITE_BEHIND_JOURNAL', 'TRANSACTION_ARCHIVE_DAYS',
+             'RUN_BACKGROUND_JOBS'):
+    os.environ.pop(name, None)
+
+from synthetic import generate
+
+# One tenant per suite that edits its data (see the USER_ID of each test module)
+USER_IDS = generate(DB_PATH, users=8, transactions=200)
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+@pytest.fixture(scope='session')
+def user_id(app):
+    """A seeded tenant on the enterprise plan: every feature, no transaction limit"""
+    from database import db_manager, to_epoch
+    conn = db_manager.get_connection()
+    conn.execute("UPDATE users SET subscription_plan = 'enterprise', subscription_status = 'active', "
+                 "subscription_end_ts = ? WHERE id = ?", (to_epoch(datetime.utcnow() + timedelta(days=30)), USER_IDS[0]))
+    conn.commit()
+    conn.close()
+    return USER_IDS[0]
+
+@pytest.fixture
+def client(app, user_id):
+    """Test client logged in as user_id"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
@@ -0,0 +1,108 @@
+"""JSON API: token auth, cursor pagination and all-or-nothing batches."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import USER_IDS
+from database import db_manager, ApiToken, to_epoch
+
+# Its own tenants: one on the enterprise plan, one whose rows it must not reach
+USER_ID, OTHER_USER_ID = USER_IDS[6], USER_IDS[7]
+
+def _set_plan(user_id, plan):
+    conn = db_manager.get_connection()
+    conn.execute("UPDATE users SET subscription_plan = ?, subscription_status = 'active', subscription_end_ts = ? "
+                 "WHERE id = ?", (plan, to_epoch(datetime.utcnow() + timedelta(days=30)), user_id))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture(scope='module')
+def headers(app):
+    """Authorization headers for USER_ID, on the enterprise plan"""
+    _set_plan(USER_ID, 'enterprise')
+    _, token = ApiToken.create(USER_ID, 'testes')
+    return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def api(app):
+    return app.test_client()
+
+def _ids(user_id):
+    conn = db_manager.get_connection()
+    ids = {row[0] for row in conn.execute('SELECT id FROM transactions WHERE user_id = ?', (user_id,))}
+    conn.close()
+    return ids
+
+def _batch(api, headers, body):
+    return api.post('/api/v1/transactions/batch', headers=headers, json=body)
+
+def _new(description='Venda API', amount=10.5):
+    return {'description': description, 'amount': amount, 'transaction_type': 'income'}
+
+@pytest.mark.parametrize('authorization', [None, 'Bearer', 'Basic abc', 'Bearer token-que-nao-existe'])
+def test_missing_or_unknown_token_is_401(api, headers, authorization):
+    response = api.get('/api/v1/transactions', headers={'Authorization': authorization} if authorization else {})
+    assert response.status_code == 401
+
+def test_token_of_a_plan_without_the_api_is_403(api, headers):
+    _set_plan(OTHER_USER_ID, 'professional')
+    _, token = ApiToken.create(OTHER_USER_ID, 'sem acesso')
+    response = api.get('/api/v1/transactions', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 403
+
+def test_cursor_pagination_lists_every_row_once(api, headers):
+    listed, cursor = [], None
+    while True:
+        response = api.get('/api/v1/transactions', headers=headers,
+                           query_string={'limit': 40, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['data']) <= 40
+        listed += [item['id'] for item in page['data']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert listed == sorted(_ids(USER_ID), reverse=True)
+
+def test_batch_creates_updates_and_deletes(api, headers):
+    first, second = sorted(_ids(USER_ID))[:2]
+    response = _batch(api, headers, {'create': [_new(), _new('Venda API 2', 20)],
+                                     'update': [{'id': first, 'amount': 99.9}], 'delete': [second]})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert len(summary['created']) == 2 and summary['updated'] == [first] and summary['deleted'] == [second]
+    ids = _ids(USER_ID)
+    assert set(summary['created']) <= ids and second not in ids
+    conn = db_manager.get_connection()
+    assert conn.execute('SELECT amount FROM transactions WHERE id = ?', (first,)).fetchone() == (99.9,)
+    conn.close()
+
+def test_batch_touching_another_users_row_is_404_and_writes_nothing(api, headers):
+    before, foreign = _ids(USER_ID), min(_ids(OTHER_USER_ID))
+    response = _batch(api, headers, {'create': [_new()], 'update': [{'id': foreign, 'amount': 1}]})
+    assert response.status_code == 404
+    assert response.get_json()['details'] == {'ids': [foreign]}
+    response = _batch(api, headers, {'create': [_new()], 'delete': [foreign]})
+    assert response.status_code == 404
+    assert _ids(USER_ID) == before
+    assert foreign in _ids(OTHER_USER_ID)
+
+def test_batch_with_an_invalid_item_writes_nothing(api, headers):
+    before = _ids(USER_ID)
+    response = _batch(api, headers, {'create': [_new(), _new(amount=-5)]})
+    assert response.status_code == 400
+    assert response.get_json()['details'] == [{'op': 'create', 'index': 1,
+                                               'errors': ['amount: deve ser maior ou igual a 0.01']}]
+    assert _ids(USER_ID) == before
+
+@pytest.mark.parametrize('body', [{'update': [{'id': True, 'amount': 1}]}, {'delete': [True]}, {'delete': [False]}])
+def test_boolean_ids_are_rejected(api, headers, body):
+    response = _batch(api, headers, body)
+    assert response.status_code == 400
+
+def test_batch_over_the_item_cap_is_413(api, headers, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'API_MAX_BATCH_ITEMS', 3)
+    before = _ids(USER_ID)
+    response = _batch(api, headers, {'create': [_new(), _new()], 'delete': sorted(before)[:2]})
+    assert response.status_code == 413
+    assert _ids(USER_ID) == before
@@ -0,0 +1,94 @@
+"""Archiving keeps every aggregate and query result; restoring empties the rollups."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from archive import archive_transactions, restore_ids
+from conftest import USER_IDS
+from database import db_manager, Transaction, TransactionQuery
+
+# Its own tenant: rows are restored one by one here
+USER_ID = USER_IDS[5]
+
+@pytest.fixture
+def archive_days(app, monkeypatch):
+    """Set TRANSACTION_ARCHIVE_DAYS; every archived row is restored afterwards"""
+    def set_days(days):
+        monkeypatch.setattr(database, 'TRANSACTION_ARCHIVE_DAYS', days)
+    yield set_days
+    set_days(0)
+    archive_transactions()
+
+def _months():
+    today = datetime.utcnow()
+    return [((today.month - offset - 1) % 12 + 1, today.year + (today.month - offset - 1) // 12) for offset in range(14)]
+
+def _results(user_id):
+    """Every aggregate and query result that must not change when rows are archived"""
+    now = datetime.utcnow()
+    ranged = TransactionQuery(user_id).date_range(now - timedelta(days=300), now - timedelta(days=100))
+    filtered = TransactionQuery(user_id).transaction_type('expense').amount_range(50, 1000).order_by('amount_desc')
+    page, total = TransactionQuery(user_id).paginate(page=3, per_page=20)
+    return {
+        'count': Transaction.count_by_user_id(user_id),
+        'ids': [transaction.id for transaction in TransactionQuery(user_id).all()],
+        'page': ([transaction.id for transaction in page], total),
+        'ranged': ([transaction.id for transaction in ranged.all()], ranged.count()),
+        'filtered': ([transaction.id for transaction in filtered.all(limit=10)], filtered.count()),
+        'monthly': [Transaction.get_monthly_summary(user_id, month, year) for month, year in _months()],
+        'income': dict(Transaction.get_category_totals(user_id, 'income')),
+        'expense': dict(Transaction.get_category_totals(user_id, 'expense'))
+    }
+
+def _assert_same(results, expected):
+    for key in ('count', 'ids', 'page', 'ranged', 'filtered'):
+        assert results[key] == expected[key], key
+    # Rollups sum in another order, so totals may differ in the last bits
+    assert [pytest.approx(month) for month in results['monthly']] == expected['monthly']
+    assert results['income'] == pytest.approx(expected['income'])
+    assert results['expense'] == pytest.approx(expected['expense'])
+
+def _stored(user_id):
+    """(live rows, rollup rows, rolled-up count) of the user"""
+    conn = db_manager.get_connection()
+    live = conn.execute('SELECT COUNT(*) FROM transactions WHERE user_id = ?', (user_id,)).fetchone()[0]
+    rollups, count = conn.execute('SELECT COUNT(*), COALESCE(SUM(count), 0) FROM transaction_rollups '
+                                  'WHERE user_id = ?', (user_id,)).fetchone()
+    conn.close()
+    return live, rollups, count
+
+def test_archive_and_restore_keep_every_result(archive_days):
+    expected = _results(USER_ID)
+    live, _, _ = _stored(USER_ID)
+    assert _stored(USER_ID) == (live, 0, 0)
+
+    archive_days(180)
+    archive_transactions()
+    archived_live, rollups, rolled_up = _stored(USER_ID)
+    assert rollups and rolled_up and archived_live + rolled_up == live
+    _assert_same(_results(USER_ID), expected)
+
+    archive_days(0)
+    archive_transactions()
+    assert _stored(USER_ID) == (live, 0, 0)
+    _assert_same(_results(USER_ID), expected)
+
+def test_restoring_archived_ids_keeps_every_result(archive_days):
+    expected = _results(USER_ID)
+    live, _, _ = _stored(USER_ID)
+    archive_days(180)
+    archive_transactions()
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    archived = sorted(set(expected['ids']) - {row[0] for row in cursor.execute(
+        'SELECT id FROM transactions WHERE user_id = ?', (USER_ID,))})
+
+    # As API batch updates do: a few rows back, then the rest
+    for ids in (archived[:3], archived[3:]):
+        cursor.execute('BEGIN')
+        assert restore_ids(cursor, USER_ID, ids) == set(ids)
+        cursor.execute('COMMIT')
+        _assert_same(_results(USER_ID), expected)
+    conn.close()
+    assert _stored(USER_ID) == (live, 0, 0)
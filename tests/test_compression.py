@@ -0,0 +1,37 @@
+"""CompressionMiddleware: text responses are gzip-encoded, everything else passes through."""
+import gzip
+
+import pytest
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+def test_cash_flow_is_gzipped_and_decodes_to_the_plain_page(client):
+    plain = client.get('/financial/cash-flow')
+    encoded = client.get('/financial/cash-flow', headers=GZIP)
+
+    assert plain.status_code == encoded.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in encoded.headers.getlist('Vary')
+    assert int(encoded.headers['Content-Length']) == len(encoded.data)
+    assert gzip.decompress(encoded.data) == plain.data
+    # The ledger is repetitive HTML; it should shrink several times over
+    assert len(encoded.data) * 4 < len(plain.data)
+
+def test_pdf_export_passes_through(client):
+    response = client.get('/reports/export-pdf', headers=GZIP)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.startswith(b'%PDF')
+
+@pytest.mark.parametrize('path', ['/pagina-que-nao-existe', '/financial/cash-flow'])
+def test_non_200_responses_pass_through(app, path, monkeypatch):
+    # Error pages are small; lift the size floor so only the status keeps them plain
+    monkeypatch.setattr(app.wsgi_app, 'minimum_size', 0)
+    response = app.test_client().get(path, headers=GZIP)
+
+    assert response.status_code in (302, 404)
+    assert 'Content-Encoding' not in response.headers
+    assert response.mimetype == 'text/html'
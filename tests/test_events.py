@@ -0,0 +1,43 @@
+"""Change events: transition events fire once, on the transition only."""
+from datetime import date
+
+import pytest
+
+from events import broker
+
+@pytest.fixture
+def events(user_id):
+    """Names of the events published to user_id during the test"""
+    subscription = broker.subscribe(user_id)
+    names = []
+
+    def drain():
+        while (event := subscription.get(timeout=0)) is not None:
+            names.append(event['event'])
+        return names
+    yield drain
+    broker.unsubscribe(subscription)
+
+def test_goal_completed_only_on_completion(user_id, events):
+    from database import FinancialGoal
+    goal = FinancialGoal(user_id=user_id, title='Reserva', target_amount=100.0).save()
+    goal.current_amount, goal.is_completed = 100.0, True
+    goal.save()
+    goal.title = 'Reserva de emergência'
+    goal.save()
+    goal.is_completed = False
+    goal.save()
+    goal.is_completed = True
+    goal.save()
+    assert events() == ['goal.updated', 'goal.completed', 'goal.updated', 'goal.updated', 'goal.completed']
+    goal.delete()
+
+def test_account_paid_only_on_payment(user_id, events):
+    from database import Account
+    account = Account(user_id=user_id, name='Boleto teste', account_type='payable', amount=50.0,
+                      due_date=date.today()).save()
+    account.status = 'paid'
+    account.save()
+    account.name = 'Boleto pago'
+    account.save()
+    assert events() == ['account.saved', 'account.paid', 'account.saved']
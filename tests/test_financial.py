@@ -0,0 +1,24 @@
+from database import Transaction
+
+LEDGER_ROW = '<tr class="hover:bg-gray-50">'
+
+def test_add_transaction_renders_the_same_ledger_as_cash_flow(client, user_id):
+    transactions = Transaction.get_by_user_id(user_id)
+    assert transactions
+
+    cash_flow = client.get('/financial/cash-flow')
+    add_transaction = client.get('/financial/add-transaction')
+
+    assert cash_flow.status_code == 200
+    assert add_transaction.status_code == 200
+    cash_flow_html = cash_flow.get_data(as_text=True)
+    add_transaction_html = add_transaction.get_data(as_text=True)
+    assert cash_flow_html.count(LEDGER_ROW) == len(transactions)
+    assert add_transaction_html.count(LEDGER_ROW) == len(transactions)
+    assert transactions[0].description in add_transaction_html
+
+def test_invalid_add_transaction_keeps_the_ledger(client, user_id):
+    response = client.post('/financial/add-transaction', data={'description': ''})
+
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).count(LEDGER_ROW) == Transaction.count_by_user_id(user_id)
@@ -0,0 +1,34 @@
+"""Periodic maintenance jobs: opt-in per process, never started by importing the app."""
+import threading
+from datetime import datetime, timedelta
+
+from conftest import USER_IDS
+
+def _job_threads():
+    return {thread.name for thread in threading.enumerate()} - {'MainThread'}
+
+def test_importing_and_serving_starts_no_jobs(client):
+    client.get('/dashboard/')
+    assert not _job_threads() & {'subscription-sweeper', 'account-alert-scanner', 'change-log-pruner',
+                                 'transaction-archiver', 'fragment-cache-pruner'}
+
+def test_job_run_is_claimed_once_per_interval(app):
+    from jobs import claim_job_run
+    # Two processes waking in the same interval: only the first runs the job
+    assert claim_job_run('scan_account_alerts_test', 300, now=1_000_000)
+    assert not claim_job_run('scan_account_alerts_test', 300, now=1_000_005)
+    assert not claim_job_run('scan_account_alerts_test', 300, now=1_000_299)
+    assert claim_job_run('scan_account_alerts_test', 300, now=1_000_300)
+
+def test_sweep_expires_lapsed_subscriptions(app):
+    from database import db_manager, User, to_epoch
+    from jobs import sweep_subscriptions, sweep_stats
+    conn = db_manager.get_connection()
+    conn.execute("UPDATE users SET subscription_plan = 'professional', subscription_status = 'active', "
+                 "subscription_end_ts = ? WHERE id = ?", (to_epoch(datetime.utcnow() - timedelta(days=1)), USER_IDS[2]))
+    conn.commit()
+    conn.close()
+    runs = sweep_stats['runs']
+    assert sweep_subscriptions() >= 1
+    assert sweep_stats['runs'] == runs + 1
+    assert User.get_by_id(USER_IDS[2]).subscription_status == 'expired'
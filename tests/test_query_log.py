@@ -0,0 +1,35 @@
+"""assert_max_queries: counts a block's statements and leaves tracing as it found it."""
+import pytest
+
+from database import db_manager, User
+from query_log import assert_max_queries, _record_query
+
+@pytest.fixture
+def untraced(app):
+    """Query tracing off, as with QUERY_LOG=0"""
+    enabled = _record_query in db_manager.query_listeners
+    db_manager.remove_query_listener(_record_query)
+    yield
+    if enabled:
+        db_manager.add_query_listener(_record_query)
+
+def test_block_counts_statements_and_removes_its_listener(untraced, user_id):
+    listeners = list(db_manager.query_listeners)
+    with assert_max_queries(1) as stats:
+        User.get_by_id(user_id)
+    assert stats.count == 1
+    assert db_manager.query_listeners == listeners
+
+def test_block_over_budget_fails_and_removes_its_listener(untraced, user_id):
+    listeners = list(db_manager.query_listeners)
+    with pytest.raises(AssertionError, match='2 queries executed, expected at most 1'):
+        with assert_max_queries(1):
+            User.get_by_id(user_id)
+            User.get_by_id(user_id)
+    assert db_manager.query_listeners == listeners
+
+def test_block_keeps_the_request_log_listener(app, user_id):
+    assert _record_query in db_manager.query_listeners
+    with assert_max_queries(1):
+        User.get_by_id(user_id)
+    assert _record_query in db_manager.query_listeners
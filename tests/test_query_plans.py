@@ -0,0 +1,35 @@
+"""EXPLAIN QUERY PLAN regressions: no statement the app issues may scan a large table
+without an ALLOWED_SCANS entry (query_plans.py)."""
+import pytest
+
+import database
+from archive import archive_transactions
+from check_query_plans import ARCHIVE_DAYS, collect_statements, server_errors
+from conftest import USER_IDS
+from query_plans import check_statements, transaction_query_statements
+
+def _report(failures):
+    return '\n'.join(f"{origin}: {' '.join(sql.split())}\n  " + '\n  '.join(violations)
+                     for origin, sql, violations in failures)
+
+def test_transaction_query_plans_use_an_index(app):
+    failures = check_statements(transaction_query_statements())
+    assert not failures, _report(failures)
+
+@pytest.fixture
+def archiving(app, monkeypatch):
+    """Archiving on for the test; archived rows are restored afterwards"""
+    monkeypatch.setattr(database, 'TRANSACTION_ARCHIVE_DAYS', ARCHIVE_DAYS)
+    # A page that errors answers 500 as in production; the test then fails on its status
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', False)
+    yield
+    monkeypatch.undo()
+    archive_transactions()
+
+def test_app_statement_plans_use_an_index(app, archiving):
+    # Its own tenant: driving every route edits records and changes the plan
+    statements, statuses = collect_statements(app, USER_IDS[1])
+    assert len(statements) > 50
+    assert not server_errors(statuses)
+    failures = check_statements(statements + transaction_query_statements())
+    assert not failures, _report(failures)
@@ -0,0 +1,95 @@
+"""LocalReplica: change_log catch-up, deletes, mismatch fallback and catch_up=False."""
+import pytest
+
+import replica as replica_module
+from conftest import USER_IDS
+from database import db_manager, FinancialGoal
+from replica import LocalReplica
+
+# Its own tenant: rows written here stay out of the other tests' ledgers
+USER_ID = USER_IDS[4]
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    """Replica of the test database holding USER_ID, caught up only when the test says so"""
+    replica = LocalReplica(str(tmp_path / 'replica.db'))
+    monkeypatch.setattr(db_manager, 'replica', replica)
+    monkeypatch.setattr(replica_module, 'REPLICA_CHECK_INTERVAL', 3600)
+    replica.hydrate(USER_ID)
+    return replica
+
+def _remote(sql, params=()):
+    """Write on the primary around the models, as another process or host would"""
+    conn = db_manager.get_connection()
+    cursor = conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+def _local_ids(replica, table):
+    conn = replica.db.get_connection()
+    ids = {row[0] for row in conn.execute(f'SELECT id FROM {table} WHERE user_id = ?', (USER_ID,))}
+    conn.close()
+    return ids
+
+def _interval_elapsed(monkeypatch):
+    monkeypatch.setattr(replica_module, 'REPLICA_CHECK_INTERVAL', 0)
+
+def test_hydrate_copies_the_users_rows(replica):
+    conn = db_manager.get_connection()
+    remote = {row[0] for row in conn.execute('SELECT id FROM transactions WHERE user_id = ?', (USER_ID,))}
+    conn.close()
+    assert remote and _local_ids(replica, 'transactions') == remote
+
+def test_write_from_another_process_shows_up_after_the_check_interval(replica, monkeypatch):
+    row_id = _remote("INSERT INTO transactions (user_id, description, amount, transaction_type, date_ts) "
+                     "VALUES (?, 'Pix de outro servidor', 25, 'income', 1700000000)", (USER_ID,))
+    assert replica.connect_for(USER_ID) is not None
+    assert row_id not in _local_ids(replica, 'transactions')
+
+    _interval_elapsed(monkeypatch)
+    assert replica.connect_for(USER_ID) is not None
+    assert row_id in _local_ids(replica, 'transactions')
+    assert replica.stats['syncs'] == 1
+
+def test_deleted_row_disappears_from_the_replica(replica, monkeypatch):
+    goal = FinancialGoal(user_id=USER_ID, title='Vitrine', target_amount=600.0).save()
+    # Model saves write through without waiting for the interval
+    assert goal.id in _local_ids(replica, 'financial_goals')
+
+    _remote('DELETE FROM financial_goals WHERE id = ?', (goal.id,))
+    _interval_elapsed(monkeypatch)
+    replica.connect_for(USER_ID)
+    assert goal.id not in _local_ids(replica, 'financial_goals')
+    assert FinancialGoal.get_by_id(goal.id, USER_ID) is None
+
+def test_count_mismatch_drops_the_copy_and_reads_remotely(replica, monkeypatch):
+    # A row the remote never had: the catch-up's count check cannot match
+    conn = replica.db.get_connection()
+    conn.execute("INSERT INTO transactions (user_id, description, amount, transaction_type, date_ts) "
+                 "VALUES (?, 'Fantasma', 1, 'income', 1700000000)", (USER_ID,))
+    conn.commit()
+    conn.close()
+
+    _interval_elapsed(monkeypatch)
+    assert replica.connect_for(USER_ID) is None
+    assert replica.stats['mismatches'] == 1
+    assert replica._state(USER_ID) is None
+    assert _local_ids(replica, 'transactions') == set()
+
+    # The next read rebuilds the copy from the remote
+    assert replica.connect_for(USER_ID) is not None
+    assert replica.stats['hydrations'] == 2
+
+def test_catch_up_false_serves_the_copy_as_is(replica, monkeypatch):
+    row_id = _remote("INSERT INTO transactions (user_id, description, amount, transaction_type, date_ts) "
+                     "VALUES (?, 'Venda remota', 40, 'income', 1700000000)", (USER_ID,))
+    _interval_elapsed(monkeypatch)
+    assert replica.connect_for(USER_ID, catch_up=False) is not None
+    assert row_id not in _local_ids(replica, 'transactions')
+    assert replica.stats['syncs'] == 0
+
+    # Without a copy there is nothing to serve: the caller reads remotely
+    replica.drop(USER_ID)
+    assert replica.connect_for(USER_ID, catch_up=False) is None
+    assert replica.stats['hydrations'] == 1
@@ -0,0 +1,44 @@
+"""Schema creation: integer date columns on new databases, backfilled on old ones."""
+import logging
+import sqlite3
+
+from database import Database
+
+LEGACY_COLUMNS = {'users': {'created_at', 'trial_start_date', 'trial_end_date', 'subscription_end_date'},
+                  'transactions': {'date', 'created_at'},
+                  'accounts': {'due_date', 'created_at'},
+                  'financial_goals': {'target_date', 'created_at'}}
+
+def _columns(path, table):
+    conn = sqlite3.connect(path)
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    conn.close()
+    return columns
+
+def test_new_database_declares_integer_date_columns(tmp_path, caplog):
+    path = str(tmp_path / 'new.db')
+    with caplog.at_level(logging.INFO):
+        Database(path)
+    for table, column, _ in Database.DATE_COLUMNS:
+        assert column in _columns(path, table)
+    for table, legacy in LEGACY_COLUMNS.items():
+        assert not legacy & _columns(path, table)
+    assert 'Added and backfilled' not in caplog.text
+
+def test_old_database_is_backfilled(tmp_path, caplog):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+                 'description TEXT NOT NULL, amount REAL NOT NULL, transaction_type TEXT NOT NULL, category TEXT, '
+                 'date TEXT DEFAULT CURRENT_TIMESTAMP, created_at TEXT DEFAULT CURRENT_TIMESTAMP, '
+                 'is_recurring INTEGER DEFAULT 0, recurrence_type TEXT, account_id INTEGER)')
+    conn.execute("INSERT INTO transactions (user_id, description, amount, transaction_type, date, created_at) "
+                 "VALUES (1, 'Venda', 10, 'income', '2024-03-01T12:00:00', '2024-03-02 08:00:00')")
+    conn.commit()
+    conn.close()
+    with caplog.at_level(logging.INFO):
+        Database(path)
+    assert 'Added and backfilled transactions.date_ts' in caplog.text
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT date_ts, created_ts FROM transactions').fetchone() == (1709294400, 1709366400)
+    conn.close()
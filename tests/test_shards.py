@@ -0,0 +1,123 @@
+"""Online shard moves, and per-user lookups routed through the shard directory."""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import archive
+import database
+import shards
+from database import Database, User, Transaction, Account, FinancialGoal
+
+@pytest.fixture
+def manager(app, tmp_path, monkeypatch):
+    """A directory database with two local shards in place of the test database"""
+    manager = Database(str(tmp_path / 'directory.db'), shards=[str(tmp_path / f'shard{index}.db') for index in range(2)])
+    for module in (database, shards, archive):
+        monkeypatch.setattr(module, 'db_manager', manager)
+    return manager
+
+def _tenant(manager, number):
+    user = User.create(f'loja{number}', f'loja{number}@example.com', 'senha123', f'Loja {number}')
+    Transaction(user_id=user.id, description='Venda balcão', amount=120.0, transaction_type='income',
+                category='vendas').save()
+    Transaction(user_id=user.id, description='Energia elétrica', amount=80.0, transaction_type='expense',
+                category='despesas_gerais').save()
+    account = Account(user_id=user.id, name='Boleto 1', account_type='payable', amount=300.0,
+                      due_date=date.today() + timedelta(days=3)).save()
+    goal = FinancialGoal(user_id=user.id, title='Reserva', target_amount=1000.0).save()
+    return user, account, goal
+
+def _ids(shard, table, user_id):
+    conn = shard.get_connection()
+    ids = {row[0] for row in conn.execute(f'SELECT id FROM {table} WHERE user_id = ?', (user_id,))}
+    conn.close()
+    return ids
+
+def _on_both_shards(manager):
+    """A tenant on each shard"""
+    tenants = {}
+    number = 0
+    while len(tenants) < 2:
+        user, account, goal = _tenant(manager, number)
+        tenants.setdefault(manager.shard_of(user.id), (user, account, goal))
+        number += 1
+    return tenants[0], tenants[1]
+
+def test_get_by_id_reads_the_users_shard(manager):
+    first, second = _on_both_shards(manager)
+    for user, account, goal in (first, second):
+        assert Account.get_by_id(account.id, user.id).name == 'Boleto 1'
+        assert FinancialGoal.get_by_id(goal.id, user.id).title == 'Reserva'
+    # Another user's id finds nothing, even on the shard holding the row
+    assert Account.get_by_id(second[1].id, first[0].id) is None
+    assert FinancialGoal.get_by_id(first[2].id, second[0].id) is None
+    with pytest.raises(TypeError):
+        Account.get_by_id(first[1].id)
+
+def test_move_copies_rows_and_archive_then_deletes_the_source(manager, monkeypatch):
+    user, account, goal = _tenant(manager, 0)
+    Transaction(user_id=user.id, description='Venda antiga', amount=55.0, transaction_type='income',
+                category='vendas', date=datetime.utcnow() - timedelta(days=400)).save()
+    monkeypatch.setattr(database, 'TRANSACTION_ARCHIVE_DAYS', 180)
+    archive.archive_transactions()
+    source = manager.shard_of(user.id)
+    source_db, destination_db = manager.shards[source], manager.shards[1 - source]
+    archive_table = Transaction.archive_table((datetime.utcnow() - timedelta(days=400)).year)
+    live = _ids(source_db, 'transactions', user.id)
+    archived = _ids(source_db, archive_table, user.id)
+    count = Transaction.count_by_user_id(user.id)
+    assert len(archived) == 1 and count == 3
+
+    assert shards.move_users([(user.id, 1 - source)], settle=0) == {user.id: 5}
+
+    assert manager.shard_of(user.id, cached=False) == 1 - source
+    assert _ids(destination_db, 'transactions', user.id) == live
+    assert _ids(destination_db, archive_table, user.id) == archived
+    conn = destination_db.get_connection()
+    assert conn.execute('SELECT SUM(count) FROM transaction_rollups WHERE user_id = ?', (user.id,)).fetchone() == (1,)
+    conn.close()
+    for table in ('users', 'transactions', 'accounts', 'financial_goals', 'transaction_rollups', archive_table):
+        column = 'id' if table == 'users' else 'user_id'
+        conn = source_db.get_connection()
+        assert conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {column} = ?', (user.id,)).fetchone()[0] == 0
+        conn.close()
+    # Reads follow the directory, rows keep their ids
+    assert User.get_by_id(user.id).username == 'loja0'
+    assert Transaction.count_by_user_id(user.id) == count
+    assert Account.get_by_id(account.id, user.id).name == 'Boleto 1'
+    assert FinancialGoal.get_by_id(goal.id, user.id).title == 'Reserva'
+
+def test_writes_during_the_move_are_replayed(manager, monkeypatch):
+    user, account, goal = _tenant(manager, 0)
+    source = manager.shard_of(user.id)
+    source_db, destination_db = manager.shards[source], manager.shards[1 - source]
+    removed = min(_ids(source_db, 'transactions', user.id))
+
+    # While the rows are being copied, the app keeps writing to the source
+    copy_archive = shards._copy_archive
+    def copy_while_writing(source_cursor, destination_cursor, user_id):
+        conn = source_db.get_connection()
+        conn.execute("INSERT INTO transactions (user_id, description, amount, transaction_type, date_ts) "
+                     "VALUES (?, 'Venda durante a cópia', 10, 'income', 1700000000)", (user_id,))
+        conn.execute('DELETE FROM transactions WHERE id = ?', (removed,))
+        conn.commit()
+        conn.close()
+        monkeypatch.setattr(shards, '_copy_archive', copy_archive)
+        return copy_archive(source_cursor, destination_cursor, user_id)
+    monkeypatch.setattr(shards, '_copy_archive', copy_while_writing)
+
+    state = shards._start_move(user.id, 1 - source)
+    # A process with the old placement cached still writes to the source before it settles
+    conn = source_db.get_connection()
+    late = conn.execute("INSERT INTO transactions (user_id, description, amount, transaction_type, date_ts) "
+                        "VALUES (?, 'Venda após a troca', 20, 'income', 1700000000)", (user.id,)).lastrowid
+    conn.execute("UPDATE financial_goals SET current_amount = 250 WHERE id = ?", (goal.id,))
+    conn.commit()
+    conn.close()
+    shards._finish_move(*state)
+
+    moved = _ids(destination_db, 'transactions', user.id)
+    assert removed not in moved and late in moved
+    assert len(moved) == 3
+    assert FinancialGoal.get_by_id(goal.id, user.id).current_amount == 250.0
+    assert _ids(source_db, 'transactions', user.id) == set()
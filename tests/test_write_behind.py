@@ -0,0 +1,126 @@
+"""WriteBehind durability: exactly-once replay, ordering, id blocks, read-your-writes."""
+import sqlite3
+
+import pytest
+
+import write_behind as write_behind_module
+from conftest import USER_IDS
+from database import db_manager, FinancialGoal, Transaction
+from write_behind import WriteBehind
+
+# Its own tenant: rows written here stay out of the other tests' ledgers
+USER_ID = USER_IDS[3]
+
+@pytest.fixture
+def journal(app, tmp_path, monkeypatch):
+    """Write-behind journal over the test database, flushed only when the test calls flush()"""
+    journal = WriteBehind(str(tmp_path / 'journal.db'))
+    monkeypatch.setattr(journal, '_ensure_worker', lambda: None)
+    monkeypatch.setattr(db_manager, 'write_behind', journal)
+    return journal
+
+def _remote(sql, params=()):
+    conn = db_manager.get_connection()
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+def _set_remote(sql, params):
+    conn = db_manager.get_connection()
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+def _journaled(journal):
+    conn = sqlite3.connect(journal.path)
+    count = conn.execute('SELECT COUNT(*) FROM journal').fetchone()[0]
+    conn.close()
+    return count
+
+def test_failure_after_remote_commit_is_not_applied_twice(journal, monkeypatch):
+    goal = FinancialGoal(user_id=USER_ID, title='Capital de giro', target_amount=1000.0).save()
+    goal.current_amount = 100.0
+    goal.save()
+
+    # The remote COMMIT lands, then the flusher fails before trimming the journal
+    apply = journal._apply
+
+    def apply_then_fail(shard, entries):
+        apply(shard, entries)
+        raise ConnectionError('connection lost after COMMIT')
+    monkeypatch.setattr(journal, '_apply', apply_then_fail)
+    with pytest.raises(ConnectionError):
+        journal.flush()
+    assert _journaled(journal) == 2
+
+    # Another writer changes the row before the retry; replaying would undo that
+    _set_remote('UPDATE financial_goals SET current_amount = 500 WHERE id = ?', (goal.id,))
+    monkeypatch.setattr(journal, '_apply', apply)
+    assert journal.flush() == 0
+    assert _journaled(journal) == 0
+    assert _remote('SELECT current_amount FROM financial_goals WHERE id = ?', (goal.id,)) == [(500.0,)]
+
+def test_restarted_process_recovers_from_write_behind_applied(journal, monkeypatch):
+    goal = FinancialGoal(user_id=USER_ID, title='Reforma', target_amount=300.0).save()
+    # The process dies between the remote COMMIT and the journal DELETE
+    conn = sqlite3.connect(journal.path)
+    entries = conn.execute('SELECT seq, user_id, table_name, op, row_id, row FROM journal ORDER BY seq').fetchall()
+    conn.close()
+    journal._apply(db_manager.for_user(USER_ID), entries)
+    _set_remote('UPDATE financial_goals SET title = ? WHERE id = ?', ('Reforma da loja', goal.id))
+
+    restarted = WriteBehind(journal.path)
+    assert restarted.journal_id == journal.journal_id
+    assert restarted.flush() == 0
+    assert _journaled(restarted) == 0
+    assert _remote('SELECT title FROM financial_goals WHERE id = ?', (goal.id,)) == [('Reforma da loja',)]
+
+def test_insert_update_delete_land_in_order(journal, monkeypatch):
+    # Two entries per remote transaction, so the sequence spans several batches
+    monkeypatch.setattr(write_behind_module, 'WRITE_BEHIND_BATCH', 2)
+    deleted = FinancialGoal(user_id=USER_ID, title='Temporária', target_amount=10.0).save()
+    deleted.title = 'Temporária (editada)'
+    deleted.save()
+    deleted.delete()
+    kept = FinancialGoal(user_id=USER_ID, title='Equipamento', target_amount=800.0).save()
+    kept.current_amount = 50.0
+    kept.save()
+    kept.current_amount = 75.0
+    kept.save()
+
+    assert journal.flush() == 6
+    assert journal.stats['batches'] == 3
+    assert _remote('SELECT id FROM financial_goals WHERE id = ?', (deleted.id,)) == []
+    assert _remote('SELECT current_amount FROM financial_goals WHERE id = ?', (kept.id,)) == [(75.0,)]
+
+def test_new_rows_take_ids_from_a_reserved_block(journal, monkeypatch):
+    monkeypatch.setattr(write_behind_module, 'WRITE_BEHIND_ID_BLOCK', 3)
+    highest = _remote('SELECT MAX(id) FROM transactions')[0][0]
+    ids = [Transaction(user_id=USER_ID, description=f'Venda {number}', amount=10.0,
+                       transaction_type='income', category='vendas').save().id for number in range(4)]
+    # Two blocks of three reserved remotely; ids are known before anything is flushed
+    assert ids == list(range(ids[0], ids[0] + 4))
+    assert ids[0] > highest
+    assert _remote("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'") == [(ids[0] + 5,)]
+
+    assert journal.flush() == 4
+    monkeypatch.setattr(db_manager, 'write_behind', None)
+    direct = Transaction(user_id=USER_ID, description='Venda direta', amount=10.0,
+                         transaction_type='income', category='vendas').save()
+    assert direct.id > ids[0] + 5
+
+def test_writer_reads_its_own_journaled_row(app, tmp_path, monkeypatch):
+    journal = WriteBehind(str(tmp_path / 'journal.db'))
+    monkeypatch.setattr(db_manager, 'write_behind', journal)
+    # A long group-commit window keeps the row journaled until the read asks for it
+    monkeypatch.setattr(write_behind_module, 'WRITE_BEHIND_WINDOW_MS', 300)
+
+    goal = FinancialGoal(user_id=USER_ID, title='Estoque', target_amount=2000.0).save()
+    assert journal.has_pending(USER_ID)
+    assert _remote('SELECT id FROM financial_goals WHERE id = ?', (goal.id,)) == []
+
+    found = FinancialGoal.get_by_id(goal.id, USER_ID)
+    assert found is not None and found.title == 'Estoque'
+    assert journal.stats['read_waits'] == 1
+    assert not journal.has_pending(USER_ID)
+    assert journal.wait_for(USER_ID, timeout=0)
@@ -1,4 +1,5 @@
-from datetime import datetime
+from bisect import bisect_right
+from datetime import datetime, timedelta
 from functools import wraps
 from flask import redirect, url_for, flash
 from flask_login import current_user
@@ -18,9 +19,19 @@ def subscription_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Swaps the en-US separators produced by ',.2f' for Brazilian ones
+_CURRENCY_SEPARATORS = str.maketrans(',.', '.,')
+
 def format_currency(value):
     """Format value as Brazilian currency"""
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {value:,.2f}".translate(_CURRENCY_SEPARATORS)
+
+def format_currency_many(values):
+    """Format a list of values as Brazilian currency with a single translate pass"""
+    if not values:
+        return []
+    joined = '\n'.join([f"R$ {value:,.2f}" for value in values])
+    return joined.translate(_CURRENCY_SEPARATORS).split('\n')
 
 def calculate_days_remaining(end_date):
     """Calculate days remaining until end_date"""
@@ -33,9 +44,11 @@ def get_trial_days_remaining(user):
     """Get remaining trial days for user"""
     return calculate_days_remaining(user.trial_end_date)
 
+_BRASILIA_TZ = pytz.timezone('America/Sao_Paulo')
+
 def get_brasilia_timezone():
     """Get Brasilia timezone"""
-    return pytz.timezone('America/Sao_Paulo')
+    return _BRASILIA_TZ
 
 def now_brasilia():
     """Get current datetime in Brasilia timezone"""
@@ -76,3 +89,74 @@ def brasilia_to_utc(brasilia_dt):
     if brasilia_dt.tzinfo is None:
         brasilia_dt = brasilia_tz.localize(brasilia_dt)
     return brasilia_dt.astimezone(pytz.utc).replace(tzinfo=None)
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _offset_table(tz):
+    """UTC transition instants (epoch seconds) of a pytz zone with the
+    offset (seconds) and tzinfo in force from each one on"""
+    transitions = getattr(tz, '_utc_transition_times', None)
+    if not transitions:
+        offset = int(tz.utcoffset(_EPOCH).total_seconds())
+        return [], [offset], [tz]
+    epochs = [(moment - _EPOCH) // timedelta(seconds=1) for moment in transitions]
+    offsets = [int(info[0].total_seconds()) for info in tz._transition_info]
+    zones = [tz._tzinfos[info] for info in tz._transition_info]
+    return epochs, offsets, zones
+
+_BRASILIA_TRANSITIONS, _BRASILIA_OFFSETS, _BRASILIA_ZONES = _offset_table(_BRASILIA_TZ)
+
+def brasilia_offset_table():
+    """(UTC transition instants in epoch seconds, offset in seconds from each one on)
+    for converting many instants at once, e.g. with numpy.searchsorted"""
+    return _BRASILIA_TRANSITIONS, _BRASILIA_OFFSETS
+
+def _as_epoch(value):
+    """Epoch seconds for a naive UTC datetime, epoch int or stored string"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = utc_to_brasilia(value)
+        if value is None:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(pytz.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(seconds=1)
+
+def _transition_index(epoch):
+    return max(0, bisect_right(_BRASILIA_TRANSITIONS, epoch) - 1)
+
+def utc_to_brasilia_many(values):
+    """Convert a list of UTC datetimes/epoch seconds to Brasilia datetimes.
+    
+    Same result as utc_to_brasilia per item, but offsets come from a
+    precomputed transition table instead of a pytz lookup per value."""
+    converted = []
+    for value in values:
+        epoch = _as_epoch(value)
+        if epoch is None:
+            converted.append(None)
+            continue
+        index = _transition_index(epoch)
+        local = _EPOCH + timedelta(seconds=epoch + _BRASILIA_OFFSETS[index])
+        converted.append(local.replace(tzinfo=_BRASILIA_ZONES[index]))
+    return converted
+
+def format_brasilia_dates(values, fmt='%d/%m/%Y', default='-'):
+    """Format a list of UTC datetimes/epoch seconds as Brasilia calendar dates.
+    
+    fmt must only use date directives: each distinct local day is formatted
+    once, so a ledger pays for strftime per day rather than per row."""
+    formatted = []
+    by_day = {}
+    for value in values:
+        epoch = _as_epoch(value)
+        if epoch is None:
+            formatted.append(default)
+            continue
+        day = (epoch + _BRASILIA_OFFSETS[_transition_index(epoch)]) // 86400
+        label = by_day.get(day)
+        if label is None:
+            label = by_day[day] = (_EPOCH + timedelta(days=day)).strftime(fmt)
+        formatted.append(label)
+    return formatted
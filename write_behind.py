@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import logging
+import sqlite3
+import itertools
+import threading
+from database import db_manager, Transaction, Account, FinancialGoal, AccountAlert
+
+# Local SQLite journal taking model saves; unset keeps saves synchronous
+WRITE_BEHIND_JOURNAL = os.environ.get('WRITE_BEHIND_JOURNAL')
+
+# How long (in milliseconds) the flusher waits after a write for more to join its group
+WRITE_BEHIND_WINDOW_MS = int(os.environ.get('WRITE_BEHIND_WINDOW_MS', 20))
+
+# Most journal entries flushed in one remote transaction
+WRITE_BEHIND_BATCH = int(os.environ.get('WRITE_BEHIND_BATCH', 500))
+
+# Row ids reserved from the remote sequence at a time for rows created in the journal
+WRITE_BEHIND_ID_BLOCK = int(os.environ.get('WRITE_BEHIND_ID_BLOCK', 1000))
+
+# Seconds a read waits for the reader's own journaled writes to be flushed
+WRITE_BEHIND_READ_TIMEOUT = float(os.environ.get('WRITE_BEHIND_READ_TIMEOUT', 5))
+
+# Seconds between journal checks when idle (picks up entries from other processes)
+WRITE_BEHIND_POLL_INTERVAL = float(os.environ.get('WRITE_BEHIND_POLL_INTERVAL', 0.2))
+
+MODELS = {model.TABLE: model for model in (Transaction, Account, FinancialGoal)}
+
+def _update_sql(model):
+    """UPDATE of a _to_row() tuple (id last); unlike an upsert it never recreates a deleted row"""
+    columns = [column.strip() for column in model.COLUMNS.split(',')]
+    assignments = ', '.join(f'{column} = ?' for column in columns if column != 'id')
+    return f'UPDATE {model.TABLE} SET {assignments} WHERE id = ?'
+
+class WriteBehind:
+    """Durable write-behind journal for Transaction, Account and FinancialGoal writes.
+
+    save() and delete() append to a local SQLite journal and return as soon as
+    the entry is on disk; new rows get their id from a block reserved in the
+    remote sqlite_sequence, so callers see it immediately. A background thread
+    flushes the journal in seq order, up to WRITE_BEHIND_BATCH entries per
+    remote transaction, and each transaction also records the last seq it
+    applied in write_behind_applied. After a crash the journal is trimmed to
+    that seq and the rest replayed, so every entry is applied exactly once.
+
+    Several processes may share one journal file; a file lock lets one of them
+    flush at a time. Reads of a user with journaled writes either come from the
+    local replica (which already holds them) or wait for the flush, see
+    Database.get_read_connection."""
+
+    def __init__(self, path, primary=db_manager):
+        self.path = path
+        self.primary = primary
+        self._wake = threading.Event()
+        self._worker_pid = None
+        self._worker_lock = threading.Lock()
+        self._recovered = False
+        self.stats = {'appended': 0, 'flushed': 0, 'batches': 0, 'failures': 0, 'read_waits': 0}
+
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                table_name TEXT NOT NULL,
+                op TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                row TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_journal_user ON journal (user_id);
+            CREATE TABLE IF NOT EXISTS id_blocks (
+                table_name TEXT PRIMARY KEY,
+                next_id INTEGER NOT NULL,
+                end_id INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS journal_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+        conn.execute("INSERT OR IGNORE INTO journal_meta (key, value) VALUES ('journal_id', ?)", (uuid.uuid4().hex,))
+        self.journal_id = conn.execute("SELECT value FROM journal_meta WHERE key = 'journal_id'").fetchone()[0]
+        conn.close()
+
+        for shard in primary.all_shards():
+            remote = shard.get_connection()
+            remote.execute('''
+                CREATE TABLE IF NOT EXISTS write_behind_applied (
+                    journal TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL
+                )
+            ''')
+            try:
+                remote.commit()
+            except Exception as e:
+                # SQLite Cloud auto-commit behavior - this is expected
+                pass
+            remote.close()
+
+        atexit.register(self._flush_at_exit)
+
+    def _connect(self):
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=FULL')
+        return conn
+
+    def save(self, obj):
+        """Journal an insert or update of a model instance, assigning its id if new"""
+        model = type(obj)
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            op = 'update'
+            if not obj.id:
+                obj.id = self._allocate_id(conn, model, obj.user_id)
+                op = 'insert'
+            conn.execute('INSERT INTO journal (user_id, table_name, op, row_id, row) VALUES (?, ?, ?, ?, ?)',
+                         (obj.user_id, model.TABLE, op, obj.id, json.dumps(obj._to_row())))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        self._appended()
+
+    def delete(self, obj):
+        """Journal the delete of a model instance"""
+        conn = self._connect()
+        conn.execute('INSERT INTO journal (user_id, table_name, op, row_id) VALUES (?, ?, ?, ?)',
+                     (obj.user_id, type(obj).TABLE, 'delete', obj.id))
+        conn.close()
+        self._appended()
+
+    def _appended(self):
+        self.stats['appended'] += 1
+        self._ensure_worker()
+        self._wake.set()
+
+    def _allocate_id(self, conn, model, user_id):
+        """Next id from the journal's reserved block, reserving a new block when it runs out
+        (ids are unique across shards, so a block serves users on any shard)"""
+        row = conn.execute('SELECT next_id, end_id FROM id_blocks WHERE table_name = ?', (model.TABLE,)).fetchone()
+        if row is None or row[0] > row[1]:
+            row = self._reserve_block(model.TABLE, user_id)
+        next_id, end_id = row
+        conn.execute('INSERT OR REPLACE INTO id_blocks (table_name, next_id, end_id) VALUES (?, ?, ?)',
+                     (model.TABLE, next_id + 1, end_id))
+        return next_id
+
+    def _reserve_block(self, table, user_id):
+        """Advance the remote AUTOINCREMENT sequence past a block of ids; returns (first, last)"""
+        remote = self.primary.for_user(user_id).get_connection()
+        cursor = remote.cursor()
+        cursor.execute(f'''
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT ?, COALESCE((SELECT MAX(id) FROM {table}), 0)
+            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+        ''', (table, table))
+        cursor.execute('UPDATE sqlite_sequence SET seq = seq + ? WHERE name = ? RETURNING seq',
+                       (WRITE_BEHIND_ID_BLOCK, table))
+        end_id = cursor.fetchone()[0]
+        try:
+            remote.commit()
+        except Exception as e:
+            # SQLite Cloud auto-commit behavior - this is expected
+            pass
+        remote.close()
+        return end_id - WRITE_BEHIND_ID_BLOCK + 1, end_id
+
+    def has_pending(self, user_id):
+        """Whether the user has journaled writes not yet flushed"""
+        conn = self._connect()
+        row = conn.execute('SELECT 1 FROM journal WHERE user_id = ? LIMIT 1', (user_id,)).fetchone()
+        conn.close()
+        return row is not None
+
+    def wait_for(self, user_id, timeout=None):
+        """Block until the user's journaled writes are flushed; False on timeout"""
+        deadline = time.monotonic() + (WRITE_BEHIND_READ_TIMEOUT if timeout is None else timeout)
+        self.stats['read_waits'] += 1
+        self._ensure_worker()
+        while self.has_pending(user_id):
+            if time.monotonic() > deadline:
+                logging.warning(f"Write-behind flush for user {user_id} still pending; reading without it")
+                return False
+            self._wake.set()
+            time.sleep(0.005)
+        return True
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each worker process starts its own flusher
+        if self._worker_pid == os.getpid():
+            return
+        with self._worker_lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._recovered = False
+            threading.Thread(target=self._run, name='write-behind-flusher', daemon=True).start()
+
+    def _run(self):
+        backoff = WRITE_BEHIND_POLL_INTERVAL
+        while True:
+            if self._wake.wait(WRITE_BEHIND_POLL_INTERVAL):
+                # Group commit: let writes arriving within the window join this flush
+                time.sleep(WRITE_BEHIND_WINDOW_MS / 1000)
+            self._wake.clear()
+            try:
+                self.flush()
+                backoff = WRITE_BEHIND_POLL_INTERVAL
+            except Exception:
+                self.stats['failures'] += 1
+                logging.exception("Write-behind flush failed; retrying")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def flush(self):
+        """Apply journaled writes to the remote database in seq order; returns how many"""
+        with open(self.path + '.lock', 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is flushing this journal
+                return 0
+            if not self._recovered:
+                self._recover()
+            flushed = 0
+            conn = self._connect()
+            try:
+                while True:
+                    entries = conn.execute('SELECT seq, user_id, table_name, op, row_id, row FROM journal '
+                                           'ORDER BY seq LIMIT ?', (WRITE_BEHIND_BATCH,)).fetchall()
+                    if not entries:
+                        break
+                    # One transaction per shard; a user's entries all go to the same one, in order
+                    by_shard = {}
+                    for entry in entries:
+                        by_shard.setdefault(self.primary.for_user(entry[1]), []).append(entry)
+                    for shard, group in by_shard.items():
+                        try:
+                            self._apply(shard, group)
+                        except Exception:
+                            # The remote commit may or may not have happened; check before replaying
+                            self._recovered = False
+                            raise
+                        conn.executemany('DELETE FROM journal WHERE seq = ?', [(entry[0],) for entry in group])
+                        flushed += len(group)
+                        self.stats['batches'] += 1
+            finally:
+                conn.close()
+            self.stats['flushed'] += flushed
+            return flushed
+
+    def _recover(self):
+        """Drop journal entries the remote already applied (after a crash or failed commit)"""
+        applied = {}
+        for shard in self.primary.all_shards():
+            remote = shard.get_connection()
+            cursor = remote.cursor()
+            cursor.execute('SELECT seq FROM write_behind_applied WHERE journal = ?', (self.journal_id,))
+            row = cursor.fetchone()
+            remote.close()
+            applied[shard] = row[0] if row else 0
+        conn = self._connect()
+        done = [(seq,) for seq, user_id in conn.execute('SELECT seq, user_id FROM journal').fetchall()
+                if seq <= applied[self.primary.for_user(user_id)]]
+        conn.executemany('DELETE FROM journal WHERE seq = ?', done)
+        conn.close()
+        if done:
+            logging.info(f"Write-behind recovery skipped {len(done)} already applied entry(ies)")
+        self._recovered = True
+
+    def _apply(self, shard, entries):
+        """Run entries on their shard in one transaction, consecutive same-kind entries as one executemany"""
+        remote = shard.get_connection()
+        cursor = remote.cursor()
+        try:
+            cursor.execute('BEGIN')
+            for (table, op), group in itertools.groupby(entries, key=lambda entry: (entry[2], entry[3])):
+                model = MODELS[table]
+                group = list(group)
+                if op == 'delete':
+                    cursor.executemany(f'DELETE FROM {table} WHERE id = ?', [(entry[4],) for entry in group])
+                elif op == 'insert':
+                    cursor.executemany(model._upsert_sql(), [json.loads(entry[5]) for entry in group])
+                else:
+                    rows = [json.loads(entry[5]) for entry in group]
+                    cursor.executemany(_update_sql(model), [row[1:] + row[:1] for row in rows])
+            for user_id in sorted({entry[1] for entry in entries if entry[2] == Account.TABLE}):
+                # Keep reminder rows in step, as a synchronous Account.save does
+                AccountAlert.refresh(cursor, user_id=user_id)
+            cursor.execute('''
+                INSERT INTO write_behind_applied (journal, seq) VALUES (?, ?)
+                ON CONFLICT(journal) DO UPDATE SET seq = excluded.seq
+            ''', (self.journal_id, entries[-1][0]))
+            cursor.execute('COMMIT')
+        except Exception:
+            try:
+                cursor.execute('ROLLBACK')
+            except Exception:
+                pass
+            raise
+        finally:
+            remote.close()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logging.exception("Write-behind flush at exit failed; entries stay journaled")
+
+def init_write_behind(app):
+    """Acknowledge model saves once journaled at WRITE_BEHIND_JOURNAL, flushing them in the background"""
+    if not WRITE_BEHIND_JOURNAL:
+        return
+    db_manager.write_behind = WriteBehind(WRITE_BEHIND_JOURNAL)
+    logging.info(f"Write-behind journal at {WRITE_BEHIND_JOURNAL}")